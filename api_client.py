@@ -0,0 +1,349 @@
+"""This module talks to the download daemon's HTTP API (see daemon.py).
+
+Classes:
+    - ApiError: Raised when the daemon rejects a request or can't be reached.
+    - ApiClient: Thin wrappers around the daemon's endpoints.
+    - RemoteJob: A client-side copy of one of the daemon's jobs.
+    - RemoteScheduler: Lets the GUI drive the daemon's queue as if it were a local Scheduler.
+
+Functions:
+    - connect: Returns a client if a daemon answers at a URL.
+"""
+import json
+import time
+import threading
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from typing import Iterator, Optional
+
+from download import Download
+from progress import ProgressEvent
+from scheduler import JobState, Priority, ProgressCallback, StateCallback, StatusCallback
+
+# Seconds to wait before reconnecting a dropped event stream, at most
+RECONNECT_DELAY = 5.0
+
+
+class ApiError(Exception):
+    """Raised when the daemon rejects a request or can't be reached.
+
+    Attributes:
+        status (int | None): The HTTP status, or None if there was no response.
+    """
+    def __init__(self, message: str, status: Optional[int] = None) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+class ApiClient:
+    """Thin wrappers around the daemon's endpoints.
+
+    Attributes:
+        url (str): The daemon's base URL, e.g. "http://127.0.0.1:8765".
+        token (str | None): The bearer token, if the daemon requires one.
+        timeout (float): Seconds a request may take (event streams excepted).
+    """
+    def __init__(self, url: str, token: Optional[str] = None, timeout: float = 10.0) -> None:
+        self.url = url.rstrip("/")
+        self.token = token or None
+        self.timeout = timeout
+
+    def _open(self, method: str, path: str, body: Optional[dict] = None,
+              timeout: Optional[float] = None):
+        data = json.dumps(body).encode("utf-8") if body is not None else None
+        request = urllib.request.Request(self.url + path, data=data, method=method)
+        if method != "GET":
+            # The daemon refuses anything else, body or not
+            request.add_header("Content-Type", "application/json")
+        if self.token:
+            request.add_header("Authorization", f"Bearer {self.token}")
+        try:
+            return urllib.request.urlopen(request, timeout=timeout)
+        except urllib.error.HTTPError as e:
+            try:
+                message = json.loads(e.read()).get("error") or e.reason
+            except (ValueError, AttributeError):
+                message = e.reason
+            raise ApiError(str(message), e.code) from None
+        except (urllib.error.URLError, OSError) as e:
+            raise ApiError(f"Could not reach the daemon at {self.url}: {getattr(e, 'reason', e)}") from None
+
+    def _request(self, method: str, path: str, body: Optional[dict] = None):
+        with self._open(method, path, body, self.timeout) as response:
+            return json.loads(response.read())
+
+
+    def health(self) -> dict:
+        return self._request("GET", "/api/health")
+
+    def jobs(self) -> list[dict]:
+        return self._request("GET", "/api/jobs")["jobs"]
+
+    def job(self, job_id: int) -> dict:
+        return self._request("GET", f"/api/jobs/{job_id}")
+
+    def counts(self) -> dict[str, int]:
+        return self._request("GET", "/api/counts")
+
+    def submit(self, urls: list[str], save_path: str, audio: bool = False, audio_mode: Optional[str] = None,
+               no_playlist: bool = False, priority: int = Priority.NORMAL) -> list[dict]:
+        """Queues downloads and returns their jobs."""
+        return self._request("POST", "/api/jobs", {
+            "urls": list(urls),
+            "save_path": save_path,
+            "audio": audio,
+            "audio_mode": audio_mode,
+            "no_playlist": no_playlist,
+            "priority": int(priority),
+        })["jobs"]
+
+    def cancel(self, job_id: int) -> bool:
+        return self._request("POST", f"/api/jobs/{job_id}/cancel", {})["ok"]
+
+    def pause(self, job_id: int) -> bool:
+        return self._request("POST", f"/api/jobs/{job_id}/pause", {})["ok"]
+
+    def resume(self, job_id: int) -> bool:
+        return self._request("POST", f"/api/jobs/{job_id}/resume", {})["ok"]
+
+    def set_priority(self, job_id: int, priority: int) -> bool:
+        return self._request("POST", f"/api/jobs/{job_id}/priority", {"priority": int(priority)})["ok"]
+
+    def cancel_all(self) -> int:
+        return self._request("POST", "/api/cancel-all", {})["count"]
+
+    def pause_all(self) -> int:
+        return self._request("POST", "/api/pause-all", {})["count"]
+
+    def resume_all(self) -> int:
+        return self._request("POST", "/api/resume-all", {})["count"]
+
+    def events(self, job_id: Optional[int] = None) -> Iterator[tuple[str, dict]]:
+        """Streams the daemon's events as (event, data) pairs, starting with a
+        "snapshot" of every job. Ends when the daemon closes the stream."""
+        path = "/api/events" + (f"?job={job_id}" if job_id is not None else "")
+        with self._open("GET", path) as response:
+            event, data = None, []
+            for raw in response:
+                line = raw.decode("utf-8").rstrip("\r\n")
+                if line.startswith("event:"):
+                    event = line[6:].strip()
+                elif line.startswith("data:"):
+                    data.append(line[5:].strip())
+                elif not line and event and data:
+                    yield event, json.loads("\n".join(data))
+                    event, data = None, []
+
+
+def connect(url: str, token: Optional[str] = None, timeout: float = 1.0) -> Optional[ApiClient]:
+    """Returns a client for the daemon at `url`, or None if none answers there."""
+    client = ApiClient(url, token, timeout)
+    try:
+        client.health()
+    except ApiError:
+        return None
+    client.timeout = 10.0
+    return client
+
+
+class RemoteJob:
+    """A client-side copy of one of the daemon's jobs, with the attributes of
+    scheduler.Job that clients read (`children` holds job IDs)."""
+    def __init__(self, data: dict) -> None:
+        self.id = data["id"]
+        self.download = Download(data["url"], data["audio"], data["no_playlist"],
+                                 data["save_path"], data["audio_mode"])
+        self.update(data)
+
+    def update(self, data: dict):
+        self.uid = data["uid"]
+        self.state = JobState(data["state"])
+        self.error = data.get("error")
+        self.priority = data.get("priority") or 0
+        self.host = data.get("host")
+        self.parent = data.get("parent")
+        self.index = data.get("index")
+        self.children = data.get("children") or []
+        self.info = {"title": data["title"]} if data.get("title") else None
+        self.files = data.get("files") or []
+        self.skipped = data.get("skipped", False)
+        self.processing = data.get("processing")
+        self.engine_version = data.get("engine_version")
+        self.download.yt_dlp_exe = data.get("engine_path")
+        self.progress = ProgressEvent(**data["progress"]) if data.get("progress") else None
+
+    @property
+    def finished(self) -> bool:
+        return self.state in (JobState.DONE, JobState.FAILED, JobState.CANCELLED)
+
+    def __repr__(self) -> str:
+        return f"<RemoteJob #{self.id} {self.state.value} {self.download.link}>"
+
+
+class RemoteScheduler:
+    """Drives the daemon's queue through the subset of the Scheduler API the
+    GUI uses, so the GUI can be one client among many.
+
+    A background thread follows the daemon's event stream, keeps a copy of
+    every job and calls the callbacks as a local Scheduler would, from that
+    thread. A dropped stream is reconnected and resynced from a fresh snapshot.
+
+    Attributes:
+        client (ApiClient): The daemon's client.
+        status_callback (StatusCallback | None): Receives (job, line, is_progress).
+        state_callback (StateCallback | None): Called whenever a job changes state.
+        progress_callback (ProgressCallback | None): Receives (job, event).
+    """
+    def __init__(self, client: ApiClient,
+                 status_callback: Optional[StatusCallback] = None,
+                 state_callback: Optional[StateCallback] = None,
+                 progress_callback: Optional[ProgressCallback] = None) -> None:
+        self.client = client
+        self.status_callback = status_callback
+        self.state_callback = state_callback
+        self.progress_callback = progress_callback
+        self._lock = threading.Lock()
+        self._jobs: dict[int, RemoteJob] = {}
+        self._stopping = threading.Event()
+        self._connected = threading.Event()
+        self._thread = threading.Thread(target=self._follow, name="daemon-events", daemon=True)
+        self._thread.start()
+        # The first snapshot makes counts() meaningful right away
+        self._connected.wait(client.timeout)
+
+    @property
+    def url(self) -> str:
+        return self.client.url
+
+    def _follow(self):
+        delay = 0.5
+        while not self._stopping.is_set():
+            try:
+                for event, data in self.client.events():
+                    if self._stopping.is_set():
+                        return
+                    self._dispatch(event, data)
+                    delay = 0.5
+            except (ApiError, OSError, ValueError):
+                pass
+            self._connected.clear()
+            if self._stopping.wait(delay):
+                return
+            delay = min(delay * 2, RECONNECT_DELAY)
+
+    def _dispatch(self, event: str, data: dict):
+        if event == "snapshot":
+            changed = []
+            with self._lock:
+                for item in data["jobs"]:
+                    job = self._jobs.get(item["id"])
+                    if job is None or job.state.value != item["state"]:
+                        changed.append(item)
+                    self._store(item)
+            self._connected.set()
+            for item in changed:
+                self._notify_state(self._jobs[item["id"]])
+            return
+
+        if event == "state":
+            with self._lock:
+                job = self._store(data)
+            self._notify_state(job)
+            return
+
+        job = self._jobs.get(data.get("job"))
+        if job is None:
+            return
+        if event == "progress":
+            fields = {key: data.get(key) for key in ProgressEvent._fields}
+            job.progress = ProgressEvent(**fields)
+            if self.progress_callback is not None:
+                self.progress_callback(job, job.progress)
+        elif event == "output" and self.status_callback is not None:
+            self.status_callback(job, data.get("line", ""), bool(data.get("progress")))
+
+    def _store(self, data: dict) -> RemoteJob:
+        """Adds or updates a job's copy. Caller holds the lock."""
+        job = self._jobs.get(data["id"])
+        if job is None:
+            job = self._jobs[data["id"]] = RemoteJob(data)
+        else:
+            job.update(data)
+        return job
+
+    def _notify_state(self, job: RemoteJob):
+        if self.state_callback is not None:
+            self.state_callback(job)
+
+
+    def submit(self, download: Download, priority: int = Priority.NORMAL) -> RemoteJob:
+        return self.submit_many([download], priority)[0]
+
+    def submit_many(self, downloads: list[Download], priority: int = Priority.NORMAL) -> list[RemoteJob]:
+        """Queues downloads on the daemon; downloads with the same options go in one request.
+
+        Raises:
+            ApiError: If the daemon rejected them or can't be reached.
+        """
+        groups: dict[tuple, list[Download]] = defaultdict(list)
+        for download in downloads:
+            groups[(download.aud_only, download.audio_mode, download.ignore_playlist, download.save_path)].append(download)
+
+        jobs = []
+        for (audio, audio_mode, no_playlist, save_path), group in groups.items():
+            for data in self.client.submit([d.link for d in group], save_path, audio, audio_mode,
+                                           no_playlist, priority):
+                with self._lock:
+                    jobs.append(self._store(data))
+        return jobs
+
+    def recover(self) -> list[RemoteJob]:
+        """The daemon resumes its own unfinished jobs; nothing to do here."""
+        return []
+
+    def jobs(self) -> list[RemoteJob]:
+        with self._lock:
+            return sorted(self._jobs.values(), key=lambda job: job.id)
+
+    def counts(self) -> dict[JobState, int]:
+        result = {state: 0 for state in JobState}
+        for job in self.jobs():
+            if not job.children:
+                result[job.state] += 1
+        return result
+
+    def engines_in_use(self) -> set[str]:
+        return {job.download.yt_dlp_exe for job in self.jobs() if not job.finished and job.download.yt_dlp_exe}
+
+    def is_idle(self) -> bool:
+        return all(job.finished or job.state == JobState.PAUSED for job in self.jobs())
+
+    def cancel(self, job: RemoteJob) -> bool:
+        return self.client.cancel(job.id)
+
+    def pause(self, job: RemoteJob) -> bool:
+        return self.client.pause(job.id)
+
+    def resume(self, job: RemoteJob) -> bool:
+        return self.client.resume(job.id)
+
+    def set_priority(self, job: RemoteJob, priority: int):
+        self.client.set_priority(job.id, priority)
+
+    def cancel_all(self) -> int:
+        return self.client.cancel_all()
+
+    def pause_all(self) -> int:
+        return self.client.pause_all()
+
+    def resume_all(self) -> int:
+        return self.client.resume_all()
+
+    def shutdown(self, wait: bool = True, kill: bool = False):
+        """Stops following the daemon. Its downloads keep running (`kill` is
+        ignored); with `wait`, blocks until they have finished first."""
+        if wait and not kill:
+            while not self.is_idle() and self._thread.is_alive():
+                time.sleep(0.2)
+        self._stopping.set()
@@ -1,16 +1,54 @@
 # app_config.py
 """
 Centralized configuration for binary paths and dependency checks.
+
+Binaries are resolved by a BinaryRegistry: a path set under the
+"binaries" key of config.json wins, then the bins folder, then the PATH.
+What the registry learns about each binary (whether it is executable, and
+its version) is cached on disk, keyed by path, size and mtime, so a start
+with unchanged binaries never has to fix permissions or run them.
+
+Engine updates never touch a binary in use: each updated yt-dlp lives in
+its own slot under bins/engines, and a pointer file that is replaced
+atomically says which slot is active. The active slot takes precedence
+over the resolved yt-dlp (see `engine_path`).
+
+Classes:
+    - BinPaths: The paths of the binaries.
+    - EngineSlots: The versioned yt-dlp builds and the pointer to the active one.
+    - BinaryRegistry: Resolves binaries and caches what is known about them.
+
+Functions:
+    - get_platform_paths: The platform's default paths in the bins folder.
+    - engine_path: The yt-dlp that new jobs should run.
+    - check_dependencies: Checks that every binary exists and is executable.
+    - binary_version: Returns a binary's version, probing it only once.
 """
 
 import sys
 import os
-from typing import NamedTuple, List
+import re
+import json
+import shutil
+import tempfile
+import threading
+import subprocess
+from typing import Iterable, NamedTuple, List, Optional
+import configManager as cfm
+
+cache_file = "binary_cache.json"
+ENGINES_DIR = os.path.join("bins", "engines")
+# Seconds a version probe may take
+VERSION_TIMEOUT = 30
+# Where the download daemon (daemon.py) listens, and its clients look for it, by default
+DAEMON_HOST = "127.0.0.1"
+DAEMON_PORT = 8765
+DAEMON_URL = f"http://{DAEMON_HOST}:{DAEMON_PORT}"
 
 class BinPaths(NamedTuple):
     """
     A simple structure to hold paths to the binaries.
-    
+
     Attributes:
         yt_dlp (str): The path to the yt-dlp binary.
         ffmpeg (str): The path to the ffmpeg binary.
@@ -18,6 +56,12 @@ class BinPaths(NamedTuple):
     yt_dlp: str
     ffmpeg: str
 
+# The names each binary goes by on the PATH
+_PATH_NAMES = {
+    "yt_dlp": ("yt-dlp",),
+    "ffmpeg": ("ffmpeg",),
+}
+
 def get_platform_paths() -> BinPaths:
     """Gets the platform-specific paths for binaries."""
     if sys.platform == 'linux':
@@ -38,35 +82,338 @@ def get_platform_paths() -> BinPaths:
             ffmpeg="./bins/ffmpeg"
         )
 
-DEPENDENCY_PATHS = get_platform_paths()
+
+class EngineSlots:
+    """The versioned yt-dlp builds under bins/engines, and the pointer to the active one.
+
+    Each slot is a folder named after a version, holding one yt-dlp binary.
+    The pointer file records the active and the previous slot (None stands
+    for the base binary from the bins folder, PATH or config). It is
+    replaced atomically, so switching, or rolling back, is a single rename,
+    and processes already started from an old slot keep running it.
+
+    Attributes:
+        root (str): The folder holding the slots and the pointer.
+    """
+    POINTER = "active.json"
+
+    def __init__(self, root: str = ENGINES_DIR) -> None:
+        self.root = root
+        self._lock = threading.Lock()
+
+    @property
+    def exe_name(self) -> str:
+        """The file name of the binary inside each slot."""
+        return os.path.basename(get_platform_paths().yt_dlp)
+
+    @staticmethod
+    def slot_name(version: str) -> str:
+        """The folder name for a version."""
+        return re.sub(r"[^\w.+-]", "_", version.strip()) or "unknown"
+
+    def path(self, version: str) -> str:
+        """The binary of a version's slot."""
+        return os.path.join(self.root, self.slot_name(version), self.exe_name)
+
+    def _read(self) -> dict:
+        try:
+            with open(os.path.join(self.root, self.POINTER), "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def active(self) -> Optional[str]:
+        """The active slot's version, or None for the base binary."""
+        return self._read().get("active")
+
+    def previous(self) -> Optional[str]:
+        """The version that was active before, or None for the base binary."""
+        return self._read().get("previous")
+
+    def active_path(self) -> Optional[str]:
+        """The active slot's binary, or None if the base binary is active (or the slot is gone)."""
+        version = self.active()
+        if not version:
+            return None
+        path = self.path(version)
+        return path if os.path.isfile(path) else None
+
+    def versions(self) -> list[str]:
+        """The installed slots."""
+        try:
+            names = os.listdir(self.root)
+        except OSError:
+            return []
+        return sorted(name for name in names
+                      if not name.startswith(".") and os.path.isfile(os.path.join(self.root, name, self.exe_name)))
+
+    def install(self, staged_dir: str, version: str) -> str:
+        """Moves a folder holding a tested binary into the version's slot.
+
+        Returns:
+            str: The slot's binary.
+        """
+        target = os.path.join(self.root, self.slot_name(version))
+        if os.path.isdir(target):
+            # Never the active slot: updating to the active version is a no-op
+            shutil.rmtree(target, ignore_errors=True)
+        os.replace(staged_dir, target)
+        return self.path(version)
+
+    def switch(self, version: Optional[str]):
+        """Atomically makes a slot (or, with None, the base binary) the active engine."""
+        with self._lock:
+            current = self.active()
+            if version == current:
+                return
+            os.makedirs(self.root, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(prefix=".active-", suffix=".tmp", dir=self.root)
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump({"active": version, "previous": current}, f)
+                os.replace(tmp_path, os.path.join(self.root, self.POINTER))
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+
+    def rollback(self) -> Optional[str]:
+        """Switches back to the previously active engine (swapping the two).
+
+        Returns:
+            str | None: The now active version, or None for the base binary.
+
+        Raises:
+            ValueError: If there is nothing to roll back to.
+        """
+        data = self._read()
+        active, previous = data.get("active"), data.get("previous")
+        if active == previous:
+            raise ValueError("No previous engine to roll back to.")
+        if previous and not os.path.isfile(self.path(previous)):
+            raise ValueError(f"The previous engine ({previous}) is no longer installed.")
+        self.switch(previous)
+        return previous
+
+    def prune(self, in_use: Iterable[str] = ()):
+        """Deletes every slot except the active and the previous one and those
+        holding a binary in `in_use` (the engines unfinished jobs are pinned to)."""
+        data = self._read()
+        keep = {self.slot_name(v) for v in (data.get("active"), data.get("previous")) if v}
+        root = os.path.abspath(self.root)
+        for path in in_use:
+            try:
+                relative = os.path.relpath(os.path.abspath(path), root)
+            except ValueError:
+                # On another drive
+                continue
+            if not relative.startswith(os.pardir):
+                keep.add(relative.split(os.sep)[0])
+        for name in self.versions():
+            if name not in keep:
+                # A process still running from it keeps its (unlinked) binary on Linux
+                shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+
+
+class BinaryRegistry:
+    """Resolves the binaries and caches what is known about them.
+
+    Cache entries are keyed by absolute path and only trusted while the
+    file's size and mtime are unchanged, so replacing a binary (e.g. an
+    engine update) invalidates its entry. All methods are thread-safe.
+
+    Attributes:
+        cache_path (str): The on-disk cache file.
+    """
+    def __init__(self, cache_path: str = cache_file) -> None:
+        self.cache_path = cache_path
+        self._lock = threading.Lock()
+        self._entries: Optional[dict] = None
+
+
+    def resolve(self, name: str) -> str:
+        """Returns the path to use for a binary ("yt_dlp" or "ffmpeg").
+
+        A config override wins, then the bins folder, then the PATH. If
+        none exists, the bins path is returned so errors point there.
+        Engine slots are not considered; see `engine_path`.
+        """
+        # Only an existing config is read; importing this module must not create one
+        overrides = cfm.getKeyValue("binaries") if cfm.cfgExists() else None
+        if isinstance(overrides, dict) and overrides.get(name):
+            return str(overrides[name])
+
+        bundled = getattr(get_platform_paths(), name)
+        if os.path.isfile(bundled):
+            return bundled
+        for candidate in _PATH_NAMES.get(name, ()):
+            found = shutil.which(candidate)
+            if found:
+                return found
+        return bundled
+
+    def paths(self) -> BinPaths:
+        """Resolves every binary."""
+        return BinPaths(**{name: self.resolve(name) for name in BinPaths._fields})
+
+
+    def _load(self) -> dict:
+        """Loads the cache file once. Caller holds the lock."""
+        if self._entries is None:
+            try:
+                with open(self.cache_path, "r", encoding="utf-8") as f:
+                    self._entries = dict(json.load(f))
+            except (OSError, ValueError, TypeError):
+                self._entries = {}
+        return self._entries
+
+    def _save(self):
+        """Atomically rewrites the cache file. Caller holds the lock."""
+        directory = os.path.dirname(os.path.abspath(self.cache_path))
+        try:
+            fd, tmp_path = tempfile.mkstemp(prefix=".binaries-", suffix=".tmp", dir=directory)
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(self._entries, f)
+                os.replace(tmp_path, self.cache_path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except OSError:
+            # The cache is an optimization; failing to persist it is not fatal
+            pass
+
+    def _entry(self, path: str) -> dict:
+        """Returns the cache entry for a file, reset if the file changed. Caller holds the lock.
+
+        Raises:
+            OSError: If the file can't be stat'ed.
+        """
+        st = os.stat(path)
+        key = os.path.abspath(path)
+        entries = self._load()
+        entry = entries.get(key)
+        if entry is None or entry.get("size") != st.st_size or entry.get("mtime") != st.st_mtime_ns:
+            entry = {"size": st.st_size, "mtime": st.st_mtime_ns}
+            entries[key] = entry
+        return entry
+
+
+    def check(self, path: str) -> Optional[str]:
+        """Checks that a binary exists and is executable, fixing its permissions on Linux.
+
+        Returns:
+            str | None: A problem description, or None if the binary is usable.
+        """
+        with self._lock:
+            try:
+                entry = self._entry(path)
+            except OSError:
+                return f"Missing executable: {path}"
+            if entry.get("executable"):
+                return None
+
+            # Special check for Linux: ensure it's executable
+            if sys.platform == 'linux' and not os.access(path, os.X_OK):
+                try:
+                    os.chmod(path, os.stat(path).st_mode | 0o111)
+                except OSError as e:
+                    return f"Permission error on {path}: {e}"
+                # Re-check permission after attempting to fix
+                if not os.access(path, os.X_OK):
+                    return f"Permission error: Could not make {path} executable."
+            entry["executable"] = True
+            self._save()
+            return None
+
+    def version(self, path: str) -> Optional[str]:
+        """Returns a binary's version, running it only if the cache has none.
+
+        Returns:
+            str | None: The version, or None if the binary is missing or
+            didn't report one.
+        """
+        with self._lock:
+            try:
+                entry = self._entry(path)
+            except OSError:
+                return None
+            if "version" in entry:
+                return entry["version"]
+
+        # Probed outside the lock: it can take a while
+        version = _probe_version(path)
+        with self._lock:
+            try:
+                entry = self._entry(path)
+            except OSError:
+                return version
+            entry["version"] = version
+            self._save()
+        return version
+
+
+def _probe_version(path: str) -> Optional[str]:
+    """Runs a binary to ask for its version."""
+    # ffmpeg takes a single dash and prints "ffmpeg version N ..." first
+    is_ffmpeg = "ffmpeg" in os.path.basename(path).lower()
+    creation_flags = subprocess.CREATE_NO_WINDOW if sys.platform == "win32" else 0
+    try:
+        result = subprocess.run(
+            [path, "-version" if is_ffmpeg else "--version"],
+            stdin=subprocess.DEVNULL,
+            capture_output=True,
+            text=True,
+            encoding="utf-8",
+            errors="replace",
+            timeout=VERSION_TIMEOUT,
+            creationflags=creation_flags
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+    lines = result.stdout.strip().splitlines()
+    if result.returncode != 0 or not lines:
+        return None
+    first = lines[0].strip()
+    if is_ffmpeg and first.startswith("ffmpeg version "):
+        return first.split()[2]
+    return first
+
+
+ENGINES = EngineSlots()
+REGISTRY = BinaryRegistry()
+DEPENDENCY_PATHS = REGISTRY.paths()
+
+
+def engine_path() -> str:
+    """Returns the yt-dlp that new jobs should run: the active engine slot
+    (which an update may have switched since startup), else the base
+    binary, DEPENDENCY_PATHS.yt_dlp."""
+    return ENGINES.active_path() or DEPENDENCY_PATHS.yt_dlp
 
 
 def check_dependencies() -> List[str]:
     """
     Checks for existence and permissions of required binaries.
-    Tries to fix permissions on Linux.
-    
+    Tries to fix permissions on Linux. Binaries that passed before and
+    haven't changed since are not checked again.
+
     Returns:
         A list of error strings if any problems are found. An empty
         list indicates success.
     """
     problems = []
 
-    for name, path in DEPENDENCY_PATHS._asdict().items():
-        if not os.path.exists(path):
-            problems.append(f"Missing executable: {path}")
-            continue
-        
-        # Special check for Linux: ensure it's executable
-        if sys.platform == 'linux' and not os.access(path, os.X_OK):
-            try:
-                import subprocess
-                subprocess.run(['chmod', '+x', path], check=True)
-                
-                # Re-check permission after attempting to fix
-                if not os.access(path, os.X_OK):
-                    problems.append(f"Permission error: Could not make {path} executable.")
-            except Exception as e:
-                problems.append(f"Permission error on {path}: {e}")
+    # yt-dlp is whichever engine is active
+    for path in DEPENDENCY_PATHS._replace(yt_dlp=engine_path()):
+        problem = REGISTRY.check(path)
+        if problem is not None:
+            problems.append(problem)
+
+    return problems
+
 
-    return problems
\ No newline at end of file
+def binary_version(path: str) -> Optional[str]:
+    """Returns the version of the binary at `path` (cached; see BinaryRegistry)."""
+    return REGISTRY.version(path)
@@ -0,0 +1,94 @@
+"""This module contains the DownloadArchive class, which remembers what has already been downloaded.
+
+The archive is a text file with one "<extractor> <id>" line per downloaded
+media item, the same layout as yt-dlp's `--download-archive`. It is owned by
+the app and shared by every job, so the scheduler can skip known items
+before a yt-dlp process is ever spawned.
+
+Classes:
+    - DownloadArchive: A persistent set of downloaded (extractor, id) pairs.
+"""
+import threading
+from typing import Optional
+
+archive_file = "download_archive.txt"
+
+
+class DownloadArchive:
+    """A persistent, thread-safe set of downloaded media.
+
+    The file is read once into memory, so membership checks are O(1) set
+    lookups. New entries are appended under a lock, one whole line per
+    write, so parallel workers never interleave their records.
+
+    Attributes:
+        path (str): The archive file.
+    """
+    def __init__(self, path: str = archive_file) -> None:
+        self.path = path
+
+        self._lock = threading.Lock()
+        self._keys: Optional[set[str]] = None
+
+
+    @staticmethod
+    def make_key(extractor: Optional[str], video_id: Optional[str]) -> Optional[str]:
+        """Builds the archive key for a media item, or None if either part is unknown."""
+        if not extractor or not video_id or extractor == "NA" or video_id == "NA":
+            return None
+        return f"{extractor.lower()} {video_id}"
+
+    @classmethod
+    def key_for(cls, info: Optional[dict]) -> Optional[str]:
+        """Builds the archive key from a probe summary or a playlist entry."""
+        if not info:
+            return None
+        return cls.make_key(info.get("extractor_key") or info.get("ie_key"), info.get("id"))
+
+
+    def _load(self) -> set[str]:
+        """Reads the archive file once. Caller holds the lock."""
+        if self._keys is None:
+            self._keys = set()
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        line = line.strip()
+                        if line:
+                            self._keys.add(line)
+            except OSError:
+                # No archive yet
+                pass
+        return self._keys
+
+    def __contains__(self, key: Optional[str]) -> bool:
+        if key is None:
+            return False
+        with self._lock:
+            return key in self._load()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._load())
+
+    def add(self, key: Optional[str]) -> bool:
+        """Records a key, appending it to the file if it is new.
+
+        Returns:
+            bool: True if the key was added, False if it was already known (or None).
+        """
+        if key is None:
+            return False
+
+        with self._lock:
+            keys = self._load()
+            if key in keys:
+                return False
+            keys.add(key)
+            try:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(key + "\n")
+            except OSError:
+                # Still remembered for this session
+                pass
+            return True
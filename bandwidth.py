@@ -0,0 +1,245 @@
+"""This module contains the global bandwidth budget shared by concurrent downloads.
+
+yt-dlp only takes a rate limit (`--limit-rate`) when it starts, so each
+download is given its share of the budget when it starts, and the
+scheduler restarts a running download (it continues from its .part file)
+once its fair share has changed a lot. Shares are split max-min fairly
+from the throughput measured in the progress stream: a download that
+can't use its share only keeps what it uses, and the rest goes to the
+others.
+
+Classes:
+    - BandwidthSchedule: The budget in effect at each time of day.
+    - BandwidthBudget: Splits the budget across the running downloads.
+
+Functions:
+    - parse_rate: Parses a rate such as "500K" or "4.2M".
+    - budget_from_spec: Builds a budget from a config value.
+"""
+import re
+import time
+import bisect
+import threading
+from datetime import datetime
+from typing import Hashable, Optional, Union
+
+# Smallest share a download is given, in bytes per second (budget permitting)
+MIN_RATE = 50 * 1024
+# A share must change by this factor before a running download is restarted
+REBALANCE_FACTOR = 1.5
+# Seconds a download keeps its share before it may be restarted with a new one
+REBALANCE_MIN_INTERVAL = 60.0
+# A download measured below this fraction of its share can't use all of it...
+UNDERUSE_RATIO = 0.8
+# ...and is left this much headroom above its measured speed
+HEADROOM = 1.25
+# Weight of the newest speed sample in the moving average
+SPEED_SMOOTHING = 0.3
+# Samples needed before a download's measured speed is trusted
+MIN_SAMPLES = 5
+
+_RATE = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([kmg]?)i?b?(?:/s)?\s*$", re.IGNORECASE)
+_MULTIPLIERS = {"": 1, "k": 1024, "m": 1024 ** 2, "g": 1024 ** 3}
+
+RateSpec = Union[None, int, float, str]
+
+
+def parse_rate(value: RateSpec) -> Optional[float]:
+    """Parses a rate like yt-dlp's --limit-rate: a number of bytes per second
+    with an optional K, M or G suffix ("500K", "4.2M"). None, 0 and "" mean
+    unlimited.
+
+    Raises:
+        ValueError: If the rate can't be parsed.
+    """
+    if value is None or value == "" or value == 0:
+        return None
+    if isinstance(value, (int, float)):
+        if value < 0:
+            raise ValueError(f"Invalid rate: {value}")
+        return float(value)
+
+    match = _RATE.match(str(value))
+    if match is None:
+        raise ValueError(f"Invalid rate: {value!r}")
+    rate = float(match.group(1)) * _MULTIPLIERS[match.group(2).lower()]
+    return rate or None
+
+
+class BandwidthSchedule:
+    """The total bandwidth budget, optionally changing with the time of day.
+
+    The spec is either a single rate (see `parse_rate`) or a mapping of
+    "HH:MM" start times to rates, e.g. {"08:00": "2M", "19:00": None}
+    for 2 MiB/s during the day and no limit from 19:00 until 08:00.
+    """
+    def __init__(self, spec: Union[RateSpec, dict[str, RateSpec]] = None) -> None:
+        self._starts: list[int] = []
+        self._rates: list[Optional[float]] = []
+        if isinstance(spec, dict):
+            for start, rate in sorted((self._parse_time(k), parse_rate(v)) for k, v in spec.items()):
+                self._starts.append(start)
+                self._rates.append(rate)
+        else:
+            self._starts.append(0)
+            self._rates.append(parse_rate(spec))
+
+    @staticmethod
+    def _parse_time(text: str) -> int:
+        try:
+            hours, _, minutes = text.partition(":")
+            value = int(hours) * 60 + int(minutes or 0)
+        except ValueError:
+            raise ValueError(f"Invalid time of day: {text!r}") from None
+        if not 0 <= value < 24 * 60:
+            raise ValueError(f"Invalid time of day: {text!r}")
+        return value
+
+    @property
+    def unlimited(self) -> bool:
+        """True if no limit ever applies."""
+        return all(rate is None for rate in self._rates)
+
+    def limit_at(self, when: Optional[datetime] = None) -> Optional[float]:
+        """Returns the budget in bytes per second at a time (default: now), or None for no limit."""
+        if not self._starts:
+            return None
+        when = when or datetime.now()
+        minute = when.hour * 60 + when.minute
+        # Before the first start of the day, the last entry of the previous day still applies
+        return self._rates[bisect.bisect_right(self._starts, minute) - 1]
+
+
+class BandwidthBudget:
+    """Splits a BandwidthSchedule's budget across the running downloads.
+
+    Downloads are identified by any hashable key. `add` a download when it
+    starts, feed it measured speeds with `observe`, record the limit its
+    process was started with with `assign`, and `remove` it when it stops
+    transferring. All methods are thread-safe.
+
+    Attributes:
+        schedule (BandwidthSchedule): The total budget over time.
+        min_rate (float): The smallest share a download is given, as long as
+            the budget is large enough to give it to every running download.
+    """
+    def __init__(self, schedule: BandwidthSchedule, min_rate: float = MIN_RATE) -> None:
+        self.schedule = schedule
+        self.min_rate = min_rate
+        self._lock = threading.Lock()
+        self._speeds: dict[Hashable, Optional[float]] = {}
+        self._samples: dict[Hashable, int] = {}
+        # key -> (the limit its process runs with, when it was assigned)
+        self._assigned: dict[Hashable, tuple[Optional[float], float]] = {}
+
+
+    def add(self, key: Hashable):
+        """Starts sharing the budget with a download."""
+        with self._lock:
+            self._speeds.setdefault(key, None)
+            self._samples.setdefault(key, 0)
+
+    def remove(self, key: Hashable):
+        """Stops sharing the budget with a download (it finished, or stopped transferring)."""
+        with self._lock:
+            self._speeds.pop(key, None)
+            self._samples.pop(key, None)
+            self._assigned.pop(key, None)
+
+    def observe(self, key: Hashable, speed: float):
+        """Feeds a measured speed (bytes per second) of a download."""
+        with self._lock:
+            if key not in self._speeds:
+                return
+            previous = self._speeds[key]
+            self._speeds[key] = speed if previous is None else (
+                SPEED_SMOOTHING * speed + (1 - SPEED_SMOOTHING) * previous
+            )
+            self._samples[key] += 1
+
+    def assign(self, key: Hashable, rate: Optional[float]):
+        """Records the limit a download's process was started with."""
+        with self._lock:
+            if key in self._speeds:
+                self._assigned[key] = (rate, time.monotonic())
+                # Speeds measured under the old limit say little about the new one
+                self._samples[key] = 0
+
+
+    def allocate(self) -> dict[Hashable, Optional[float]]:
+        """Returns every download's fair share now, in bytes per second (None for no limit)."""
+        with self._lock:
+            return self._allocate()
+
+    def share(self, key: Hashable) -> Optional[float]:
+        """Returns one download's fair share now (None for no limit)."""
+        with self._lock:
+            return self._allocate().get(key)
+
+    def stale(self) -> list[Hashable]:
+        """Returns the downloads whose process limit is far enough from their fair
+        share, for long enough, that restarting them is worth it."""
+        now = time.monotonic()
+        with self._lock:
+            shares = self._allocate()
+            return [
+                key for key, (rate, since) in self._assigned.items()
+                if now - since >= REBALANCE_MIN_INTERVAL and _differs(rate, shares.get(key))
+            ]
+
+    def _allocate(self) -> dict[Hashable, Optional[float]]:
+        """Max-min fair shares from the measured demand. Caller holds the lock."""
+        total = self.schedule.limit_at()
+        if total is None or not self._speeds:
+            return {key: None for key in self._speeds}
+
+        demands = {}
+        for key, speed in self._speeds.items():
+            rate = self._assigned.get(key, (None, 0.0))[0]
+            underused = speed is not None and self._samples[key] >= MIN_SAMPLES and (
+                rate is None or speed < UNDERUSE_RATIO * rate
+            )
+            # A download running at its limit could use more; one below it can't
+            demands[key] = speed * HEADROOM if underused else float("inf") # type: ignore
+
+        shares = {}
+        remaining = total
+        ordered = sorted(demands.items(), key=lambda item: item[1])
+        for i, (key, demand) in enumerate(ordered):
+            share = min(demand, remaining / (len(ordered) - i))
+            shares[key] = share
+            remaining -= share
+
+        # Whatever nobody could use is spread evenly, so the shares add up to the budget
+        bonus = remaining / len(shares)
+        shares = {key: share + bonus for key, share in shares.items()}
+
+        # Shares below the floor are raised to it at the expense of the shares above
+        # it, so the total stays within the budget. With too many downloads for every
+        # one to get the floor, they split the budget evenly instead.
+        floor = min(self.min_rate, total / len(shares))
+        deficit = sum(floor - share for share in shares.values() if share < floor)
+        excess = sum(share - floor for share in shares.values() if share > floor)
+        if deficit <= 0:
+            return shares
+        return {
+            key: floor if share <= floor else share - (share - floor) * deficit / excess
+            for key, share in shares.items()
+        }
+
+
+def budget_from_spec(spec: Union[RateSpec, dict[str, RateSpec]]) -> Optional[BandwidthBudget]:
+    """Builds a budget from a rate or time-of-day table (see BandwidthSchedule),
+    or returns None if it never limits anything.
+
+    Raises:
+        ValueError: If the spec can't be parsed.
+    """
+    schedule = BandwidthSchedule(spec)
+    return None if schedule.unlimited else BandwidthBudget(schedule)
+
+
+def _differs(old: Optional[float], new: Optional[float]) -> bool:
+    if old is None or new is None:
+        return (old is None) != (new is None)
+    return max(old, new) / min(old, new) >= REBALANCE_FACTOR
@@ -0,0 +1,159 @@
+"""End-to-end check of the daemon's HTTP API, run offline against a fake yt-dlp.
+
+A JobServer is started on a free local port around a Scheduler that runs
+benchmarks/fake_yt_dlp.py, and driven only through api_client, the way the
+GUI and scripts drive it. The check:
+
+    submits a batch of downloads and follows the event stream until they finish
+    cancels a slow download through the API and waits for it to be cancelled
+    rejects an invalid URL, an unknown job and a missing token
+
+and reports the submit round trip, the time until the batch finished and
+the events received per second.
+
+Usage:
+    python benchmarks/api.py [--jobs N] [--lines N]
+
+Exits with 1 if any step fails.
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+from engine import install_stub, _set_env
+from api_client import ApiClient, ApiError, RemoteScheduler
+from daemon import EventHub, JobServer
+from scheduler import JobState, Scheduler
+
+TOKEN = "bench-token"
+
+
+class CheckFailed(Exception):
+    pass
+
+
+def _wait_for(predicate, timeout: float, what: str):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise CheckFailed(f"Timed out waiting for {what}")
+        time.sleep(0.02)
+
+
+def check_batch(client: ApiClient, save_path: str, jobs: int) -> dict:
+    """Submits a batch, follows it through the event stream and times it."""
+    events = 0
+    def count(*args):
+        nonlocal events
+        events += 1
+    remote = RemoteScheduler(client, status_callback=count, state_callback=count, progress_callback=count)
+
+    try:
+        start = time.perf_counter()
+        round_trips = []
+        submitted = []
+        for i in range(jobs):
+            sent = time.perf_counter()
+            submitted.extend(client.submit([f"https://fake.invalid/video/{i}"], save_path, no_playlist=True))
+            round_trips.append(time.perf_counter() - sent)
+
+        ids = {job["id"] for job in submitted}
+        _wait_for(lambda: all(job.finished for job in remote.jobs() if job.id in ids)
+                  and len([job for job in remote.jobs() if job.id in ids]) == len(ids), 60, "the batch")
+        elapsed = time.perf_counter() - start
+
+        failed = [job for job in remote.jobs() if job.id in ids and job.state != JobState.DONE]
+        if failed:
+            raise CheckFailed(f"{len(failed)} download(s) did not finish: {failed[0].error}")
+        if any(client.job(job_id)["state"] != JobState.DONE.value for job_id in ids):
+            raise CheckFailed("The event stream and /api/jobs disagree")
+    finally:
+        remote.shutdown(wait=False)
+
+    return {
+        "submit_p50_ms": statistics.median(round_trips) * 1000,
+        "batch_seconds": elapsed,
+        "events_per_sec": events / elapsed,
+    }
+
+
+def check_cancel(client: ApiClient, save_path: str):
+    """Cancels a slow download while it runs."""
+    _set_env(LINES=100000, RATE=200)
+    job = client.submit(["https://fake.invalid/video/slow"], save_path, no_playlist=True)[0]
+    _wait_for(lambda: client.job(job["id"])["state"] == JobState.RUNNING.value, 10, "the slow download to start")
+    if not client.cancel(job["id"]):
+        raise CheckFailed("Cancel was refused")
+    _wait_for(lambda: client.job(job["id"])["state"] == JobState.CANCELLED.value, 10, "the cancel")
+
+
+def check_errors(client: ApiClient, save_path: str):
+    """Checks that bad requests are rejected with the right status."""
+    for what, call, status in [
+        ("an invalid URL", lambda: client.submit(["not a url"], save_path), 400),
+        ("an unknown job", lambda: client.job(999999), 404),
+        ("a missing token", lambda: ApiClient(client.url).jobs(), 401),
+    ]:
+        try:
+            call()
+        except ApiError as e:
+            if e.status != status:
+                raise CheckFailed(f"{what}: expected {status}, got {e.status}")
+        else:
+            raise CheckFailed(f"{what} was accepted")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=8, help="downloads in the batch (default: 8)")
+    parser.add_argument("--lines", type=int, default=2000, help="progress lines per download (default: 2000)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="ytdlp-api-bench-")
+    cwd = os.getcwd()
+    # The binary cache and anything else written relative to the working directory stays in the scratch dir
+    os.chdir(workdir)
+    server = None
+    scheduler = None
+    try:
+        install_stub(workdir)
+        save_path = os.path.join(workdir, "out")
+        os.makedirs(save_path)
+        _set_env(LINES=args.lines, RATE=0, LOG_EVERY=50)
+
+        hub = EventHub()
+        scheduler = Scheduler(max_workers=4, status_callback=hub.on_output,
+                              state_callback=hub.on_state, progress_callback=hub.on_progress)
+        server = JobServer(scheduler, hub, port=0, token=TOKEN).start()
+        client = ApiClient(server.url, TOKEN)
+        print(f"Daemon on {server.url}, engine {client.health()['engine']}")
+
+        results = check_batch(client, save_path, args.jobs)
+        check_cancel(client, save_path)
+        check_errors(client, save_path)
+    except (CheckFailed, ApiError) as e:
+        print(f"FAILED: {e}")
+        return 1
+    finally:
+        if server is not None:
+            server.shutdown()
+        if scheduler is not None:
+            scheduler.shutdown(wait=False, kill=True)
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    for name, value in results.items():
+        print(f"  {name:<26} {value:14.1f}")
+    print("All checks passed.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,370 @@
+"""Engine benchmark suite, run offline against a fake yt-dlp.
+
+`DEPENDENCY_PATHS.yt_dlp` is swapped for benchmarks/fake_yt_dlp.py, which
+prints realistic extractor, progress and log output at a configurable rate.
+The suite measures:
+
+    parse       progress lines parsed per second (in-process)
+    engine      lines per second through Download.run_download with no-op callbacks
+    supervised  the same through Download.run_download_async on a ProcessSupervisor
+    overhead    extra microseconds per line for the Scheduler + console chain used by the UI
+    latency     delay from a line being printed to the console rendering it (p50/p95)
+    scaling     aggregate lines per second with 1, 2, 4 and 8 parallel jobs
+
+The console is a ConsoleBuffer drawing into an in-memory stand-in for the
+Tk Text widget, driven by a stand-in Tk event loop on its own thread.
+
+Usage:
+    python benchmarks/engine.py                      # print a report (best of 3 runs)
+    python benchmarks/engine.py --save base.json     # record a baseline
+    python benchmarks/engine.py --compare base.json  # exit 1 on regression
+"""
+import os
+import sys
+import json
+import time
+import heapq
+import shutil
+import argparse
+import tempfile
+import itertools
+import threading
+import statistics
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+import app_config
+import download
+import console_buffer
+from progress import parse_progress_line, progress_args
+from scheduler import Scheduler
+from supervisor import ProcessSupervisor
+
+FAKE_YT_DLP = os.path.join(REPO, "benchmarks", "fake_yt_dlp.py")
+
+# Metric name -> True if higher is better
+METRICS = {
+    "parse_lines_per_sec": True,
+    "engine_lines_per_sec": True,
+    "supervised_lines_per_sec": True,
+    "overhead_us_per_line": False,
+    "latency_p50_ms": False,
+    "latency_p95_ms": False,
+    "scaling_1_lines_per_sec": True,
+    "scaling_2_lines_per_sec": True,
+    "scaling_4_lines_per_sec": True,
+    "scaling_8_lines_per_sec": True,
+}
+
+
+def install_stub(workdir: str) -> str:
+    """Creates an executable wrapper around the fake and points the app at it."""
+    if sys.platform == "win32":
+        path = os.path.join(workdir, "yt-dlp.cmd")
+        with open(path, "w") as f:
+            f.write(f'@"{sys.executable}" "{FAKE_YT_DLP}" %*\n')
+    else:
+        path = os.path.join(workdir, "yt-dlp")
+        with open(path, "w") as f:
+            f.write(f'#!/bin/sh\nexec "{sys.executable}" "{FAKE_YT_DLP}" "$@"\n')
+        os.chmod(path, 0o755)
+
+    paths = app_config.DEPENDENCY_PATHS._replace(yt_dlp=path)
+    app_config.DEPENDENCY_PATHS = paths
+    download.DEPENDENCY_PATHS = paths
+    return path
+
+
+class FakeText:
+    """The subset of tk.Text that ConsoleBuffer uses, kept as a list of lines."""
+    def __init__(self, on_insert=None) -> None:
+        self.lines: list[str] = []
+        # Mark name -> line number
+        self.marks: dict[str, int] = {}
+        self.on_insert = on_insert
+
+    def config(self, **kwargs):
+        pass
+
+    def see(self, index):
+        pass
+
+    def _line(self, index: str) -> int:
+        name = index.split()[0]
+        if name in self.marks:
+            return self.marks[name]
+        return int(name.split(".")[0])
+
+    def index(self, index: str) -> str:
+        if index.startswith("end"):
+            return f"{len(self.lines) + 1}.0"
+        return f"{self._line(index)}.0"
+
+    def mark_set(self, name: str, index: str):
+        self.marks[name] = self._line(index)
+
+    def mark_gravity(self, name: str, gravity: str):
+        pass
+
+    def mark_unset(self, name: str):
+        self.marks.pop(name, None)
+
+    def insert(self, index: str, text: str):
+        if index == "end":
+            self.lines.extend(text.rstrip("\n").split("\n"))
+        else:
+            self.lines[self._line(index) - 1] = text
+        if self.on_insert is not None:
+            self.on_insert(text)
+
+    def delete(self, start: str, end: str):
+        if start == "1.0":
+            count = int(end.split(".")[0]) - 1
+            del self.lines[:count]
+            self.marks = {name: max(1, line - count) for name, line in self.marks.items()}
+        else:
+            self.lines[self._line(start) - 1] = ""
+
+
+class FakeTk:
+    """A stand-in for the Tk event loop: runs `after` callbacks on one thread."""
+    def __init__(self) -> None:
+        self._calls: list = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+
+    def after(self, ms: int, func):
+        with self._lock:
+            heapq.heappush(self._calls, (time.perf_counter() + ms / 1000, next(self._seq), func))
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            with self._lock:
+                due = self._calls and self._calls[0][0] <= time.perf_counter()
+                func = heapq.heappop(self._calls)[2] if due else None
+            if func is not None:
+                func()
+            else:
+                time.sleep(0.001)
+
+
+def _set_env(**values):
+    for key, value in values.items():
+        os.environ[f"FAKE_YTDLP_{key}"] = str(value)
+
+def _new_download(i: int, save_path: str) -> download.Download:
+    return download.Download(f"https://fake.invalid/video/{i}", False, True, save_path)
+
+
+def bench_parse(lines: int) -> float:
+    """Progress lines parsed per second."""
+    template = progress_args()[2].partition(":")[2]
+    sys.path.insert(0, os.path.dirname(FAKE_YT_DLP))
+    from fake_yt_dlp import render
+    sample = [render(template, {
+        "progress.status": "downloading", "progress.downloaded_bytes": i * 1024,
+        "progress.total_bytes": lines * 1024, "progress.speed": 1048576.5, "progress.eta": i,
+    }) + "\n" for i in range(lines)]
+
+    start = time.perf_counter()
+    for line in sample:
+        parse_progress_line(line)
+    return lines / (time.perf_counter() - start)
+
+
+def bench_engine(lines: int, save_path: str) -> tuple[float, int]:
+    """Lines per second through run_download with no-op callbacks, and the line count."""
+    _set_env(LINES=lines, RATE=0, LOG_EVERY=50)
+    count = 0
+    def count_line(*args):
+        nonlocal count
+        count += 1
+
+    start = time.perf_counter()
+    download_handler = _new_download(0, save_path)
+    download_handler.run_download(count_line, count_line, count_line)
+    return count / (time.perf_counter() - start), count
+
+
+def bench_supervised(lines: int, save_path: str) -> float:
+    """Lines per second through run_download_async with no-op callbacks."""
+    _set_env(LINES=lines, RATE=0, LOG_EVERY=50)
+    count = 0
+    def count_line(*args):
+        nonlocal count
+        count += 1
+
+    supervisor = ProcessSupervisor()
+    supervisor.loop # start the loop thread outside the measurement
+    start = time.perf_counter()
+    download_handler = _new_download(0, save_path)
+    supervisor.submit(download_handler.run_download_async(supervisor, count_line, count_line, count_line)).result()
+    elapsed = time.perf_counter() - start
+    supervisor.stop()
+    return count / elapsed
+
+
+def _console_chain(on_insert=None):
+    """Builds the UI's path: Scheduler callbacks -> ConsoleBuffer -> (fake) Text widget."""
+    root = FakeTk()
+    console = console_buffer.ConsoleBuffer()
+    console.attach(root, FakeText(on_insert))
+
+    def on_output(job, line, is_progress=False):
+        console.write(f"[#{job.id}] {line}", job.id if is_progress else None)
+
+    def on_progress(job, event):
+        console.write(f"[#{job.id}] [Engine] {event.format()}", job.id)
+
+    return root, on_output, on_progress
+
+
+def bench_overhead(lines: int, save_path: str, engine_rate: float, engine_lines: int) -> float:
+    """Extra microseconds per line for the Scheduler + console chain vs. no-op callbacks."""
+    _set_env(LINES=lines, RATE=0, LOG_EVERY=50)
+    root, on_output, on_progress = _console_chain()
+    root.start()
+    scheduler = Scheduler(max_workers=1, status_callback=on_output, progress_callback=on_progress)
+
+    start = time.perf_counter()
+    scheduler.submit(_new_download(0, save_path))
+    scheduler.wait()
+    elapsed = time.perf_counter() - start
+    scheduler.shutdown()
+    root.stop()
+
+    return max(0.0, (elapsed - engine_lines / engine_rate) / engine_lines * 1e6)
+
+
+def bench_latency(rate: int, seconds: float, save_path: str) -> list[float]:
+    """Milliseconds from a log line being printed to the console rendering it."""
+    lines = int(rate * seconds)
+    _set_env(LINES=lines, RATE=rate, LOG_EVERY=10)
+    samples = []
+
+    def on_insert(text: str):
+        now = time.time()
+        for line in text.split("\n"):
+            if "[bench] " in line:
+                samples.append((now - float(line.rsplit(" ", 1)[-1])) * 1000)
+
+    root, on_output, on_progress = _console_chain(on_insert)
+    root.start()
+    scheduler = Scheduler(max_workers=1, status_callback=on_output, progress_callback=on_progress)
+    scheduler.submit(_new_download(0, save_path))
+    scheduler.wait()
+    time.sleep(0.1) # let the last frame render
+    scheduler.shutdown()
+    root.stop()
+    return samples
+
+
+def bench_scaling(jobs: int, lines: int, save_path: str) -> float:
+    """Aggregate lines per second with `jobs` downloads running in parallel."""
+    _set_env(LINES=lines, RATE=0, LOG_EVERY=50)
+    count = 0
+    lock = threading.Lock()
+    def count_line(*args):
+        nonlocal count
+        with lock:
+            count += 1
+
+    scheduler = Scheduler(max_workers=jobs, status_callback=count_line, progress_callback=count_line,
+                          max_per_host=jobs)
+    start = time.perf_counter()
+    scheduler.submit_many([_new_download(i, save_path) for i in range(jobs)])
+    scheduler.wait()
+    elapsed = time.perf_counter() - start
+    scheduler.shutdown()
+    return count / elapsed
+
+
+def run(args) -> dict:
+    workdir = tempfile.mkdtemp(prefix="ytsp-engine-bench-")
+    try:
+        install_stub(workdir)
+        results = {"parse_lines_per_sec": bench_parse(args.lines * 10)}
+
+        engine_rate, engine_lines = bench_engine(args.lines, workdir)
+        results["engine_lines_per_sec"] = engine_rate
+        results["supervised_lines_per_sec"] = bench_supervised(args.lines, workdir)
+        results["overhead_us_per_line"] = bench_overhead(args.lines, workdir, engine_rate, engine_lines)
+
+        latency = bench_latency(args.rate, args.seconds, workdir)
+        if latency:
+            results["latency_p50_ms"] = statistics.median(latency)
+            results["latency_p95_ms"] = statistics.quantiles(latency, n=20)[-1] if len(latency) > 1 else latency[0]
+
+        for jobs in (1, 2, 4, 8):
+            results[f"scaling_{jobs}_lines_per_sec"] = bench_scaling(jobs, args.lines, workdir)
+        return results
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Lists the metrics that are worse than the baseline by more than `tolerance`."""
+    regressions = []
+    for name, higher_is_better in METRICS.items():
+        value, base = current.get(name), baseline.get("results", {}).get(name)
+        if value is None or not base:
+            continue
+        worse = value < base * (1 - tolerance) if higher_is_better else value > base * (1 + tolerance)
+        if worse:
+            regressions.append(f"{name}: {value:.1f} vs {base:.1f}")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, default=20000, help="progress lines per download (default: 20000)")
+    parser.add_argument("--rate", type=int, default=500, help="lines per second in the latency test (default: 500)")
+    parser.add_argument("--seconds", type=float, default=3.0, help="length of the latency test (default: 3)")
+    parser.add_argument("-n", "--repeat", type=int, default=3, help="runs to take the best of (default: 3)")
+    parser.add_argument("--save", metavar="FILE", help="write the results as JSON")
+    parser.add_argument("--compare", metavar="FILE", help="compare against a saved baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed slowdown vs. the baseline (default: 0.25 = 25%%)")
+    args = parser.parse_args()
+
+    # Best of several runs, to keep scheduler noise out of the comparison
+    runs = [run(args) for _ in range(max(1, args.repeat))]
+    results = {}
+    for name, higher_is_better in METRICS.items():
+        values = [r[name] for r in runs if name in r]
+        if values:
+            results[name] = max(values) if higher_is_better else min(values)
+
+    for name in METRICS:
+        if name in results:
+            print(f"  {name:<26} {results[name]:14.1f}")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({"python": sys.version.split()[0], "platform": sys.platform,
+                       "lines": args.lines, "results": results}, f, indent=4)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print("Regressions:")
+            for item in regressions:
+                print(f"  {item}")
+            return 1
+        print("No regressions.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,154 @@
+"""A fake yt-dlp executable for offline benchmarks.
+
+It accepts the command lines the app builds, renders the `--progress-template`
+and `--print` templates it is given the way yt-dlp would, and emits realistic
+extractor, progress, log and post-processing output without touching the
+network. Volume and pacing are controlled through environment variables:
+
+    FAKE_YTDLP_LINES      progress lines per download (default: 1000)
+    FAKE_YTDLP_RATE       lines per second, 0 for as fast as possible (default: 0)
+    FAKE_YTDLP_LOG_EVERY  emit a log line every N progress lines (default: 50)
+    FAKE_YTDLP_EXIT       exit code to finish with (default: 0)
+    FAKE_YTDLP_SATURATE   concurrent fragments beyond which the reported speed
+                          stops growing (default: 8)
+    FAKE_YTDLP_WRITE      bytes to actually write to the announced output file
+                          (default: 0, nothing is written)
+    FAKE_YTDLP_ERROR      error line to print when failing (default: none)
+    FAKE_YTDLP_FAILURES   fail the first N downloads of each video with exit
+                          code 1, counted in a file next to the output (default: 0)
+    FAKE_YTDLP_PROBE_DELAY  seconds a --dump-single-json probe takes (default: 0)
+
+Log lines end with "[bench] <time.time()>" so the receiver can measure latency.
+"""
+import os
+import re
+import sys
+import json
+import time
+
+_FIELD = re.compile(r"%\(([^)]+)\)s")
+TOTAL_BYTES = 50 * 1024 * 1024
+
+
+def render(template: str, values: dict) -> str:
+    """Renders a yt-dlp output template; missing fields become "NA" like in yt-dlp."""
+    def field(match):
+        value = values.get(match.group(1))
+        return "NA" if value is None else str(value)
+    return _FIELD.sub(field, template)
+
+
+def parse_args(argv: list[str]) -> dict:
+    """Picks out the options the fake cares about."""
+    options = {"templates": {}, "prints": {}, "url": argv[-1] if argv else "", "flags": set(argv)}
+    for i, arg in enumerate(argv[:-1]):
+        value = argv[i + 1]
+        if arg == "--progress-template":
+            kind, _, template = value.partition(":")
+            options["templates"][kind] = template
+        elif arg == "--print":
+            when, _, template = value.partition(":")
+            options["prints"][when] = template
+        elif arg == "-o":
+            options["output"] = value
+        elif arg == "--limit-rate":
+            options["limit_rate"] = float(value)
+        elif arg == "--concurrent-fragments":
+            options["fragments"] = int(value)
+    return options
+
+
+def main() -> int:
+    argv = sys.argv[1:]
+    if "--version" in argv:
+        print("2099.01.01 (fake)")
+        return 0
+
+    options = parse_args(argv)
+    url = options["url"]
+    video_id = url.rstrip("/").rsplit("/", 1)[-1] or "fake"
+
+    if "--dump-single-json" in options["flags"]:
+        time.sleep(float(os.environ.get("FAKE_YTDLP_PROBE_DELAY", "0")))
+        print(json.dumps({
+            "id": video_id, "title": f"Fake video {video_id}", "extractor_key": "Fake",
+            "webpage_url": url, "duration": 300, "filesize_approx": TOTAL_BYTES,
+            "formats": [{"format_id": "18", "ext": "mp4", "vcodec": "avc1", "acodec": "mp4a"}],
+        }))
+        return 0
+
+    lines = int(os.environ.get("FAKE_YTDLP_LINES", "1000"))
+    rate = float(os.environ.get("FAKE_YTDLP_RATE", "0"))
+    log_every = max(1, int(os.environ.get("FAKE_YTDLP_LOG_EVERY", "50")))
+    exit_code = int(os.environ.get("FAKE_YTDLP_EXIT", "0"))
+    failures = int(os.environ.get("FAKE_YTDLP_FAILURES", "0"))
+    if failures:
+        counter = os.path.join(os.path.dirname(options.get("output", "")) or ".", f".fake-runs-{video_id}")
+        try:
+            with open(counter) as f:
+                runs = int(f.read() or 0)
+        except OSError:
+            runs = 0
+        with open(counter, "w") as f:
+            f.write(str(runs + 1))
+        if runs < failures:
+            exit_code = exit_code or 1
+    saturate = max(1, int(os.environ.get("FAKE_YTDLP_SATURATE", "8")))
+    # 1.25 MiB/s per fragment in flight, up to the saturation point
+    speed = 1310720.0 * min(options.get("fragments", 1), saturate)
+    speed = min(speed, options.get("limit_rate") or speed)
+    out = sys.stdout
+    interval = 1.0 / rate if rate > 0 else 0.0
+    start = time.perf_counter()
+
+    out.write(f"[fake] Extracting URL: {url}\n")
+    out.write(f"[info] {video_id}: Downloading 1 format(s): 18\n")
+
+    template = options["templates"].get("download")
+    for i in range(1, lines + 1):
+        if interval:
+            delay = start + i * interval - time.perf_counter()
+            if delay > 0:
+                out.flush()
+                time.sleep(delay)
+
+        done = TOTAL_BYTES * i // lines
+        if template:
+            out.write(render(template, {
+                "progress.status": "downloading",
+                "progress.downloaded_bytes": done,
+                "progress.total_bytes": TOTAL_BYTES,
+                "progress.speed": speed,
+                "progress.eta": int((TOTAL_BYTES - done) // speed),
+                "progress.fragment_index": i,
+                "progress.fragment_count": lines,
+            }) + "\n")
+        else:
+            out.write(f"[download] {done * 100 / TOTAL_BYTES:5.1f}% of 50.00MiB at 5.00MiB/s ETA 00:05\n")
+
+        if i % log_every == 0:
+            out.write(f"[download] Got fragment {i} [bench] {time.time():.6f}\n")
+
+    postprocess = options["templates"].get("postprocess")
+    if postprocess:
+        for status in ("started", "finished"):
+            out.write(render(postprocess, {"progress.status": status, "progress.postprocessor": "Merger"}) + "\n")
+
+    after_move = options["prints"].get("after_move")
+    if after_move and exit_code == 0:
+        path = os.path.join(os.path.dirname(options.get("output", "")), f"Fake video {video_id}.mp4")
+        size = int(os.environ.get("FAKE_YTDLP_WRITE", "0"))
+        if size:
+            with open(path, "wb") as f:
+                f.write(os.urandom(size))
+        out.write(render(after_move, {"extractor_key": "Fake", "id": video_id, "filepath": path}) + "\n")
+
+    error = os.environ.get("FAKE_YTDLP_ERROR")
+    if error and exit_code:
+        out.write(error + "\n")
+    out.flush()
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,181 @@
+"""Startup benchmark: time to first frame and import time breakdown.
+
+Each run starts a fresh interpreter in a scratch directory (so the real
+config.json, archive and journal are never touched), builds the main
+window and records how long it takes until the window is mapped on screen.
+A separate run with `-X importtime` reports where import time goes.
+
+Usage:
+    python benchmarks/startup.py                      # 5 runs, print a report
+    python benchmarks/startup.py --save base.json     # record a baseline
+    python benchmarks/startup.py --compare base.json  # exit 1 on regression
+
+Time to first frame needs a display; without one only imports are measured.
+"""
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules whose cumulative import time is always reported
+_APP_MODULES = ("ui", "tkinter", "ttkthemes", "download", "scheduler", "metadata",
+                "archive", "journal", "configManager", "app_config", "console_buffer", "progress")
+
+# Runs inside the child interpreter: time from process start to the first <Map> of the window
+_FIRST_FRAME_SCRIPT = """
+import time
+start = time.perf_counter()
+import ui
+imported = time.perf_counter()
+window = ui.Window()
+built = time.perf_counter()
+def on_map(event):
+    if event.widget is window.root:
+        mapped = time.perf_counter()
+        print("{:.6f} {:.6f} {:.6f}".format(imported - start, built - start, mapped - start))
+        window.root.after(0, window.root.destroy)
+window.root.bind("<Map>", on_map, add="+")
+window.run()
+"""
+
+
+def has_display() -> bool:
+    return sys.platform == "win32" or bool(os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY"))
+
+
+def _scratch_dir() -> str:
+    """A working directory with just what the window needs to start."""
+    path = tempfile.mkdtemp(prefix="ytsp-bench-")
+    shutil.copy(os.path.join(REPO, "icon.ico"), path)
+    return path
+
+def _env() -> dict:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = REPO + os.pathsep + env.get("PYTHONPATH", "")
+    env["PYTHONDONTWRITEBYTECODE"] = "1"
+    return env
+
+
+def measure_first_frame(runs: int) -> dict:
+    """Returns median/min seconds to import, build and map the window."""
+    samples = []
+    for _ in range(runs):
+        workdir = _scratch_dir()
+        try:
+            result = subprocess.run(
+                [sys.executable, "-c", _FIRST_FRAME_SCRIPT],
+                cwd=workdir, env=_env(), capture_output=True, text=True, timeout=60
+            )
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+        if result.returncode != 0 or not result.stdout.strip():
+            raise RuntimeError(f"Window failed to start:\n{result.stderr}")
+        samples.append([float(x) for x in result.stdout.split()[-3:]])
+
+    report = {}
+    for i, name in enumerate(("import", "build", "first_frame")):
+        values = [sample[i] for sample in samples]
+        report[name] = {"median": statistics.median(values), "min": min(values)}
+    return report
+
+
+def measure_imports(top: int) -> dict:
+    """Returns the cumulative import time (seconds) of the app's modules and the slowest imports."""
+    workdir = _scratch_dir()
+    try:
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import ui"],
+            cwd=workdir, env=_env(), capture_output=True, text=True, timeout=60
+        )
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    if result.returncode != 0:
+        errors = [line for line in result.stderr.splitlines() if not line.startswith("import time:")]
+        raise RuntimeError("Importing ui failed:\n" + "\n".join(errors))
+
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cum, raw_name = line[len("import time:"):].split("|")
+        # Nested imports are indented by two spaces per level after one leading space
+        indent = len(raw_name) - len(raw_name.lstrip())
+        name = raw_name.strip()
+        if indent <= 3 or name in _APP_MODULES:
+            cumulative[name] = max(cumulative.get(name, 0), int(cum) / 1e6)
+
+    slowest = sorted(cumulative.items(), key=lambda item: item[1], reverse=True)[:top]
+    return {
+        "modules": {name: cumulative[name] for name in _APP_MODULES if name in cumulative},
+        "slowest": dict(slowest),
+    }
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Lists the metrics that got slower than the baseline by more than `tolerance`."""
+    regressions = []
+    for name, stats in current.get("first_frame", {}).items():
+        base = baseline.get("first_frame", {}).get(name)
+        if base and stats["median"] > base["median"] * (1 + tolerance):
+            regressions.append(f"{name}: {stats['median'] * 1000:.1f}ms vs {base['median'] * 1000:.1f}ms")
+    for name, seconds in current["imports"]["modules"].items():
+        base = baseline.get("imports", {}).get("modules", {}).get(name)
+        if base and seconds > base * (1 + tolerance) and seconds - base > 0.005:
+            regressions.append(f"import {name}: {seconds * 1000:.1f}ms vs {base * 1000:.1f}ms")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", "--runs", type=int, default=5, help="window start-ups to time (default: 5)")
+    parser.add_argument("--top", type=int, default=15, help="slowest imports to list (default: 15)")
+    parser.add_argument("--save", metavar="FILE", help="write the results as JSON")
+    parser.add_argument("--compare", metavar="FILE", help="compare against a saved baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="allowed slowdown vs. the baseline (default: 0.2 = 20%%)")
+    args = parser.parse_args()
+
+    results = {"python": sys.version.split()[0], "platform": sys.platform}
+    if has_display():
+        results["first_frame"] = measure_first_frame(args.runs)
+    results["imports"] = measure_imports(args.top)
+
+    if "first_frame" in results:
+        print(f"Startup ({args.runs} runs, median / min):")
+        for name, stats in results["first_frame"].items():
+            print(f"  {name:<12} {stats['median'] * 1000:8.1f}ms {stats['min'] * 1000:8.1f}ms")
+    else:
+        print("No display found: skipping time to first frame.")
+
+    print("Import time (cumulative):")
+    for name, seconds in results["imports"]["modules"].items():
+        print(f"  {name:<16} {seconds * 1000:8.1f}ms")
+    print("Slowest imports:")
+    for name, seconds in results["imports"]["slowest"].items():
+        print(f"  {name:<32} {seconds * 1000:8.1f}ms")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=4)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print("Regressions:")
+            for item in regressions:
+                print(f"  {item}")
+            return 1
+        print("No regressions.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
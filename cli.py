@@ -0,0 +1,286 @@
+"""Headless command-line entry point.
+
+Streams URLs from arguments, a file or stdin through the same download
+engine as the GUI, printing progress to the terminal. This module never
+imports tkinter, ttkthemes or the updater, so it starts fast and runs on
+machines without a display.
+
+Usage:
+    python cli.py [options] URL [URL ...]
+    python cli.py [options] -i urls.txt
+    some-command | python cli.py [options] -
+
+Exit codes:
+    0: Every download succeeded (or was already downloaded).
+    1: At least one download failed.
+    2: Bad arguments or no URLs were given.
+    3: Required binaries are missing.
+    130: Interrupted with Ctrl+C.
+"""
+import os
+import sys
+import time
+import argparse
+import threading
+from typing import Iterable, Optional
+
+import app_config
+import configManager as cfm
+from archive import DownloadArchive
+from bandwidth import budget_from_spec
+from fragments import tuner_from_spec
+from formats import AUDIO_MP3, AUDIO_NATIVE
+from postprocess import pool_from_spec
+from staging import disk_budget_from_spec, staging_from_spec
+from retry import HostBreakers, retry_from_spec
+from download import Download
+from journal import JobJournal
+from metadata import Prober
+from metrics import MetricsExporter
+from progress import ProgressEvent
+from scheduler import Job, JobState, Scheduler
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+EXIT_DEPENDENCIES = 3
+EXIT_INTERRUPTED = 130
+
+# Minimum seconds between two progress lines of the same job on a terminal
+PROGRESS_INTERVAL = 0.5
+
+
+class TerminalReporter:
+    """Prints scheduler output to the terminal.
+
+    On an interactive terminal, progress updates are redrawn in place and
+    throttled; otherwise only regular output lines are printed.
+    """
+    def __init__(self, stream=sys.stdout) -> None:
+        self.stream = stream
+        self.interactive = stream.isatty()
+        self._lock = threading.Lock()
+        self._last_progress: dict[int, float] = {}
+        self._progress_shown = False
+
+    def _print(self, text: str):
+        with self._lock:
+            if self._progress_shown:
+                # Clear the progress line before printing over it
+                self.stream.write("\r\033[K")
+                self._progress_shown = False
+            self.stream.write(text + "\n")
+            self.stream.flush()
+
+    def on_output(self, job: Job, line: str, is_progress: bool = False):
+        if is_progress:
+            if self.interactive:
+                self._show_progress(job, line)
+            return
+        self._print(f"[#{job.id}] {line}" if line else "")
+
+    def on_progress(self, job: Job, event: ProgressEvent):
+        if self.interactive:
+            self._show_progress(job, f"[Engine] {event.format()}")
+
+    def on_state(self, job: Job):
+        if job.state == JobState.FAILED and job.error and not job.children:
+            self._print(f"[#{job.id}] Download failed: {job.error}")
+
+    def _show_progress(self, job: Job, line: str):
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_progress.get(job.id, 0.0) < PROGRESS_INTERVAL:
+                return
+            self._last_progress[job.id] = now
+            self.stream.write(f"\r\033[K[#{job.id}] {line}")
+            self.stream.flush()
+            self._progress_shown = True
+
+
+def read_urls(sources: Iterable[str], files: Iterable[str]) -> list[str]:
+    """Collects URLs from arguments and from files ("-" reads stdin).
+
+    Blank lines and lines starting with "#" are ignored in files.
+    """
+    urls = []
+    for source in sources:
+        if source == "-":
+            urls.extend(_read_lines(sys.stdin))
+        else:
+            urls.append(source)
+
+    for path in files:
+        if path == "-":
+            urls.extend(_read_lines(sys.stdin))
+        else:
+            with open(path, "r", encoding="utf-8") as f:
+                urls.extend(_read_lines(f))
+    return urls
+
+def _read_lines(stream) -> list[str]:
+    return [line.strip() for line in stream if line.strip() and not line.lstrip().startswith("#")]
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="yt-dlp-simplified",
+        description="Download video/audio without the GUI."
+    )
+    parser.add_argument("urls", nargs="*", metavar="URL",
+                        help='URLs to download ("-" reads them from stdin)')
+    parser.add_argument("-i", "--input-file", action="append", default=[], metavar="FILE",
+                        help='read URLs from FILE, one per line ("-" for stdin)')
+    parser.add_argument("-o", "--output", metavar="DIR",
+                        help="save location (default: the GUI's saved location, else the current directory)")
+    parser.add_argument("-a", "--audio", action="store_true",
+                        help="save as mp3")
+    parser.add_argument("--native-audio", action="store_true",
+                        help="save only the audio, in its original format (no re-encoding); "
+                             'the default for -a when config audio_format is "native"')
+    parser.add_argument("--no-playlist", action="store_true",
+                        help="download only the video when a URL also refers to a playlist")
+    parser.add_argument("-j", "--jobs", type=int, metavar="N",
+                        help="number of simultaneous downloads (default: config max_workers, else core count)")
+    parser.add_argument("--no-probe", action="store_true",
+                        help="skip the metadata probe (disables playlist fan-out and archive skipping)")
+    parser.add_argument("--no-archive", action="store_true",
+                        help="download even if the media is in the download archive")
+    parser.add_argument("--timeout", type=float, metavar="SECONDS",
+                        help="kill a download that runs longer than this (default: config job_timeout)")
+    parser.add_argument("--idle-timeout", type=float, metavar="SECONDS",
+                        help="kill a download that prints nothing for this long (default: config idle_timeout)")
+    parser.add_argument("-r", "--limit-rate", metavar="RATE",
+                        help='total download speed shared by all downloads, e.g. "2M" '
+                             "(default: config bandwidth_limit)")
+    parser.add_argument("-N", "--concurrent-fragments", metavar="N",
+                        help='fragments of a DASH/HLS stream to download at once: "auto", a number, '
+                             'or "off" (default: config concurrent_fragments, else auto)')
+    parser.add_argument("--downloader", metavar="NAME",
+                        help='external downloader for yt-dlp to use, e.g. "aria2c" '
+                             "(default: config external_downloader)")
+    parser.add_argument("--postprocess-workers", metavar="N",
+                        help="merges/conversions to run at once, outside the download slots: a number, "
+                             '"auto" (core count) or "off" to leave them to yt-dlp '
+                             "(default: config postprocess_workers, else auto)")
+    parser.add_argument("--staging-dir", metavar="DIR",
+                        help='download and merge in DIR (a fast local disk), then move the finished files '
+                             'to the save location; "auto" uses the temp directory (default: config staging_dir)')
+    parser.add_argument("--min-free-space", metavar="SIZE",
+                        help='space to always leave free on the disks downloads write to, e.g. "1G", or "off" '
+                             'to skip the free-space check (default: config min_free_space, else 256M)')
+    parser.add_argument("--retries", metavar="N",
+                        help='times to retry a download that failed for a reason that may pass (throttling, '
+                             'network errors), with backoff, or "off" (default: config retries, else 3)')
+    parser.add_argument("--resume", action="store_true",
+                        help="journal jobs and resume unfinished ones from the last run")
+    parser.add_argument("--metrics-jsonl", metavar="FILE",
+                        help="append per-job metrics to FILE as JSON lines (default: config metrics_jsonl)")
+    parser.add_argument("--metrics-prom", metavar="FILE",
+                        help="write Prometheus textfile-collector metrics to FILE (default: config metrics_prom)")
+    return parser
+
+
+def build_metrics_exporter(args) -> Optional[MetricsExporter]:
+    """Builds the metrics exporter from the options (falling back to the config), if any file is set."""
+    jsonl_path = args.metrics_jsonl or cfm.getKeyValue("metrics_jsonl")
+    prom_path = args.metrics_prom or cfm.getKeyValue("metrics_prom")
+    if not jsonl_path and not prom_path:
+        return None
+    return MetricsExporter(jsonl_path, prom_path)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """Runs the CLI and returns its exit code."""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    try:
+        urls = read_urls(args.urls, args.input_file)
+    except OSError as e:
+        print(f"Error: Could not read URL file: {e}", file=sys.stderr)
+        return EXIT_USAGE
+
+    save_path = args.output or cfm.getKeyValue("path") or os.getcwd()
+    native = args.native_audio or cfm.getKeyValue("audio_format") == AUDIO_NATIVE
+    audio_mode = AUDIO_NATIVE if native else AUDIO_MP3
+    downloads = [Download(url, args.audio or args.native_audio, args.no_playlist, save_path, audio_mode)
+                 for url in urls]
+    invalid = [d for d in downloads if not d.verifyLink()]
+    if invalid:
+        for d in invalid:
+            print(f"Error: Invalid URL: {d.link} ({d.link_error})", file=sys.stderr)
+        return EXIT_USAGE
+
+    try:
+        bandwidth = budget_from_spec(args.limit_rate or cfm.getKeyValue("bandwidth_limit"))
+        fragments = tuner_from_spec(args.concurrent_fragments or cfm.getKeyValue("concurrent_fragments"))
+        postprocess = pool_from_spec(args.postprocess_workers or cfm.getKeyValue("postprocess_workers"))
+        disk = disk_budget_from_spec(args.min_free_space or cfm.getKeyValue("min_free_space"))
+        retry = retry_from_spec(args.retries or cfm.getKeyValue("retries"))
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return EXIT_USAGE
+
+    problems = app_config.check_dependencies()
+    if problems:
+        for item in problems:
+            print(f"Error: {item}", file=sys.stderr)
+        return EXIT_DEPENDENCIES
+
+    reporter = TerminalReporter()
+    scheduler = Scheduler(
+        max_workers=args.jobs or cfm.getKeyValue("max_workers"),
+        status_callback=reporter.on_output,
+        state_callback=reporter.on_state,
+        progress_callback=reporter.on_progress,
+        prober=None if args.no_probe or cfm.getKeyValue("probe_metadata") is False else Prober(),
+        max_per_host=cfm.getKeyValue("max_per_host"),
+        archive=None if args.no_archive or cfm.getKeyValue("use_archive") is False else DownloadArchive(),
+        journal=JobJournal() if args.resume else None,
+        metrics=build_metrics_exporter(args),
+        job_timeout=args.timeout or cfm.getKeyValue("job_timeout"),
+        idle_timeout=args.idle_timeout or cfm.getKeyValue("idle_timeout"),
+        bandwidth=bandwidth,
+        fragments=fragments,
+        downloader=args.downloader or cfm.getKeyValue("external_downloader"),
+        postprocess=postprocess,
+        staging=staging_from_spec(args.staging_dir or cfm.getKeyValue("staging_dir")),
+        disk=disk,
+        retry=retry,
+        breakers=HostBreakers() if cfm.getKeyValue("host_breakers") is not False else None
+    )
+
+    finished = False
+    try:
+        resumed = scheduler.recover()
+        if resumed:
+            print(f"Resuming {len(resumed)} unfinished download(s) from the last run...")
+        if not downloads and not resumed:
+            parser.print_usage(sys.stderr)
+            print("Error: No URLs given.", file=sys.stderr)
+            return EXIT_USAGE
+
+        scheduler.submit_many(downloads)
+
+        try:
+            # Poll rather than block, so Ctrl+C is handled promptly
+            while not scheduler.is_idle():
+                time.sleep(0.2)
+        except KeyboardInterrupt:
+            print("\nInterrupted.", file=sys.stderr)
+            return EXIT_INTERRUPTED
+        finished = True
+    finally:
+        if finished:
+            scheduler.shutdown()
+        else:
+            # yt-dlp runs in its own process group and never sees the Ctrl+C
+            scheduler.shutdown(wait=False, kill=True)
+
+    counts = scheduler.counts()
+    print(f"Finished: {counts[JobState.DONE]} succeeded, {counts[JobState.FAILED]} failed.")
+    return EXIT_FAILED if counts[JobState.FAILED] else EXIT_OK
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,18 +1,39 @@
 """This module contains functions to read, write, and validate the config.json file.
 
+The config is loaded once into a process-wide store and served from memory.
+The file is only re-parsed when its mtime or size changes, and writes are
+debounced and saved atomically (temp file + os.replace).
+
+Classes:
+    - ConfigStore: The in-memory, write-behind cache of the config file.
+
 Functions:
     - cfgExists: Checks if the config file exists.
     - setDefaultParams: Creates or resets the config file with default values.
     - readCfg: Reads the config file, creating it if it doesn't exist or is corrupt.
     - writeCfg: Writes a key-value pair to the config file.
     - getKeyValue: Retrieves a value from the config file by its key.
+    - flush: Saves any pending changes to disk immediately.
 """
 
 import os
 import json
+import stat
+import atexit
+import tempfile
+import threading
+from typing import Optional
 
 config_file = "config.json"
 
+# Seconds to wait for more changes before a write hits the disk
+WRITE_DELAY = 0.5
+
+# Read once at import: os.umask can only be read by setting it, which would
+# race with threads creating files
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
 _logger = print
 
 def set_logger(logger_func):
@@ -21,6 +42,136 @@ def set_logger(logger_func):
     _logger = logger_func
 
 
+def _default_params() -> dict:
+    return {
+    "path": ""
+    }
+
+
+def _file_mode(path: str) -> int:
+    """The permission bits for a rewrite of `path`: its current ones, or the
+    umask's default for a new file."""
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except OSError:
+        return 0o666 & ~_UMASK
+
+
+class ConfigStore:
+    """A cached view of a JSON config file.
+
+    Attributes:
+        path (str): The path of the config file.
+        write_delay (float): The debounce delay for writes, in seconds.
+    """
+    def __init__(self, path: str, write_delay: float = WRITE_DELAY) -> None:
+        self.path = path
+        self.write_delay = write_delay
+
+        self._lock = threading.RLock()
+        self._data: Optional[dict] = None
+        self._signature: Optional[tuple[int, int]] = None
+        self._pending: dict = {}
+        self._timer: Optional[threading.Timer] = None
+
+
+    def _stat(self) -> Optional[tuple[int, int]]:
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def data(self) -> dict:
+        """Returns the cached config, reloading it only if the file changed on disk."""
+        with self._lock:
+            signature = self._stat()
+            if self._data is None or signature != self._signature:
+                self._load(signature)
+            return self._data # type: ignore
+
+    def _load(self, signature: Optional[tuple[int, int]]):
+        """(Re)reads the file, resetting it to defaults if missing or corrupt."""
+        if signature is None:
+            self.reset()
+        else:
+            try:
+                with open(self.path, 'r') as f:
+                    data = json.load(f)
+                if not isinstance(data, dict):
+                    raise json.JSONDecodeError("Config root is not an object", "", 0)
+                self._data = data
+                self._signature = signature
+            except json.JSONDecodeError:
+                # File is corrupt, reset to defaults
+                self.reset()
+            except IOError as e:
+                _logger(f"Error: Could not read config file: {e}")
+                self._data = _default_params() # In-memory fallback
+                self._signature = signature
+
+        # Unsaved changes survive a reload caused by an external edit
+        self._data.update(self._pending) # type: ignore
+
+    def reset(self):
+        """Replaces the config with the defaults and saves it immediately."""
+        with self._lock:
+            self._cancel_timer()
+            self._pending.clear()
+            self._data = _default_params()
+            self._save()
+
+    def set(self, key, value):
+        """Updates a key in memory and schedules a debounced save."""
+        with self._lock:
+            self.data()[key] = value
+            self._pending[key] = value
+            if self._timer is None:
+                self._timer = threading.Timer(self.write_delay, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        """Saves pending changes now, if there are any."""
+        with self._lock:
+            self._cancel_timer()
+            if self._pending:
+                self._save()
+
+    def _cancel_timer(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _save(self):
+        """Atomically replaces the file with the in-memory config. Caller holds the lock."""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        try:
+            fd, tmp_path = tempfile.mkstemp(prefix=".config-", suffix=".tmp", dir=directory)
+            try:
+                # mkstemp creates the file 0600; keep the config's own mode
+                os.chmod(tmp_path, _file_mode(self.path))
+                with os.fdopen(fd, "w") as f:
+                    json.dump(self._data, f, indent=4)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except (IOError, OSError) as e:
+            # Handle cases where file can't be written (e.g., permissions)
+            _logger(f"Error: Could not write config file: {e}")
+            return
+
+        self._pending.clear()
+        self._signature = self._stat()
+
+
+_store = ConfigStore(config_file)
+atexit.register(_store.flush)
+
+
 def cfgExists() -> bool:
     """Checks if the 'config.json' file exists in the current directory.
 
@@ -48,56 +199,32 @@ def setDefaultParams():
     Returns:
         None
     """
-    data = {
-    "path": ""
-    }
-    try:
-        with open(config_file, "w") as f:
-            json.dump(data, f, indent=4)
-    except IOError as e:
-        # Handle cases where file can't be written (e.g., permissions)
-        _logger(f"Error: Could not write config file: {e}")
-        
+    _store.reset()
+
 
 def readCfg() -> dict:
     """Reads the 'config.json' file and returns its content.
 
     If the file does not exist or is corrupted, it will be recreated with
-    default values before reading.
+    default values before reading. The file is only parsed again when it
+    has changed on disk since the last read.
 
     Args:
         None
 
     Returns:
-        dict: A dictionary containing the configuration data.
+        dict: A copy of the configuration data.
     """
-    if not cfgExists():
-        setDefaultParams()
-    
-    try:
-        with open(config_file, 'r') as f:
-            data = json.load(f)
-    except json.JSONDecodeError:
-        # File is corrupt, reset to defaults
-        setDefaultParams()
-        try:
-            # Re-read the freshly written default file
-            with open(config_file, 'r') as f:
-                data = json.load(f)
-        except (IOError, json.JSONDecodeError) as e:
-            # If it fails again, something is badly wrong
-            _logger(f"Error: Failed to read config after reset: {e}")
-            return {"path": ""} # Return in-memory fallback
-    except IOError as e:
-        _logger(f"Error: Could not read config file: {e}")
-        return {"path": ""} # Return in-memory fallback
-        
-    return data
-        
-        
+    return dict(_store.data())
+
+
 def writeCfg(key, value):
     """Writes a key-value pair to the 'config.json' file.
 
+    The change is visible to readers immediately; the file itself is
+    written shortly afterwards, together with any other changes made in
+    the meantime.
+
     Args:
         key (str): The key to be added or updated in the config file.
         value (any): The value to be associated with the key.
@@ -105,14 +232,8 @@ def writeCfg(key, value):
     Returns:
         None
     """
-    data = readCfg() # Now robust
-    data[key] = value
-    try:
-        with open(config_file, "w") as f:
-            json.dump(data, f, indent=4)
-    except IOError as e:
-         _logger(f"Error: Could not write config update: {e}")
-        
+    _store.set(key, value)
+
 
 def getKeyValue(key):
     """Retrieves the value for a given key from the 'config.json' file.
@@ -123,6 +244,9 @@ def getKeyValue(key):
     Returns:
         any: The value associated with the key, or None if the key is not found.
     """
-    data = readCfg() # Now robust
-    return data.get(key)
-        
+    return _store.data().get(key)
+
+
+def flush():
+    """Writes any pending config changes to disk immediately."""
+    _store.flush()
@@ -0,0 +1,138 @@
+"""This module contains the ConsoleBuffer class, which renders engine output into the console widget.
+
+Output from worker threads is queued in a thread-safe buffer and drained by a
+render loop on the Tk main thread at a fixed frame rate. Each progress key
+(a job) owns one console line, found again through a Text mark and rewritten
+in place however much other output has come since, so interleaved jobs
+never add lines for their progress. The widget's scrollback is capped.
+
+Classes:
+    - ConsoleBuffer: A frame-coalesced, bounded console renderer.
+"""
+import itertools
+from collections import deque
+from typing import Hashable, Optional
+
+DEFAULT_FPS = 30
+DEFAULT_MAX_LINES = 5000
+
+
+class ConsoleBuffer:
+    """A thread-safe output buffer rendered into a tk.Text widget.
+
+    Any thread may call `write`; nothing touches Tk until the render loop runs.
+    A line written with a `progress_key` replaces the line of the last
+    update with that key, wherever it is in the console, so repeated
+    progress updates from one job only ever occupy one line.
+
+    Attributes:
+        max_lines (int): The number of lines kept in the widget's scrollback.
+        interval (int): The delay between frames, in milliseconds.
+    """
+    def __init__(self, max_lines: int = DEFAULT_MAX_LINES, fps: int = DEFAULT_FPS) -> None:
+        self.max_lines = max(1, max_lines)
+        self.interval = max(1, 1000 // max(1, fps))
+
+        # deque.append/popleft are atomic, so producers never need a lock
+        self._pending: deque = deque()
+        # The Text mark at the start of each progress key's line
+        self._marks: dict[Hashable, str] = {}
+        self._mark_ids = itertools.count()
+        self._root = None
+        self._widget = None
+
+
+    def write(self, text: str, progress_key: Optional[Hashable] = None):
+        """Queues a line for the console. Safe to call from any thread.
+
+        Args:
+            text (str): The line to show.
+            progress_key (Hashable | None): If set, the line is a progress
+                update that replaces the previous update with the same key.
+        """
+        self._pending.append((text, progress_key))
+
+    def attach(self, root, widget):
+        """Binds the buffer to a Tk root and Text widget and starts the render loop."""
+        self._root = root
+        self._widget = widget
+        self._root.after(self.interval, self._tick)
+
+    def flush(self):
+        """Renders everything queued so far. Must be called on the Tk main thread."""
+        if self._widget is None or not self._pending:
+            return
+
+        lines, updates = self._coalesce()
+        widget = self._widget
+        widget.config(state="normal")
+
+        for key, text in updates.items():
+            mark = self._marks[key]
+            widget.delete(mark, f"{mark} lineend")
+            widget.insert(mark, text)
+
+        if lines:
+            line = int(widget.index("end-1c").split(".")[0])
+            widget.insert("end", "\n".join(text for text, _ in lines) + "\n")
+            for text, key in lines:
+                if key is not None:
+                    mark = self._marks[key] = f"progress{next(self._mark_ids)}"
+                    widget.mark_set(mark, f"{line}.0")
+                    # Stays at the line start when the line is rewritten
+                    widget.mark_gravity(mark, "left")
+                # An entry with line breaks in it takes up several lines
+                line += text.count("\n") + 1
+
+        self._trim()
+        widget.config(state="disabled")
+        widget.see("end")
+
+
+    def _tick(self):
+        try:
+            self.flush()
+        finally:
+            self._root.after(self.interval, self._tick) # type: ignore
+
+    def _coalesce(self) -> tuple[list[tuple[str, Optional[Hashable]]], dict[Hashable, str]]:
+        """Drains the buffer, keeping only the newest update for each progress key.
+
+        Returns:
+            tuple: (lines to append as (text, progress key) pairs, new text for
+            the progress lines already in the widget by key)
+        """
+        lines: list[list] = []
+        updates: dict[Hashable, str] = {}
+        appended: dict[Hashable, int] = {}
+
+        while self._pending:
+            text, key = self._pending.popleft()
+            if key is None:
+                lines.append([text, None])
+            elif key in self._marks:
+                updates[key] = text
+            elif key in appended:
+                lines[appended[key]][0] = text
+            else:
+                appended[key] = len(lines)
+                lines.append([text, key])
+
+        return [(text, key) for text, key in lines], updates
+
+    def _trim(self):
+        """Drops the oldest lines once the scrollback overflows, in one bulk delete.
+
+        Trimming waits for a 10% overshoot so it happens rarely rather than
+        on every frame.
+        """
+        widget = self._widget
+        line_count = int(widget.index("end-1c").split(".")[0]) # type: ignore
+        if line_count > self.max_lines + self.max_lines // 10:
+            excess = line_count - self.max_lines
+            # Progress lines scrolled out of the widget start over at the end
+            for key, mark in list(self._marks.items()):
+                if int(widget.index(mark).split(".")[0]) <= excess: # type: ignore
+                    widget.mark_unset(mark) # type: ignore
+                    del self._marks[key]
+            widget.delete("1.0", f"{excess + 1}.0") # type: ignore
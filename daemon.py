@@ -0,0 +1,552 @@
+"""Local download daemon: one scheduler for every client on the machine.
+
+The daemon owns a single Scheduler (and with it the download slots, the
+archive, the journal and the bandwidth budget) and serves a small JSON API
+over HTTP on localhost. The GUI, scripts and `curl` all submit to it, so
+several clients on the same box share one queue instead of competing with
+each other.
+
+Endpoints:
+    GET  /api/health                  The daemon's version and engine.
+    GET  /api/jobs                    Every job.
+    POST /api/jobs                    Queues downloads: {"urls": [...], "save_path": ...,
+                                      "audio": bool, "audio_mode": "mp3"|"native",
+                                      "no_playlist": bool, "priority": int}.
+    GET  /api/jobs/ID                 One job.
+    POST /api/jobs/ID/ACTION          cancel, pause, resume, or priority ({"priority": int}).
+    POST /api/ACTION                  cancel-all, pause-all or resume-all.
+    GET  /api/counts                  The number of jobs in each state.
+    GET  /api/events[?job=ID]         A Server-Sent Events stream: a "snapshot" of every
+                                      job, then "state", "progress" and "output" events.
+
+Every request must carry `Authorization: Bearer TOKEN`; unless one is
+configured, the daemon generates a token on first start and saves it as
+`daemon_token` in config.json, where local clients find it. POST and
+DELETE requests must be sent as application/json even without a body,
+which browsers can't do cross-origin without a preflight the daemon never
+answers, and requests whose Host or Origin isn't this machine are refused,
+so web pages can't reach the API through DNS rebinding either.
+
+Usage:
+    python daemon.py [--host HOST] [--port PORT] [--token TOKEN] [-j N]
+
+Classes:
+    - EventHub: Fans scheduler callbacks out to the event streams.
+    - JobServer: The HTTP server that exposes a Scheduler.
+
+Functions:
+    - job_to_dict: Serializes a job for the API.
+"""
+import os
+import sys
+import json
+import hmac
+import queue
+import secrets
+import ipaddress
+import signal
+import argparse
+import threading
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+from typing import Optional
+
+import app_config
+import configManager as cfm
+from archive import DownloadArchive
+from bandwidth import budget_from_spec
+from fragments import tuner_from_spec
+from formats import AUDIO_MODES, AUDIO_MP3
+from postprocess import pool_from_spec
+from staging import disk_budget_from_spec, staging_from_spec
+from retry import HostBreakers, retry_from_spec
+from download import Download
+from journal import JobJournal
+from metadata import Prober
+from metrics import MetricsExporter
+from progress import ProgressEvent
+from scheduler import Job, JobState, Scheduler
+from version import __version__
+
+# Seconds between keep-alive comments on an idle event stream
+KEEPALIVE_INTERVAL = 15.0
+# Events a slow stream may fall behind by before it is dropped (its client
+# reconnects and gets a fresh snapshot)
+EVENT_BACKLOG = 2048
+# Largest request body accepted, in bytes
+MAX_BODY = 1 << 20
+
+
+def job_to_dict(job: Job) -> dict:
+    """Serializes a job for the API."""
+    return {
+        "id": job.id,
+        "uid": job.uid,
+        "url": job.download.link,
+        "state": job.state.value,
+        "error": job.error,
+        "priority": job.priority,
+        "host": job.host,
+        "parent": job.parent.id if job.parent else None,
+        "index": job.index,
+        "children": [child.id for child in job.children],
+        "title": (job.info or {}).get("title"),
+        "audio": job.download.aud_only,
+        "audio_mode": job.download.audio_mode,
+        "no_playlist": job.download.ignore_playlist,
+        "save_path": job.download.save_path,
+        "files": list(job.files),
+        "skipped": job.skipped,
+        "processing": job.processing,
+        "engine_version": job.engine_version,
+        "engine_path": job.download.yt_dlp_exe,
+        "progress": job.progress._asdict() if job.progress else None,
+    }
+
+
+class _Stream:
+    """One subscriber's event queue."""
+    def __init__(self, job_id: Optional[int]) -> None:
+        self.job_id = job_id
+        self.events: queue.Queue = queue.Queue(EVENT_BACKLOG)
+        self.overflowed = False
+
+
+class EventHub:
+    """Fans scheduler callbacks out to every open event stream.
+
+    Pass its `on_output`, `on_state` and `on_progress` to the Scheduler.
+    They run on the supervisor's loop thread and never block: a stream that
+    falls `EVENT_BACKLOG` events behind is dropped instead.
+    """
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._streams: list[_Stream] = []
+
+    def subscribe(self, job_id: Optional[int] = None) -> _Stream:
+        """Opens a stream of every job's events, or only those of `job_id`."""
+        stream = _Stream(job_id)
+        with self._lock:
+            self._streams.append(stream)
+        return stream
+
+    def unsubscribe(self, stream: _Stream):
+        with self._lock:
+            if stream in self._streams:
+                self._streams.remove(stream)
+
+    def publish(self, event: str, job: Job, data: dict):
+        with self._lock:
+            streams = list(self._streams)
+        for stream in streams:
+            if stream.job_id is not None and stream.job_id not in (job.id, job.parent and job.parent.id):
+                continue
+            try:
+                stream.events.put_nowait((event, data))
+            except queue.Full:
+                stream.overflowed = True
+
+    def on_output(self, job: Job, line: str, is_progress: bool = False):
+        self.publish("output", job, {"job": job.id, "line": line, "progress": is_progress})
+
+    def on_state(self, job: Job):
+        self.publish("state", job, job_to_dict(job))
+
+    def on_progress(self, job: Job, event: ProgressEvent):
+        self.publish("progress", job, {"job": job.id, **event._asdict()})
+
+
+class _ApiError(Exception):
+    def __init__(self, status: HTTPStatus, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+def _parse_priority(value) -> int:
+    try:
+        return int(value or 0)
+    except (TypeError, ValueError):
+        raise _ApiError(HTTPStatus.BAD_REQUEST, f"Invalid priority: {value!r}") from None
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Routes one API request. `self.server` is the JobServer's HTTP server."""
+    server_version = f"yt-dlp-simplified/{__version__}"
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def api(self) -> "JobServer":
+        return self.server.api
+
+    def log_message(self, format, *args):
+        # The API is polled; access logs would only be noise
+        pass
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+    def _dispatch(self, method: str):
+        url = urlsplit(self.path)
+        parts = [part for part in url.path.split("/") if part]
+        try:
+            self._check_origin()
+            self._authorize(url)
+            if parts[:1] != ["api"]:
+                raise _ApiError(HTTPStatus.NOT_FOUND, "Not found")
+            body = self._read_body() if method != "GET" else {}
+            route = parts[1:]
+
+            if route == ["events"] and method == "GET":
+                return self._stream_events(url)
+            self._send_json(HTTPStatus.OK, self._route(method, route, body))
+        except _ApiError as e:
+            # The body may be unread; don't reuse the connection
+            self.close_connection = True
+            self._send_json(e.status, {"error": str(e)})
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def _route(self, method: str, route: list[str], body: dict):
+        api = self.api
+        if route == ["health"] and method == "GET":
+            return api.health()
+        if route == ["counts"] and method == "GET":
+            return {state.value: count for state, count in api.scheduler.counts().items()}
+        if route == ["jobs"]:
+            if method == "GET":
+                return {"jobs": [job_to_dict(job) for job in api.scheduler.jobs()]}
+            if method == "POST":
+                return {"jobs": [job_to_dict(job) for job in api.submit(body)]}
+        if len(route) >= 2 and route[0] == "jobs":
+            job = api.job(route[1])
+            if len(route) == 2 and method == "GET":
+                return job_to_dict(job)
+            if len(route) == 2 and method == "DELETE":
+                return {"ok": api.scheduler.cancel(job)}
+            if len(route) == 3 and method == "POST":
+                return {"ok": api.job_action(job, route[2], body)}
+        if len(route) == 1 and method == "POST":
+            return {"count": api.bulk_action(route[0])}
+        raise _ApiError(HTTPStatus.NOT_FOUND, "Not found")
+
+    def _check_origin(self):
+        # A page that rebinds its own name to 127.0.0.1 still sends that name
+        host = urlsplit("//" + self.headers.get("Host", "")).hostname
+        if not host or not self.api.is_local(host):
+            raise _ApiError(HTTPStatus.FORBIDDEN, "Requests must be addressed to this machine")
+        origin = self.headers.get("Origin")
+        if origin is not None:
+            origin = urlsplit(origin)
+            if origin.scheme not in ("http", "https") or not origin.hostname or not self.api.is_local(origin.hostname):
+                raise _ApiError(HTTPStatus.FORBIDDEN, "Cross-origin requests are not allowed")
+
+    def _authorize(self, url):
+        token = self.api.token
+        if not token:
+            return
+        given = self.headers.get("Authorization", "")
+        given = given[7:] if given.startswith("Bearer ") else parse_qs(url.query).get("token", [""])[0]
+        if not hmac.compare_digest(given.encode(), token.encode()):
+            raise _ApiError(HTTPStatus.UNAUTHORIZED, "Missing or wrong token")
+
+    def _read_body(self) -> dict:
+        # Checked even without a body: a form POST or sendBeacon needs no preflight
+        if self.headers.get_content_type() != "application/json":
+            raise _ApiError(HTTPStatus.UNSUPPORTED_MEDIA_TYPE, "Send requests as application/json")
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            raise _ApiError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length")
+        if length > MAX_BODY:
+            raise _ApiError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Request body too large")
+        raw = self.rfile.read(length) if length else b""
+        if not raw:
+            return {}
+        try:
+            body = json.loads(raw)
+        except ValueError:
+            raise _ApiError(HTTPStatus.BAD_REQUEST, "Invalid JSON") from None
+        if not isinstance(body, dict):
+            raise _ApiError(HTTPStatus.BAD_REQUEST, "Expected a JSON object")
+        return body
+
+    def _send_json(self, status: HTTPStatus, data):
+        payload = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _stream_events(self, url):
+        query = parse_qs(url.query)
+        job_id = None
+        if "job" in query:
+            job_id = self.api.job(query["job"][0]).id
+
+        stream = self.api.hub.subscribe(job_id)
+        try:
+            # Subscribed first, so nothing between the snapshot and the events is lost
+            jobs = [job_to_dict(job) for job in self.api.scheduler.jobs()
+                    if job_id is None or job_id in (job.id, job.parent and job.parent.id)]
+            self.send_response(HTTPStatus.OK)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+            self._send_event("snapshot", {"jobs": jobs})
+
+            while not self.api.stopping.is_set() and not stream.overflowed:
+                try:
+                    event, data = stream.events.get(timeout=KEEPALIVE_INTERVAL)
+                except queue.Empty:
+                    self.wfile.write(b": keep-alive\n\n")
+                    self.wfile.flush()
+                    continue
+                self._send_event(event, data)
+        finally:
+            self.api.hub.unsubscribe(stream)
+
+    def _send_event(self, event: str, data: dict):
+        self.wfile.write(f"event: {event}\ndata: {json.dumps(data)}\n\n".encode("utf-8"))
+        self.wfile.flush()
+
+
+class JobServer:
+    """Serves a Scheduler's jobs over the local HTTP API.
+
+    Attributes:
+        scheduler (Scheduler): The scheduler every client shares.
+        hub (EventHub): The hub the scheduler's callbacks publish to.
+        token (str | None): The token every request must carry. One is
+            generated if None is passed; an empty string disables the check.
+        default_save_path (str | None): Where downloads are saved when a
+            request doesn't say.
+    """
+    def __init__(self, scheduler: Scheduler, hub: EventHub,
+                 host: str = app_config.DAEMON_HOST, port: int = app_config.DAEMON_PORT,
+                 token: Optional[str] = None, default_save_path: Optional[str] = None) -> None:
+        self.scheduler = scheduler
+        self.hub = hub
+        self.token = secrets.token_urlsafe(24) if token is None else (token or None)
+        self.host = host
+        self.default_save_path = default_save_path or None
+        self.stopping = threading.Event()
+        self._httpd = ThreadingHTTPServer((host, port), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.api = self
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """The base URL the server listens on."""
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def serve_forever(self):
+        """Serves requests on the calling thread until `shutdown`."""
+        self._httpd.serve_forever(poll_interval=0.25)
+
+    def start(self) -> "JobServer":
+        """Serves requests on a background thread."""
+        self._thread = threading.Thread(target=self.serve_forever, name="job-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def shutdown(self):
+        """Stops serving and closes the event streams (the scheduler is left alone)."""
+        self.stopping.set()
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+
+    def is_local(self, host: str) -> bool:
+        """Whether a Host or Origin name refers to this machine."""
+        host = host.lower().rstrip(".")
+        if host == "localhost" or host.endswith(".localhost") or host == self.host.lower():
+            return True
+        try:
+            return ipaddress.ip_address(host).is_loopback
+        except ValueError:
+            return False
+
+    def health(self) -> dict:
+        return {
+            "version": __version__,
+            "engine": app_config.binary_version(app_config.engine_path()),
+            "workers": self.scheduler.max_workers,
+        }
+
+    def job(self, job_id) -> Job:
+        """Looks a job up by its ID."""
+        try:
+            job_id = int(job_id)
+        except (TypeError, ValueError):
+            raise _ApiError(HTTPStatus.NOT_FOUND, f"No job {job_id}") from None
+        for job in self.scheduler.jobs():
+            if job.id == job_id:
+                return job
+        raise _ApiError(HTTPStatus.NOT_FOUND, f"No job {job_id}")
+
+    def submit(self, body: dict) -> list[Job]:
+        """Validates a submission and queues its downloads."""
+        urls = body.get("urls")
+        if urls is None and body.get("url"):
+            urls = [body["url"]]
+        if not isinstance(urls, list) or not urls or not all(isinstance(url, str) for url in urls):
+            raise _ApiError(HTTPStatus.BAD_REQUEST, 'Expected "urls": a list of URLs')
+
+        save_path = body.get("save_path") or self.default_save_path
+        if not isinstance(save_path, str) or not os.path.isabs(save_path):
+            raise _ApiError(HTTPStatus.BAD_REQUEST, 'Expected "save_path": an absolute directory path')
+        audio_mode = body.get("audio_mode") or AUDIO_MP3
+        if audio_mode not in AUDIO_MODES:
+            raise _ApiError(HTTPStatus.BAD_REQUEST, f"Invalid audio_mode: {audio_mode!r}")
+        priority = _parse_priority(body.get("priority"))
+
+        downloads = [Download(url.strip(), bool(body.get("audio")), bool(body.get("no_playlist")),
+                              save_path, audio_mode) for url in urls]
+        invalid = [f"{d.link} ({d.link_error})" for d in downloads if not d.verifyLink()]
+        if invalid:
+            raise _ApiError(HTTPStatus.BAD_REQUEST, "Invalid URL: " + ", ".join(invalid))
+        return self.scheduler.submit_many(downloads, priority)
+
+    def job_action(self, job: Job, action: str, body: dict) -> bool:
+        if action == "cancel":
+            return self.scheduler.cancel(job)
+        if action == "pause":
+            return self.scheduler.pause(job)
+        if action == "resume":
+            return self.scheduler.resume(job)
+        if action == "priority":
+            self.scheduler.set_priority(job, _parse_priority(body.get("priority")))
+            return True
+        raise _ApiError(HTTPStatus.NOT_FOUND, f"Unknown action: {action}")
+
+    def bulk_action(self, action: str) -> int:
+        if action == "cancel-all":
+            return self.scheduler.cancel_all()
+        if action == "pause-all":
+            return self.scheduler.pause_all()
+        if action == "resume-all":
+            return self.scheduler.resume_all()
+        raise _ApiError(HTTPStatus.NOT_FOUND, "Not found")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="yt-dlp-simplified-daemon",
+        description="Run one download queue for every client on this machine."
+    )
+    parser.add_argument("--host", metavar="HOST",
+                        help=f"address to listen on (default: config daemon_host, else {app_config.DAEMON_HOST})")
+    parser.add_argument("--port", type=int, metavar="PORT",
+                        help=f"port to listen on (default: config daemon_port, else {app_config.DAEMON_PORT})")
+    parser.add_argument("--token", metavar="TOKEN",
+                        help="require this bearer token on every request (default: config daemon_token, "
+                             "else a new one that is saved there)")
+    parser.add_argument("-j", "--jobs", type=int, metavar="N",
+                        help="number of simultaneous downloads (default: config max_workers, else core count)")
+    parser.add_argument("--no-resume", action="store_true",
+                        help="don't journal jobs or resume unfinished ones from the last run")
+    return parser
+
+
+def build_scheduler(args, hub: EventHub) -> Scheduler:
+    """Builds the shared scheduler from the options and the config.
+
+    Raises:
+        ValueError: If a limit in the config can't be parsed.
+    """
+    jsonl_path = cfm.getKeyValue("metrics_jsonl")
+    prom_path = cfm.getKeyValue("metrics_prom")
+    return Scheduler(
+        max_workers=args.jobs or cfm.getKeyValue("max_workers"),
+        status_callback=hub.on_output,
+        state_callback=hub.on_state,
+        progress_callback=hub.on_progress,
+        prober=Prober() if cfm.getKeyValue("probe_metadata") is not False else None,
+        max_per_host=cfm.getKeyValue("max_per_host"),
+        archive=DownloadArchive() if cfm.getKeyValue("use_archive") is not False else None,
+        journal=None if args.no_resume else JobJournal(),
+        metrics=MetricsExporter(jsonl_path, prom_path) if jsonl_path or prom_path else None,
+        job_timeout=cfm.getKeyValue("job_timeout"),
+        idle_timeout=cfm.getKeyValue("idle_timeout"),
+        bandwidth=budget_from_spec(cfm.getKeyValue("bandwidth_limit")),
+        fragments=tuner_from_spec(cfm.getKeyValue("concurrent_fragments")),
+        downloader=cfm.getKeyValue("external_downloader"),
+        postprocess=pool_from_spec(cfm.getKeyValue("postprocess_workers")),
+        staging=staging_from_spec(cfm.getKeyValue("staging_dir")),
+        disk=disk_budget_from_spec(cfm.getKeyValue("min_free_space")),
+        retry=retry_from_spec(cfm.getKeyValue("retries")),
+        breakers=HostBreakers() if cfm.getKeyValue("host_breakers") is not False else None
+    )
+
+
+def _interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """Runs the daemon until it is interrupted and returns its exit code."""
+    args = build_parser().parse_args(argv)
+
+    problems = app_config.check_dependencies()
+    if problems:
+        for item in problems:
+            print(f"Error: {item}", file=sys.stderr)
+        return 3
+
+    hub = EventHub()
+    try:
+        scheduler = build_scheduler(args, hub)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+
+    host = args.host or cfm.getKeyValue("daemon_host") or app_config.DAEMON_HOST
+    port = args.port or cfm.getKeyValue("daemon_port") or app_config.DAEMON_PORT
+    try:
+        server = JobServer(scheduler, hub, host, port,
+                           token=args.token or cfm.getKeyValue("daemon_token") or None,
+                           default_save_path=cfm.getKeyValue("path"))
+    except OSError as e:
+        print(f"Error: Could not listen on {host}:{port}: {e}", file=sys.stderr)
+        scheduler.shutdown(wait=False)
+        return 2
+    if not args.token and not cfm.getKeyValue("daemon_token"):
+        # Local clients read it from the config
+        cfm.writeCfg("daemon_token", server.token)
+        cfm.flush()
+        print("Generated an API token and saved it as daemon_token in config.json")
+
+    resumed = scheduler.recover()
+    print(f"Serving the download queue on {server.url}"
+          + (f" ({len(resumed)} unfinished download(s) resumed)" if resumed else ""))
+
+    signal.signal(signal.SIGTERM, _interrupt)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Stopping; unfinished downloads resume on the next start.")
+    finally:
+        server.shutdown()
+        # Interrupted jobs stay unfinished in the journal
+        scheduler.shutdown(wait=False, kill=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,10 +5,16 @@ Classes:
 """
 import os
 import sys
+import copy
+import asyncio
 import subprocess
-import re
-from typing import Callable
-from app_config import DEPENDENCY_PATHS
+from typing import Callable, Optional
+from app_config import DEPENDENCY_PATHS, engine_path
+from supervisor import ProcessSupervisor, ProcessTimeout
+from progress import CompletedFile, ProgressEvent, parse_file_line, parse_progress_line, progress_args
+from formats import AUDIO_MP3, FormatPlan, plan_for
+from postprocess import RAW_TEMPLATE
+from urls import CanonicalURL, UnsupportedURL, canonicalize
 
 class Download:
     """A class to represent a download operation.
@@ -17,73 +23,204 @@ class Download:
         link (str): The URL of the video to download.
         aud_only (bool): A flag to indicate whether to download only the audio.
         save_path (str): The directory where the downloaded file will be saved.
-        yt_dlp_exe (str): The path to the yt-dlp executable.
+        audio_mode (str): "mp3" to convert audio to mp3, "native" to keep its original codec.
+        yt_dlp_exe (str): The path to the yt-dlp executable (the engine active
+            when the download was created; the scheduler re-pins it when the job starts).
         ffmpeg_loc (str): The path to the ffmpeg executable.
+        canonical (CanonicalURL | None): The normalized link and its IDs, once
+            `verifyLink` has accepted it.
+        link_error (str | None): Why `verifyLink` rejected the link.
     """
-    def __init__(self, link: str, aud_only: bool, ignore_playlist: bool, save_path: str) -> None:
+    def __init__(self, link: str, aud_only: bool, ignore_playlist: bool, save_path: str,
+                 audio_mode: str = AUDIO_MP3) -> None:
         self.link = link
         self.aud_only = aud_only
         self.ignore_playlist = ignore_playlist
         self.save_path = save_path
+        self.audio_mode = audio_mode
 
-        self.yt_dlp_exe = DEPENDENCY_PATHS.yt_dlp
+        self.yt_dlp_exe = engine_path()
         self.ffmpeg_loc = DEPENDENCY_PATHS.ffmpeg
+        self.canonical: Optional[CanonicalURL] = None
+        self.link_error: Optional[str] = None
 
     
+    def to_dict(self) -> dict:
+        """Serializes the download options (e.g. for the job journal)."""
+        return {
+            "link": self.link,
+            "aud_only": self.aud_only,
+            "ignore_playlist": self.ignore_playlist,
+            "save_path": self.save_path,
+            "audio_mode": self.audio_mode,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Download":
+        """Recreates a download from `to_dict` output."""
+        return cls(data["link"], data["aud_only"], data["ignore_playlist"], data["save_path"],
+                   data.get("audio_mode") or AUDIO_MP3)
+
+
+    def for_entry(self, link: str) -> "Download":
+        """Returns a copy of this download for a single playlist entry."""
+        entry = copy.copy(self)
+        entry.link = link
+        entry.ignore_playlist = True
+        entry.canonical = None
+        return entry
+
+
     def verifyLink(self) -> bool:
-        """ Verifies if the input string is a link"""
-        if self.link.startswith(('https://', 'http://', 'www.')) and len(self.link) > 10:
-             return True
+        """Checks the link without spawning anything, and normalizes it (see urls.py).
 
-        return False
+        On success `link` is replaced by the canonical URL and `canonical`
+        holds its IDs; otherwise `link_error` says what is wrong with it.
+        """
+        try:
+            self.canonical = canonicalize(self.link)
+        except UnsupportedURL as e:
+            self.link_error = str(e)
+            return False
+        self.link = self.canonical.url
+        self.link_error = None
+        return True
+
+    def media_key(self) -> str:
+        """Returns a key that is the same for every download of the same media
+        (see urls.CanonicalURL.key), or the link itself if it can't be parsed."""
+        if self.canonical is None:
+            try:
+                self.canonical = canonicalize(self.link)
+            except UnsupportedURL:
+                return self.link
+        return self.canonical.key(playlist=not self.ignore_playlist)
     
 
-    def _build_command(self) -> list[str]:
-        """Builds the yt-dlp command list based on user options."""
-        
-        output_template = os.path.join(self.save_path, "%(title)s.%(ext)s")
+    def _build_command(self, rate_limit: Optional[float] = None,
+                       fragments: Optional[int] = None,
+                       downloader: Optional[str] = None,
+                       plan: Optional[FormatPlan] = None,
+                       raw: bool = False,
+                       work_dir: Optional[str] = None) -> list[str]:
+        """Builds the yt-dlp command list based on user options.
+
+        Args:
+            rate_limit (float | None): The download speed limit in bytes per second.
+            fragments (int | None): How many fragments of a DASH/HLS stream to
+                download at once (connections per file with aria2c).
+            downloader (str | None): An external downloader (name or path) to use
+                instead of yt-dlp's own.
+            plan (FormatPlan | None): The formats to download; planned without
+                metadata if not given (see formats.py).
+            raw (bool): Save the plan's streams as separate files without
+                merging or converting them (see postprocess.py).
+            work_dir (str | None): Download (and merge) in this folder instead
+                of the save location (see staging.py).
+        """
+        if plan is None:
+            plan = plan_for(self.aud_only, self.audio_mode)
+
+        output_template = os.path.join(work_dir or self.save_path, RAW_TEMPLATE if raw else "%(title)s.%(ext)s")
 
         # Base command with essential flags for good console output
         cmd = [
             self.yt_dlp_exe,
             "--ffmpeg-location", self.ffmpeg_loc,
             "--quiet",
+            "--continue",       # Resume from .part files left by an interrupted run
             "--progress",       # Show progress in output
+            *progress_args(),   # ...as machine-readable lines (see progress.py)
         ]
 
+        if rate_limit:
+            cmd.extend(["--limit-rate", str(int(rate_limit))])
+
+        if fragments and fragments > 1:
+            cmd.extend(["--concurrent-fragments", str(fragments)])
+
+        if downloader:
+            cmd.extend(["--downloader", downloader])
+            if fragments and fragments > 1 and os.path.basename(downloader).lower().startswith("aria2c"):
+                # aria2c also splits plain (unfragmented) files across connections
+                cmd.extend(["--downloader-args", f"aria2c:-x {fragments} -s {fragments} -k 1M"])
+
         if self.ignore_playlist:
             cmd.append("--no-playlist")
 
-        if self.aud_only:
-            # Audio-only command
-            cmd.extend([
-                "-x",  # Extract audio
-                "--audio-format", "mp3",
-                "-o", output_template,
-                self.link
-            ])
-        else:
-            # Video command (best video + best audio, merge to mp4)
-            cmd.extend([
-                "-f", "bestvideo+bestaudio",
-                "--merge-output-format", "mp4",
-                "-o", output_template,
-                self.link
-            ])
-            
+        # Format selection, and audio extraction or merging (see formats.py)
+        cmd.extend(plan.raw_args() if raw else plan.args())
+        cmd.extend([
+            "-o", output_template,
+            self.link
+        ])
+
         return cmd
 
 
-    def run_download(self, status_callback: Callable[[str, bool], None]):
+    def _line_handler(self,
+                      status_callback: Callable[[str, bool], None],
+                      progress_callback: Optional[Callable[[ProgressEvent], None]],
+                      file_callback: Optional[Callable[[CompletedFile], None]]) -> Callable[[str], None]:
+        """Returns a function that routes one line of yt-dlp output to the callbacks."""
+        def handle(line: str):
+            event = parse_progress_line(line)
+            if event is not None:
+                if progress_callback is not None:
+                    progress_callback(event)
+                else:
+                    status_callback(f"[Engine] {event.format()}", True)
+                return
+
+            completed = parse_file_line(line)
+            if completed is not None:
+                if file_callback is not None:
+                    file_callback(completed)
+                else:
+                    status_callback(f"[Engine] Saved: {completed.filepath}", False)
+                return
+
+            clean_line = line.strip()
+            if clean_line == "":
+                status_callback("", False)
+            else:
+                status_callback(f"[Engine] {clean_line}", False)
+
+        return handle
+
+    def _report_exit(self, returncode: int, status_callback: Callable[[str, bool], None]) -> bool:
+        if returncode != 0:
+            status_callback(f"[Engine] Process exited with error code: {returncode}", False)
+            return False
+
+        status_callback("[Engine] Download successful!", False)
+        return True
+
+
+    def run_download(self,
+                     status_callback: Callable[[str, bool], None],
+                     progress_callback: Optional[Callable[[ProgressEvent], None]] = None,
+                     file_callback: Optional[Callable[[CompletedFile], None]] = None) -> bool:
         """
         Runs the yt-dlp download command and sends real-time output
-        to the provided callback function.
+        to the provided callback function. Blocks the calling thread;
+        see `run_download_async` for the supervised variant.
+
+        Progress updates are parsed into ProgressEvent objects and sent to
+        `progress_callback`. Without one, they are formatted and sent to
+        `status_callback` as progress lines instead. Each finished file is
+        sent to `file_callback`, or reported through `status_callback`.
+
+        Returns:
+            bool: True if yt-dlp exited successfully, False otherwise.
         """
         try:
             cmd = self._build_command()
         except Exception as e:
             status_callback(f"Error building command: {e}", False)
-            return
+            return False
+
+        handle_line = self._line_handler(status_callback, progress_callback, file_callback)
 
         # Hide console window on Windows
         creation_flags = subprocess.CREATE_NO_WINDOW if sys.platform == "win32" else 0
@@ -103,25 +240,66 @@ class Download:
                 if proc.stdout is not None:
                     # Read output line by line in real-time
                     for line in proc.stdout:
-                        clean_line = line.strip()
-                        if "Unknown" in clean_line:
-                            continue
-                            
-                        # yt-dlp's progress output usually looks like "[download]   0.1% of" or "[download] 100% of"
-                        is_progress = bool(re.search(r"\[download\]\s+\d+(\.\d+)?%\s+of", clean_line))
-                        
-                        if clean_line == "":
-                            status_callback(f"")
-                        else:
-                            status_callback(f"[Engine] {clean_line}", is_progress)
+                        handle_line(line)
                 
                 proc.wait()
-                if proc.returncode != 0:
-                    status_callback(f"[Engine] Process exited with error code: {proc.returncode}", False)
-                else:
-                    status_callback(f"[Engine] Download successful!", False)
+                return self._report_exit(proc.returncode, status_callback)
 
         except FileNotFoundError:
             status_callback(f"Error: Executable not found at {self.yt_dlp_exe}", False)
         except Exception as e:
-            status_callback(f"An unexpected error occurred: {e}", False)
\ No newline at end of file
+            status_callback(f"An unexpected error occurred: {e}", False)
+        return False
+
+
+    async def run_download_async(self,
+                                 supervisor: ProcessSupervisor,
+                                 status_callback: Callable[[str, bool], None],
+                                 progress_callback: Optional[Callable[[ProgressEvent], None]] = None,
+                                 file_callback: Optional[Callable[[CompletedFile], None]] = None,
+                                 timeout: Optional[float] = None,
+                                 idle_timeout: Optional[float] = None,
+                                 rate_limit: Optional[float] = None,
+                                 fragments: Optional[int] = None,
+                                 downloader: Optional[str] = None,
+                                 plan: Optional[FormatPlan] = None,
+                                 raw: bool = False,
+                                 work_dir: Optional[str] = None) -> bool:
+        """
+        Runs the download as a process supervised by `supervisor`, on its
+        event loop. Callbacks work as in `run_download` and are called on
+        the loop thread. Cancelling the coroutine kills the process tree.
+
+        Args:
+            timeout (float | None): Seconds the download may take in total.
+            idle_timeout (float | None): Seconds yt-dlp may go without output.
+            rate_limit (float | None): The download speed limit in bytes per second.
+            fragments (int | None): Fragments to download at once.
+            downloader (str | None): An external downloader to use.
+            plan (FormatPlan | None): The formats to download.
+            raw (bool): Leave the streams unmerged and unconverted.
+            work_dir (str | None): The folder to download in, if not the save location.
+
+        Returns:
+            bool: True if yt-dlp exited successfully, False otherwise.
+        """
+        try:
+            cmd = self._build_command(rate_limit, fragments, downloader, plan, raw, work_dir)
+        except Exception as e:
+            status_callback(f"Error building command: {e}", False)
+            return False
+
+        handle_line = self._line_handler(status_callback, progress_callback, file_callback)
+
+        try:
+            returncode = await supervisor.run_process(cmd, handle_line, timeout, idle_timeout)
+            return self._report_exit(returncode, status_callback)
+        except FileNotFoundError:
+            status_callback(f"Error: Executable not found at {self.yt_dlp_exe}", False)
+        except ProcessTimeout as e:
+            status_callback(f"[Engine] {e}", False)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            status_callback(f"An unexpected error occurred: {e}", False)
+        return False
@@ -0,0 +1,220 @@
+"""This module chooses the formats a download asks yt-dlp for.
+
+The goal is to never re-encode unless asked to. Streams are paired so
+ffmpeg only has to remux them (copy them into a container): H.264 video
+goes with AAC audio in mp4, VP9 with Opus in webm, and anything else into
+mkv. With probed metadata the exact format IDs are picked; without it,
+yt-dlp's format sorting is told the same preferences. Audio is either
+converted to mp3 (a transcode) or kept in its native codec ("native").
+
+Plans whose streams are known up front also carry a raw selector, which
+downloads them without any yt-dlp post-processing so the app can merge or
+convert them itself, outside the download slot (see postprocess.py).
+
+Classes:
+    - FormatPlan: The yt-dlp options for a download, and what they cost.
+
+Functions:
+    - plan_for: Plans the formats of a download.
+    - classify: Tells from the post-processors that ran whether a job remuxed or transcoded.
+    - estimate_size: Estimates how many bytes a plan downloads.
+"""
+from typing import NamedTuple, Optional
+
+AUDIO_MP3 = "mp3"
+AUDIO_NATIVE = "native"
+AUDIO_MODES = (AUDIO_MP3, AUDIO_NATIVE)
+
+# What a download costs after the bytes have landed
+PROCESSING_NONE = "none"
+PROCESSING_REMUX = "remux"
+PROCESSING_TRANSCODE = "transcode"
+
+# Codecs each container takes without re-encoding, most compatible first
+_MP4_VIDEO = ("avc1", "avc3", "h264", "hvc1", "hev1", "h265", "av01")
+_MP4_AUDIO = ("mp4a", "aac", "mp3", "ac-3", "ec-3")
+_WEBM_VIDEO = ("vp8", "vp9", "vp09", "av01")
+_WEBM_AUDIO = ("opus", "vorbis")
+
+# Without metadata: highest resolution first, then H.264 and AAC over other codecs
+_DEFAULT_SORT = "res,vcodec:h264,acodec:aac"
+
+
+class FormatPlan(NamedTuple):
+    """The yt-dlp options for a download, and what they cost.
+
+    Attributes:
+        selector (str): The `-f` format selector.
+        sort (str | None): The `-S` format sort order.
+        merge_format (str | None): `--merge-output-format` for video.
+        audio_format (str | None): `--audio-format` when extracting audio.
+        processing (str): The expected post-processing: "none", "remux" or "transcode".
+        description (str): A human-readable summary.
+        raw_selector (str | None): A `-f` selector that downloads the streams
+            as separate, unprocessed files, if the app can process them itself.
+    """
+    selector: str
+    sort: Optional[str] = None
+    merge_format: Optional[str] = None
+    audio_format: Optional[str] = None
+    processing: str = PROCESSING_REMUX
+    description: str = ""
+    raw_selector: Optional[str] = None
+
+    def args(self) -> list[str]:
+        """Returns the yt-dlp arguments for the plan."""
+        args = ["-f", self.selector]
+        if self.sort:
+            args.extend(["-S", self.sort])
+        if self.audio_format:
+            args.extend(["-x", "--audio-format", self.audio_format])
+        elif self.merge_format:
+            args.extend(["--merge-output-format", self.merge_format])
+        return args
+
+    def raw_args(self) -> list[str]:
+        """Returns the yt-dlp arguments that download the streams without processing them."""
+        return ["-f", self.raw_selector or self.selector]
+
+
+def _codec(value: Optional[str]) -> str:
+    return (value or "none").split(".")[0].lower()
+
+def _is_video(fmt: dict) -> bool:
+    return _codec(fmt.get("vcodec")) != "none"
+
+def _is_audio(fmt: dict) -> bool:
+    return _codec(fmt.get("acodec")) != "none"
+
+def _describe(fmt: dict) -> str:
+    parts = []
+    if fmt.get("height"):
+        parts.append(f"{fmt['height']}p")
+    if _is_video(fmt):
+        parts.append(_codec(fmt.get("vcodec")))
+    if _is_audio(fmt):
+        parts.append(_codec(fmt.get("acodec")))
+    return " ".join(parts) or str(fmt.get("format_id"))
+
+
+def plan_for(aud_only: bool, audio_mode: str = AUDIO_MP3, info: Optional[dict] = None) -> FormatPlan:
+    """Plans the formats of a download.
+
+    Args:
+        aud_only (bool): Whether only the audio is wanted.
+        audio_mode (str): "mp3" to convert audio to mp3, "native" to keep its codec.
+        info (dict | None): The probed metadata summary; its "formats" make
+            the plan exact.
+
+    Returns:
+        FormatPlan: The plan.
+    """
+    formats = [fmt for fmt in (info or {}).get("formats") or [] if fmt.get("format_id")]
+    if aud_only:
+        return _plan_audio(formats, audio_mode)
+    return _plan_video(formats)
+
+
+def _plan_video(formats: list[dict]) -> FormatPlan:
+    video_only = [fmt for fmt in formats if _is_video(fmt) and not _is_audio(fmt)]
+    audio_only = [fmt for fmt in formats if _is_audio(fmt) and not _is_video(fmt)]
+
+    if not video_only or not audio_only:
+        if formats:
+            # Only muxed formats: the best one needs no merging at all
+            return FormatPlan("b/bv*+ba", _DEFAULT_SORT, "mp4/mkv",
+                              processing=PROCESSING_NONE, description="best single file")
+        return FormatPlan("bv*+ba/b", _DEFAULT_SORT, "mp4/mkv",
+                          description="best quality, preferring H.264 + AAC")
+
+    # Never trade resolution for a codec; among the best height, prefer what remuxes into mp4
+    height = max(fmt.get("height") or 0 for fmt in video_only)
+    top = [fmt for fmt in video_only if (fmt.get("height") or 0) == height]
+    video = max(top, key=lambda fmt: (
+        _codec(fmt.get("vcodec")) in _MP4_VIDEO,
+        -_MP4_VIDEO.index(_codec(fmt.get("vcodec"))) if _codec(fmt.get("vcodec")) in _MP4_VIDEO else 0,
+        fmt.get("tbr") or 0,
+    ))
+    vcodec = _codec(video.get("vcodec"))
+
+    if vcodec in _MP4_VIDEO:
+        pool = [fmt for fmt in audio_only if _codec(fmt.get("acodec")) in _MP4_AUDIO]
+        container = "mp4"
+    else:
+        pool = [fmt for fmt in audio_only if _codec(fmt.get("acodec")) in _WEBM_AUDIO]
+        container = "webm" if vcodec in _WEBM_VIDEO else "mkv"
+    if not pool:
+        pool, container = audio_only, "mkv"
+    audio = max(pool, key=lambda fmt: fmt.get("tbr") or 0)
+
+    merge_format = container if container == "mkv" else f"{container}/mkv"
+    return FormatPlan(
+        f"{video['format_id']}+{audio['format_id']}/bv*+ba/b", None, merge_format,
+        processing=PROCESSING_REMUX,
+        description=f"{_describe(video)} + {_describe(audio)}, remuxed into {container}",
+        raw_selector=f"{video['format_id']},{audio['format_id']}"
+    )
+
+
+def _plan_audio(formats: list[dict], audio_mode: str) -> FormatPlan:
+    if audio_mode != AUDIO_NATIVE:
+        return FormatPlan("ba/b", audio_format="mp3", processing=PROCESSING_TRANSCODE,
+                          description="best audio, converted to mp3", raw_selector="ba/b")
+
+    audio_only = [fmt for fmt in formats if _is_audio(fmt) and not _is_video(fmt)]
+    if audio_only:
+        pool = [fmt for fmt in audio_only if _codec(fmt.get("acodec")) == "mp4a"] or audio_only
+        audio = max(pool, key=lambda fmt: fmt.get("tbr") or 0)
+        return FormatPlan(f"{audio['format_id']}/ba[acodec^=mp4a]/ba/b", audio_format="best",
+                          processing=PROCESSING_NONE,
+                          description=f"{_describe(audio)} audio, kept as is")
+    if formats:
+        # Only muxed formats: the audio stream is copied out of the best one
+        return FormatPlan("ba/b", audio_format="best", processing=PROCESSING_REMUX,
+                          description="audio copied out of the best file")
+    return FormatPlan("ba[acodec^=mp4a]/ba/b", audio_format="best", processing=PROCESSING_NONE,
+                      description="best audio (AAC preferred), kept as is")
+
+
+def classify(plan: FormatPlan, postprocessors: list[str]) -> str:
+    """Tells whether a finished job remuxed or transcoded, from the
+    post-processors that actually ran rather than from what the plan expected.
+
+    ExtractAudio re-encodes when the plan asked for a specific codec (mp3)
+    and otherwise copies the audio stream out, so it counts as a remux.
+
+    Args:
+        plan (FormatPlan): The job's plan.
+        postprocessors (list[str]): The names of the post-processors that ran.
+
+    Returns:
+        str: "none", "remux" or "transcode".
+    """
+    names = set(postprocessors)
+    if "VideoConvertor" in names:
+        return PROCESSING_TRANSCODE
+    if "ExtractAudio" in names:
+        return PROCESSING_TRANSCODE if plan.audio_format not in (None, "best") else PROCESSING_REMUX
+    if names & {"Merger", "VideoRemuxer"} or any(name.startswith("Fixup") for name in names):
+        return PROCESSING_REMUX
+    return PROCESSING_NONE
+
+
+def estimate_size(plan: FormatPlan, info: Optional[dict]) -> Optional[int]:
+    """Estimates how many bytes a plan downloads, from the probed metadata.
+
+    The sizes of the formats the plan picked by ID are added up; otherwise
+    the media's own size estimate is used.
+
+    Returns:
+        int | None: The size in bytes, or None if it isn't known.
+    """
+    if not info:
+        return None
+    sizes = {fmt.get("format_id"): fmt.get("filesize") or fmt.get("filesize_approx")
+             for fmt in info.get("formats") or []}
+    chosen = (plan.raw_selector or plan.selector).split("/")[0].replace("+", ",").split(",")
+    if chosen and all(sizes.get(format_id) for format_id in chosen):
+        return sum(sizes[format_id] for format_id in chosen)
+    size = info.get("filesize") or info.get("filesize_approx")
+    return int(size) if size else None
@@ -0,0 +1,217 @@
+"""This module auto-tunes how many fragments of a DASH/HLS stream are downloaded at once.
+
+yt-dlp fetches fragmented formats one fragment at a time unless it is
+given `--concurrent-fragments`, and only reads the option at startup. The
+FragmentTuner picks a count for each download from what worked before on
+the same host, and while a long fragmented download runs it hill-climbs:
+the download is restarted (continuing from its fragments) with twice the
+count as long as that measurably pays off, and with half the count as
+soon as the host starts throttling.
+
+Classes:
+    - FragmentTuner: Picks and adapts the concurrent fragment count per download.
+
+Functions:
+    - is_throttle_line: True for yt-dlp output that means the host is throttling.
+    - tuner_from_spec: Builds a tuner from a config value.
+"""
+import re
+import time
+import threading
+from typing import Hashable, Optional, Union
+from progress import ProgressEvent
+
+DEFAULT_FRAGMENTS = 4
+MAX_FRAGMENTS = 16
+# Samples needed before a download's speed at a fragment count is trusted
+MIN_SAMPLES = 10
+# Seconds a download runs at a count before a higher one is tried...
+PROBE_AFTER = 20.0
+# ...and only if it has at least this many seconds left
+MIN_ETA = 60.0
+# A step up must be this much faster to be kept
+IMPROVEMENT = 1.15
+# Throttling messages within this many seconds back a download off
+THROTTLE_WINDOW = 30.0
+THROTTLE_LINES = 3
+# Seconds after throttling during which a host isn't probed with more fragments
+THROTTLE_COOLDOWN = 300.0
+# Weight of the newest speed sample in the moving average
+SPEED_SMOOTHING = 0.2
+
+_THROTTLE = re.compile(r"HTTP Error (?:429|403)|Too Many Requests|rate.?limit", re.IGNORECASE)
+
+
+def is_throttle_line(line: str) -> bool:
+    """True if a line of yt-dlp output says the server is throttling or refusing fragments."""
+    return _THROTTLE.search(line) is not None
+
+
+def tuner_from_spec(spec: Union[None, bool, int, str]) -> Optional["FragmentTuner"]:
+    """Builds a tuner from a config value: "auto" (or None/True) tunes
+    automatically, a number N always uses N fragments (backing off only when
+    throttled), and 1, 0, False or "off" download one fragment at a time.
+
+    Raises:
+        ValueError: If the value can't be parsed.
+    """
+    if spec is None or spec is True or str(spec).strip().lower() == "auto":
+        return FragmentTuner()
+    if spec is False or str(spec).strip().lower() == "off":
+        return None
+    try:
+        count = int(spec)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid fragment count: {spec!r}") from None
+    if count < 0:
+        raise ValueError(f"Invalid fragment count: {spec!r}")
+    return FragmentTuner(count, count) if count > 1 else None
+
+
+class _Tuning:
+    """The tuning state of one running download."""
+    def __init__(self, host: str, fragments: int) -> None:
+        self.host = host
+        self.fragments = fragments
+        self.target = fragments
+        self.fragmented = False
+        self.settled = False
+        self.speed: Optional[float] = None
+        self.samples = 0
+        self.eta: Optional[float] = None
+        self.started = time.monotonic()
+        self.throttles: list[float] = []
+        # Fragment count -> the speed measured with it
+        self.history: dict[int, float] = {}
+
+
+class FragmentTuner:
+    """Picks and adapts the concurrent fragment count of each download.
+
+    Downloads are identified by any hashable key. Call `begin` when a
+    download starts, `restarted` whenever its process is started again,
+    feed it progress events with `observe` and throttling output with
+    `throttled`, ask `retune` periodically whether it should be restarted
+    with a new count, and call `end` when it is done. All methods are
+    thread-safe.
+
+    Attributes:
+        initial (int): The count a host starts with.
+        maximum (int): The highest count ever used.
+    """
+    def __init__(self, initial: int = DEFAULT_FRAGMENTS, maximum: int = MAX_FRAGMENTS) -> None:
+        self.maximum = max(1, maximum)
+        self.initial = min(max(1, initial), self.maximum)
+        self._lock = threading.Lock()
+        self._jobs: dict[Hashable, _Tuning] = {}
+        # What each host has taught us: its best count and when it last throttled
+        self._host_fragments: dict[str, int] = {}
+        self._host_throttled: dict[str, float] = {}
+
+
+    def begin(self, key: Hashable, host: str) -> int:
+        """Registers a starting download and returns the fragment count to start it with."""
+        with self._lock:
+            tuning = _Tuning(host, self._host_fragments.get(host, self.initial))
+            self._jobs[key] = tuning
+            return tuning.fragments
+
+    def restarted(self, key: Hashable) -> int:
+        """Returns the count for the download's next process, and starts measuring it afresh."""
+        with self._lock:
+            tuning = self._jobs[key]
+            tuning.fragments = tuning.target
+            tuning.speed = None
+            tuning.samples = 0
+            tuning.started = time.monotonic()
+            return tuning.fragments
+
+    def end(self, key: Hashable):
+        """Forgets a finished download, remembering its best count for its host."""
+        with self._lock:
+            tuning = self._jobs.pop(key, None)
+            if tuning is None or not tuning.fragmented:
+                return
+            if tuning.speed is not None and tuning.samples >= MIN_SAMPLES:
+                tuning.history[tuning.fragments] = tuning.speed
+            if tuning.history and not self._recently_throttled(tuning.host):
+                self._host_fragments[tuning.host] = max(tuning.history, key=tuning.history.__getitem__)
+
+
+    def observe(self, key: Hashable, event: ProgressEvent):
+        """Feeds a download's progress event."""
+        if event.phase != "download":
+            return
+        with self._lock:
+            tuning = self._jobs.get(key)
+            if tuning is None:
+                return
+            if event.fragment_count is not None and event.fragment_count > 1:
+                tuning.fragmented = True
+            if event.speed is not None:
+                tuning.speed = event.speed if tuning.speed is None else (
+                    SPEED_SMOOTHING * event.speed + (1 - SPEED_SMOOTHING) * tuning.speed
+                )
+                tuning.samples += 1
+            tuning.eta = event.eta
+
+    def throttled(self, key: Hashable) -> bool:
+        """Records a throttling message from a download.
+
+        Returns:
+            bool: True if the download should be restarted with fewer fragments.
+        """
+        now = time.monotonic()
+        with self._lock:
+            tuning = self._jobs.get(key)
+            if tuning is None:
+                return False
+            self._host_throttled[tuning.host] = now
+            tuning.throttles = [t for t in tuning.throttles if now - t < THROTTLE_WINDOW] + [now]
+            if len(tuning.throttles) < THROTTLE_LINES or tuning.target <= 1:
+                return False
+
+            # Halve the count, for this download and for the host's next ones
+            tuning.target = max(1, tuning.fragments // 2)
+            tuning.settled = True
+            tuning.throttles.clear()
+            self._host_fragments[tuning.host] = min(
+                self._host_fragments.get(tuning.host, self.initial), tuning.target
+            )
+            return tuning.target != tuning.fragments
+
+    def retune(self, key: Hashable) -> bool:
+        """Decides whether a running download should be restarted with a new count.
+
+        Returns:
+            bool: True if it should; `restarted` then returns the new count.
+        """
+        now = time.monotonic()
+        with self._lock:
+            tuning = self._jobs.get(key)
+            if (tuning is None or tuning.settled or not tuning.fragmented
+                    or tuning.speed is None or tuning.samples < MIN_SAMPLES
+                    or now - tuning.started < PROBE_AFTER
+                    or self._recently_throttled(tuning.host)):
+                return False
+
+            tuning.history[tuning.fragments] = tuning.speed
+            lower = tuning.history.get(tuning.fragments // 2)
+            if lower is not None and tuning.speed < lower * IMPROVEMENT:
+                # The last step up didn't pay off: stay, or step back if it made things worse
+                tuning.settled = True
+                if tuning.speed < lower:
+                    tuning.target = tuning.fragments // 2
+                    return True
+                return False
+
+            if tuning.fragments >= self.maximum or (tuning.eta or 0) < MIN_ETA:
+                tuning.settled = tuning.fragments >= self.maximum
+                return False
+            tuning.target = min(self.maximum, tuning.fragments * 2)
+            return True
+
+    def _recently_throttled(self, host: str) -> bool:
+        """Caller holds the lock."""
+        throttled = self._host_throttled.get(host)
+        return throttled is not None and time.monotonic() - throttled < THROTTLE_COOLDOWN
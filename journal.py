@@ -0,0 +1,141 @@
+"""This module contains the JobJournal class, which makes the job queue survive restarts.
+
+The journal is an append-only JSON-lines file. Every job submission, state
+change and finished file is recorded as one line. On startup the journal is
+replayed to find the jobs that never finished, so they can be queued again
+and resume from their `.part` files.
+
+Classes:
+    - JobJournal: The append-only record of submitted jobs.
+"""
+import os
+import json
+import time
+import threading
+from typing import Optional
+
+journal_file = "jobs.journal"
+
+# States after which a job never needs to be resumed
+_FINAL_STATES = ("done", "failed", "cancelled")
+
+
+class JobJournal:
+    """An append-only, JSON-lines log of jobs and their state.
+
+    Each line is an object with an "event" ("submit", "state", "priority" or "file"),
+    the job's "uid" and a "time". Submit records also carry the serialized
+    download (see `Download.to_dict`).
+
+    Attributes:
+        path (str): The journal file.
+    """
+    def __init__(self, path: str = journal_file) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+
+
+    def _append(self, record: dict):
+        record["time"] = time.time()
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+        with self._lock:
+            try:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(line)
+            except OSError:
+                # Losing the journal only costs crash recovery, never the download
+                pass
+
+    def record_submit(self, uid: str, download: dict, parent: Optional[str] = None, priority: int = 0):
+        """Records a newly queued job."""
+        self._append({"event": "submit", "uid": uid, "download": download, "parent": parent,
+                      "priority": priority})
+
+    def record_state(self, uid: str, state: str):
+        """Records a job's state change."""
+        self._append({"event": "state", "uid": uid, "state": state})
+
+    def record_priority(self, uid: str, priority: int):
+        """Records a change of a job's priority."""
+        self._append({"event": "priority", "uid": uid, "priority": priority})
+
+    def record_file(self, uid: str, path: str):
+        """Records a file a job has produced."""
+        self._append({"event": "file", "uid": uid, "path": path})
+
+
+    def unfinished(self) -> list[dict]:
+        """Replays the journal and returns the jobs that never finished.
+
+        Playlists that were expanded are not returned themselves; their
+        unfinished entries are.
+
+        Returns:
+            list[dict]: The submit records of unfinished jobs, in submission
+            order, with their latest "priority" and "state".
+        """
+        submits: dict[str, dict] = {}
+        states: dict[str, str] = {}
+        priorities: dict[str, int] = {}
+        parents: set[str] = set()
+
+        with self._lock:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    lines = f.readlines()
+            except OSError:
+                return []
+
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A line cut short by a crash
+                continue
+            uid = record.get("uid")
+            if record.get("event") == "submit":
+                submits[uid] = record
+                if record.get("parent"):
+                    parents.add(record["parent"])
+            elif record.get("event") == "state":
+                states[uid] = record.get("state")
+            elif record.get("event") == "priority":
+                priorities[uid] = record.get("priority")
+
+        return [
+            dict(record, priority=priorities.get(uid, record.get("priority", 0)), state=states.get(uid))
+            for uid, record in submits.items()
+            if states.get(uid) not in _FINAL_STATES and uid not in parents
+        ]
+
+    def compact(self, records: list[dict]):
+        """Atomically replaces the journal with just the given unfinished jobs,
+        e.g. after they have been requeued.
+
+        The survivors are written to a temporary file that then replaces the
+        journal, so a crash at any point leaves either the old journal or the
+        new one, never an empty one.
+
+        Args:
+            records (list[dict]): Records as returned by `unfinished`.
+        """
+        lines = []
+        now = time.time()
+        for record in records:
+            submit = {key: value for key, value in record.items() if key != "state"}
+            lines.append(json.dumps(dict(submit, event="submit", time=now), separators=(",", ":")) + "\n")
+            if record.get("state"):
+                lines.append(json.dumps({"event": "state", "uid": record["uid"], "state": record["state"],
+                                         "time": now}, separators=(",", ":")) + "\n")
+
+        tmp_path = self.path + ".tmp"
+        with self._lock:
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    f.writelines(lines)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+            except OSError:
+                # The old journal is still whole; it is compacted on the next start
+                pass
@@ -0,0 +1,263 @@
+"""This module contains the metadata probing stage and its on-disk cache.
+
+A probe runs yt-dlp with `--dump-single-json` to learn a URL's title,
+duration, size and formats without downloading anything. It runs under
+the scheduler's ProcessSupervisor like a download, so cancelling the job
+(or shutting down) kills it. Results are kept in a JSON file keyed by
+normalized URL, with a TTL and a size-bounded LRU, so repeat lookups cost a cache hit instead of an extractor run.
+
+Classes:
+    - ProbeError: Raised when yt-dlp can't extract metadata for a URL.
+    - MetadataCache: The on-disk TTL + LRU cache of probe results.
+    - Prober: Runs probes through the cache.
+
+Functions:
+    - normalize_url: Normalizes a URL for use as a cache key.
+    - summarize: Trims a yt-dlp info dict down to the fields the app uses.
+"""
+import os
+import json
+import time
+import asyncio
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Optional
+from urllib.parse import urlsplit, urlunsplit
+from app_config import engine_path
+from supervisor import ProcessSupervisor, ProcessTimeout
+
+cache_file = "metadata_cache.json"
+
+DEFAULT_TTL = 6 * 60 * 60 # seconds
+DEFAULT_MAX_ENTRIES = 500
+PROBE_TIMEOUT = 120 # seconds
+# The JSON arrives as one line, which can run to megabytes (formats, captions)
+PROBE_LINE_LIMIT = 64 * 1024 * 1024
+
+# Fields kept from the info dict and from each of its formats
+_INFO_FIELDS = ("id", "title", "extractor_key", "webpage_url", "duration",
+                "filesize", "filesize_approx", "_type", "playlist_count")
+_FORMAT_FIELDS = ("format_id", "ext", "vcodec", "acodec", "height", "tbr",
+                  "filesize", "filesize_approx", "protocol")
+_ENTRY_FIELDS = ("id", "title", "url", "ie_key", "duration")
+
+
+class ProbeError(Exception):
+    """Raised when yt-dlp fails to extract metadata."""
+
+
+def normalize_url(url: str) -> str:
+    """Normalizes a URL so trivially different spellings share a cache entry.
+
+    Adds a missing scheme, lowercases the scheme and host, and drops the
+    fragment.
+    """
+    url = url.strip()
+    if url.startswith("www."):
+        url = "https://" + url
+    parts = urlsplit(url)
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path or "/", parts.query, ""))
+
+
+def summarize(info: dict) -> dict:
+    """Trims a yt-dlp info dict down to the fields the app uses.
+
+    Args:
+        info (dict): The full JSON output of `yt-dlp --dump-single-json`.
+
+    Returns:
+        dict: The info fields, plus "formats" and (for playlists) "entries"
+        lists holding only their relevant fields.
+    """
+    summary = {key: info.get(key) for key in _INFO_FIELDS}
+    summary["formats"] = [
+        {key: fmt.get(key) for key in _FORMAT_FIELDS}
+        for fmt in info.get("formats") or []
+    ]
+    if info.get("entries") is not None:
+        summary["entries"] = [
+            {key: entry.get(key) for key in _ENTRY_FIELDS}
+            for entry in info["entries"] if entry
+        ]
+    return summary
+
+
+class MetadataCache:
+    """A persistent cache of probe results with a TTL and LRU eviction.
+
+    Keys are normalized URLs (see `Prober.probe`). The whole cache is a
+    single JSON object ordered from least to most recently used. It is
+    loaded lazily and rewritten atomically on change.
+
+    Attributes:
+        path (str): The cache file.
+        ttl (float): Seconds before an entry expires.
+        max_entries (int): The maximum number of entries kept.
+    """
+    def __init__(self, path: str = cache_file,
+                 ttl: float = DEFAULT_TTL,
+                 max_entries: int = DEFAULT_MAX_ENTRIES) -> None:
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max(1, max_entries)
+
+        self._lock = threading.Lock()
+        self._entries: Optional[OrderedDict] = None
+
+
+    def _load(self) -> OrderedDict:
+        """Loads the cache file once. Caller holds the lock."""
+        if self._entries is None:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._entries = OrderedDict(json.load(f))
+            except (OSError, ValueError, TypeError):
+                # Missing or corrupt cache: start empty
+                self._entries = OrderedDict()
+        return self._entries
+
+    def _save(self):
+        """Atomically rewrites the cache file. Caller holds the lock."""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        try:
+            fd, tmp_path = tempfile.mkstemp(prefix=".metadata-", suffix=".tmp", dir=directory)
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(self._entries, f)
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except OSError:
+            # The cache is an optimization; failing to persist it is not fatal
+            pass
+
+    def get(self, key: str) -> Optional[dict]:
+        """Returns the cached summary for a key, or None if missing or expired."""
+        with self._lock:
+            entries = self._load()
+            entry = entries.get(key)
+            if entry is None:
+                return None
+            if time.time() - entry["time"] > self.ttl:
+                del entries[key]
+                self._save()
+                return None
+            entries.move_to_end(key)
+            return entry["info"]
+
+    def put(self, key: str, info: dict):
+        """Stores a summary, evicting the least recently used entries if full."""
+        with self._lock:
+            entries = self._load()
+            entries[key] = {"time": time.time(), "info": info}
+            entries.move_to_end(key)
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+            self._save()
+
+    def clear(self):
+        """Removes every entry."""
+        with self._lock:
+            self._entries = OrderedDict()
+            self._save()
+
+
+class Prober:
+    """Probes URLs for metadata through a MetadataCache.
+
+    Probes are coroutines run on a ProcessSupervisor's event loop.
+
+    Attributes:
+        cache (MetadataCache): The cache consulted before running yt-dlp.
+        yt_dlp_exe (str | None): The path to the yt-dlp executable, or None
+            for the engine active at the time of each probe.
+    """
+    def __init__(self, cache: Optional[MetadataCache] = None) -> None:
+        self.cache = cache or MetadataCache()
+        self.yt_dlp_exe: Optional[str] = None
+
+        # Concurrent lookups of the same key share one run: [task, number of waiters]
+        self._inflight: dict[str, list] = {}
+
+
+    async def probe(self, supervisor: ProcessSupervisor, url: str, playlist: bool = False) -> dict:
+        """Returns the metadata summary for a URL.
+
+        Args:
+            supervisor (ProcessSupervisor): Runs yt-dlp; this must be awaited on its loop.
+            url (str): The URL to probe.
+            playlist (bool): Whether to treat the URL as a playlist (entries are
+                listed without being extracted) rather than a single video.
+
+        Returns:
+            dict: See `summarize`.
+
+        Raises:
+            ProbeError: If yt-dlp fails or prints something that isn't JSON.
+            asyncio.CancelledError: If cancelled; yt-dlp is killed once no
+                other lookup is waiting for it.
+        """
+        cache_key = normalize_url(url)
+        if playlist:
+            cache_key = "playlist:" + cache_key
+        cached = await asyncio.to_thread(self.cache.get, cache_key)
+        if cached is not None:
+            return cached
+
+        entry = self._inflight.get(cache_key)
+        if entry is None:
+            task = asyncio.ensure_future(self._fetch(supervisor, cache_key, url, playlist))
+            entry = self._inflight[cache_key] = [task, 0]
+
+            def forget(_):
+                if self._inflight.get(cache_key) is entry:
+                    del self._inflight[cache_key]
+            task.add_done_callback(forget)
+
+        entry[1] += 1
+        try:
+            return await asyncio.shield(entry[0])
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                # Nobody wants the result any more (a no-op if it is done)
+                entry[0].cancel()
+
+    async def _fetch(self, supervisor: ProcessSupervisor, cache_key: str, url: str, playlist: bool) -> dict:
+        info = summarize(await self._run(supervisor, url, playlist))
+        await asyncio.to_thread(self.cache.put, cache_key, info)
+        return info
+
+    async def _run(self, supervisor: ProcessSupervisor, url: str, playlist: bool) -> dict:
+        exe = self.yt_dlp_exe or engine_path()
+        cmd = [
+            exe,
+            "--dump-single-json",
+            "--no-warnings",
+            "--flat-playlist" if playlist else "--no-playlist",
+            url
+        ]
+
+        lines: list[str] = []
+        try:
+            code = await supervisor.run_process(cmd, lines.append, timeout=PROBE_TIMEOUT,
+                                                line_limit=PROBE_LINE_LIMIT)
+        except FileNotFoundError:
+            raise ProbeError(f"Executable not found at {exe}")
+        except ProcessTimeout:
+            raise ProbeError(f"Timed out probing {url}")
+
+        # stdout and stderr arrive combined; the JSON is the one object line
+        output = next((line for line in reversed(lines) if line.startswith("{")), None)
+        if code != 0:
+            message = [line for line in lines if line.strip() and line is not output]
+            raise ProbeError(message[-1] if message else f"yt-dlp exited with code {code}")
+        if output is None:
+            raise ProbeError("Invalid metadata from yt-dlp: no JSON in its output")
+
+        try:
+            return json.loads(output)
+        except ValueError as e:
+            raise ProbeError(f"Invalid metadata from yt-dlp: {e}")
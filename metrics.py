@@ -0,0 +1,251 @@
+"""This module records per-job performance metrics and exports them.
+
+Every job carries a JobMetrics recorder that the scheduler feeds with
+timestamps and progress events. When a job finishes, a MetricsExporter
+appends its numbers to a JSON-lines log and rewrites a Prometheus
+textfile-collector file with running totals per extractor.
+
+Classes:
+    - JobMetrics: Timings and throughput of a single job.
+    - MetricsExporter: Writes finished jobs to JSON lines and a Prometheus textfile.
+"""
+import os
+import json
+import time
+import threading
+from typing import Optional
+from progress import ProgressEvent
+
+METRIC_PREFIX = "ytdlp_simplified"
+
+
+class JobMetrics:
+    """Timings and throughput of a single job.
+
+    All durations are in seconds, speeds in bytes per second. A value is
+    None when the job never reached the corresponding stage.
+
+    Attributes:
+        probe_seconds (float | None): Time spent in the metadata probe.
+        bytes_transferred (int): Bytes downloaded across all of the job's files.
+        peak_speed (float | None): The highest speed yt-dlp reported.
+        postprocess_seconds (float): Time spent in ffmpeg merges/conversions.
+    """
+    def __init__(self) -> None:
+        self.probe_seconds: Optional[float] = None
+        self.bytes_transferred = 0
+        self.peak_speed: Optional[float] = None
+        self.postprocess_seconds = 0.0
+
+        self._started: Optional[float] = None
+        self._spawned: Optional[float] = None
+        self._first_event: Optional[float] = None
+        self._first_byte: Optional[float] = None
+        self._last_byte: Optional[float] = None
+        self._finished: Optional[float] = None
+        self._file_bytes = 0
+        self._postprocess_started: Optional[float] = None
+
+
+    def mark_started(self):
+        """The job was picked up by a worker."""
+        self._started = time.monotonic()
+
+    def mark_spawned(self):
+        """The yt-dlp download process is about to start."""
+        self._spawned = time.monotonic()
+
+    def mark_finished(self):
+        """The job reached its final state."""
+        self._finished = time.monotonic()
+        self.bytes_transferred += self._file_bytes
+        self._file_bytes = 0
+
+    def on_progress(self, event: ProgressEvent):
+        """Updates the metrics from a progress event."""
+        now = time.monotonic()
+        if self._first_event is None:
+            self._first_event = now
+
+        if event.phase == "postprocess":
+            if event.status == "started":
+                self._postprocess_started = now
+            elif event.status == "finished" and self._postprocess_started is not None:
+                self.postprocess_seconds += now - self._postprocess_started
+                self._postprocess_started = None
+            return
+
+        done = event.downloaded_bytes
+        if done is not None:
+            if done < self._file_bytes:
+                # A new file (e.g. the audio stream after the video) started from zero
+                self.bytes_transferred += self._file_bytes
+            self._file_bytes = done
+            if done > 0:
+                if self._first_byte is None:
+                    self._first_byte = now
+                self._last_byte = now
+        if event.speed is not None and (self.peak_speed is None or event.speed > self.peak_speed):
+            self.peak_speed = event.speed
+
+
+    @staticmethod
+    def _span(start: Optional[float], end: Optional[float]) -> Optional[float]:
+        if start is None or end is None:
+            return None
+        return end - start
+
+    @property
+    def extraction_seconds(self) -> Optional[float]:
+        """Time from spawning yt-dlp until it reported its first progress."""
+        return self._span(self._spawned, self._first_event)
+
+    @property
+    def ttfb_seconds(self) -> Optional[float]:
+        """Time from the job starting until the first byte arrived."""
+        return self._span(self._started, self._first_byte)
+
+    @property
+    def download_seconds(self) -> Optional[float]:
+        """Time between the first and the last downloaded byte."""
+        return self._span(self._first_byte, self._last_byte)
+
+    @property
+    def wall_seconds(self) -> Optional[float]:
+        """Total time from the job starting to it finishing."""
+        return self._span(self._started, self._finished)
+
+    @property
+    def average_speed(self) -> Optional[float]:
+        """Bytes transferred divided by the download time."""
+        seconds = self.download_seconds
+        if not seconds:
+            return None
+        return (self.bytes_transferred + self._file_bytes) / seconds
+
+    def to_dict(self) -> dict:
+        return {
+            "probe_seconds": self.probe_seconds,
+            "extraction_seconds": self.extraction_seconds,
+            "ttfb_seconds": self.ttfb_seconds,
+            "download_seconds": self.download_seconds,
+            "postprocess_seconds": self.postprocess_seconds,
+            "wall_seconds": self.wall_seconds,
+            "bytes": self.bytes_transferred + self._file_bytes,
+            "average_speed": self.average_speed,
+            "peak_speed": self.peak_speed,
+        }
+
+
+class MetricsExporter:
+    """Exports finished jobs as JSON lines and Prometheus textfile metrics.
+
+    The Prometheus file holds running totals for this process, labelled by
+    extractor (or host, when the extractor is unknown). It is replaced
+    atomically on every update, as the textfile collector requires.
+
+    Attributes:
+        jsonl_path (str | None): The JSON-lines log to append to.
+        prom_path (str | None): The Prometheus textfile to rewrite.
+    """
+    def __init__(self, jsonl_path: Optional[str] = None, prom_path: Optional[str] = None) -> None:
+        self.jsonl_path = jsonl_path
+        self.prom_path = prom_path
+
+        self._lock = threading.Lock()
+        # (extractor, status) -> count, and extractor -> {total name: value}
+        self._jobs: dict[tuple[str, str], int] = {}
+        self._totals: dict[str, dict[str, float]] = {}
+        self._peak: dict[str, float] = {}
+        # (extractor, processing) -> count of successful downloads
+        self._processing: dict[tuple[str, str], int] = {}
+
+
+    def export(self, record: dict):
+        """Records one finished job.
+
+        Args:
+            record (dict): The job's identity fields (see `Scheduler`) merged
+                with `JobMetrics.to_dict()`.
+        """
+        with self._lock:
+            if self.jsonl_path:
+                try:
+                    with open(self.jsonl_path, "a", encoding="utf-8") as f:
+                        f.write(json.dumps(record, separators=(",", ":")) + "\n")
+                except OSError:
+                    pass
+
+            if self.prom_path:
+                self._accumulate(record)
+                self._write_prometheus()
+
+    def _accumulate(self, record: dict):
+        label = record.get("extractor") or record.get("host") or "unknown"
+        key = (label, record.get("status") or "unknown")
+        self._jobs[key] = self._jobs.get(key, 0) + 1
+
+        totals = self._totals.setdefault(label, {})
+        for name in ("bytes", "wall_seconds", "download_seconds", "postprocess_seconds",
+                     "ttfb_seconds", "extraction_seconds", "probe_seconds", "retries"):
+            value = record.get(name)
+            if value is not None:
+                totals[name] = totals.get(name, 0.0) + value
+                totals[name + "_count"] = totals.get(name + "_count", 0.0) + 1
+
+        peak = record.get("peak_speed")
+        if peak is not None:
+            self._peak[label] = max(self._peak.get(label, 0.0), peak)
+
+        processing = record.get("processing")
+        if processing:
+            key = (label, processing)
+            self._processing[key] = self._processing.get(key, 0) + 1
+
+    def _write_prometheus(self):
+        """Rewrites the textfile from the running totals. Caller holds the lock."""
+        lines = []
+
+        def metric(name: str, kind: str, help_text: str, samples: list[tuple[dict, float]]):
+            full = f"{METRIC_PREFIX}_{name}"
+            lines.append(f"# HELP {full} {help_text}")
+            lines.append(f"# TYPE {full} {kind}")
+            for labels, value in samples:
+                label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+                lines.append(f"{full}{{{label_text}}} {value:g}")
+
+        metric("jobs_total", "counter", "Finished jobs by extractor and final status.",
+               [({"extractor": e, "status": s}, n) for (e, s), n in sorted(self._jobs.items())])
+        metric("bytes_total", "counter", "Bytes downloaded.",
+               [({"extractor": e}, t.get("bytes", 0)) for e, t in sorted(self._totals.items())])
+        metric("wall_seconds_total", "counter", "Total job wall time.",
+               [({"extractor": e}, t.get("wall_seconds", 0)) for e, t in sorted(self._totals.items())])
+        metric("download_seconds_total", "counter", "Time spent transferring bytes.",
+               [({"extractor": e}, t.get("download_seconds", 0)) for e, t in sorted(self._totals.items())])
+        metric("postprocess_seconds_total", "counter", "Time spent in ffmpeg merges/conversions.",
+               [({"extractor": e}, t.get("postprocess_seconds", 0)) for e, t in sorted(self._totals.items())])
+        for stage, help_text in (("ttfb", "Time to first byte."),
+                                 ("extraction", "Extraction time inside the download process."),
+                                 ("probe", "Metadata probe time.")):
+            metric(f"{stage}_seconds_sum", "counter", f"{help_text} Sum over jobs.",
+                   [({"extractor": e}, t.get(f"{stage}_seconds", 0)) for e, t in sorted(self._totals.items())])
+            metric(f"{stage}_seconds_count", "counter", f"{help_text} Number of jobs measured.",
+                   [({"extractor": e}, t.get(f"{stage}_seconds_count", 0)) for e, t in sorted(self._totals.items())])
+        metric("retries_total", "counter", "Downloads retried after a throttled or transient failure.",
+               [({"extractor": e}, t.get("retries", 0)) for e, t in sorted(self._totals.items())])
+        metric("peak_speed_bytes", "gauge", "Highest download speed seen, in bytes per second.",
+               [({"extractor": e}, v) for e, v in sorted(self._peak.items())])
+        metric("processing_total", "counter", "Downloads by post-processing: none, remux or transcode.",
+               [({"extractor": e, "processing": p}, n) for (e, p), n in sorted(self._processing.items())])
+
+        tmp_path = self.prom_path + ".tmp" # type: ignore
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+            os.replace(tmp_path, self.prom_path) # type: ignore
+        except OSError:
+            pass
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
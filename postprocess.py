@@ -0,0 +1,199 @@
+"""This module runs the ffmpeg merges and conversions of finished downloads.
+
+Left to itself, yt-dlp merges the video and audio streams (or converts the
+audio to mp3) in the same process that downloaded them, so a slow
+conversion keeps a download slot busy while the network sits idle. When a
+download's streams are known up front, the scheduler has yt-dlp save them
+as raw files instead, frees the slot, and hands the files to a
+PostProcessPool: a separate, CPU-sized pool that runs ffmpeg on them and
+moves the result into place.
+
+Classes:
+    - PostTask: The ffmpeg work left to do for one download.
+    - PostProcessPool: Runs PostTasks with bounded concurrency.
+
+Functions:
+    - task_for: Works out the PostTask for a download's raw files.
+    - pool_from_spec: Builds a pool from a config value.
+"""
+import os
+import re
+import asyncio
+from typing import Callable, NamedTuple, Optional, Union
+from app_config import DEPENDENCY_PATHS
+from supervisor import ProcessSupervisor, ProcessTimeout
+from formats import PROCESSING_REMUX, PROCESSING_TRANSCODE, FormatPlan
+
+# yt-dlp's output template for raw streams; the format ID tells them apart
+RAW_TEMPLATE = "%(title)s.f%(format_id)s.%(ext)s"
+_RAW_SUFFIX = re.compile(r"\.f[^.\\/]+\.[^.\\/]+$")
+
+# ffmpeg's muxer for each container we write
+_MUXERS = {"mp4": "mp4", "webm": "webm", "mkv": "matroska", "mp3": "mp3"}
+# yt-dlp's default --audio-quality (VBR 5), so mp3s come out as they did before
+MP3_QUALITY = "5"
+
+
+class PostTask(NamedTuple):
+    """The ffmpeg work left to do for one download.
+
+    Attributes:
+        inputs (list[str]): The raw files: video then audio for a merge, or
+            the single source of an audio conversion.
+        output (str): The final path of the result.
+        processing (str): "remux" or "transcode".
+    """
+    inputs: list[str]
+    output: str
+    processing: str
+
+
+def task_for(plan: FormatPlan, files: list[str]) -> Optional[PostTask]:
+    """Works out what to do with the raw files downloaded for a plan.
+
+    Returns:
+        PostTask | None: The task, or None if the files are already final
+        (e.g. the source was mp3 already) or don't match the plan.
+    """
+    if plan.audio_format == "mp3":
+        if len(files) != 1:
+            return None
+        source = files[0]
+        if source.lower().endswith(".mp3"):
+            return None
+        return PostTask([source], _final_path(source, "mp3"), PROCESSING_TRANSCODE)
+
+    if plan.merge_format and len(files) == 2:
+        container = plan.merge_format.split("/")[0]
+        return PostTask(list(files), _final_path(files[0], container), PROCESSING_REMUX)
+    return None
+
+def _final_path(raw: str, ext: str) -> str:
+    base = _RAW_SUFFIX.sub("", raw)
+    if base == raw:
+        base = os.path.splitext(raw)[0]
+    return f"{base}.{ext}"
+
+
+def ffmpeg_command(ffmpeg: str, task: PostTask, temp_path: str) -> list[str]:
+    """Builds the ffmpeg command that writes a task's result to `temp_path`."""
+    ext = task.output.rsplit(".", 1)[-1].lower()
+    cmd = [ffmpeg, "-y", "-nostdin", "-hide_banner", "-loglevel", "error"]
+    for path in task.inputs:
+        cmd.extend(["-i", path])
+
+    if task.processing == PROCESSING_TRANSCODE:
+        cmd.extend(["-vn", "-c:a", "libmp3lame", "-q:a", MP3_QUALITY])
+    else:
+        # Streams are copied as they are: no re-encoding. Mapped by type, not
+        # by input, since either file may hold the video (V skips cover art)
+        for kind in ("V", "a"):
+            for index in range(len(task.inputs)):
+                cmd.extend(["-map", f"{index}:{kind}?"])
+        cmd.extend(["-c", "copy"])
+        if ext == "mp4":
+            cmd.extend(["-movflags", "+faststart"])
+    cmd.extend(["-f", _MUXERS.get(ext, "matroska"), temp_path])
+    return cmd
+
+
+def pool_from_spec(spec: Union[None, bool, int, str]) -> Optional["PostProcessPool"]:
+    """Builds a pool from a config value: "auto" (or None/True) sizes it to
+    the core count, a number N runs N conversions at once, and 0, False or
+    "off" leave post-processing to yt-dlp inside the download slot.
+
+    Raises:
+        ValueError: If the value can't be parsed.
+    """
+    if spec is None or spec is True or str(spec).strip().lower() == "auto":
+        return PostProcessPool()
+    if spec is False or str(spec).strip().lower() == "off":
+        return None
+    try:
+        count = int(spec)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid post-processing worker count: {spec!r}") from None
+    if count < 0:
+        raise ValueError(f"Invalid post-processing worker count: {spec!r}")
+    return PostProcessPool(count) if count > 0 else None
+
+
+class PostProcessPool:
+    """Runs ffmpeg merges and conversions, at most `max_workers` at a time.
+
+    Tasks run on a ProcessSupervisor's event loop; ones beyond the limit
+    wait their turn without holding anything else up.
+
+    Attributes:
+        max_workers (int): The number of ffmpeg processes that may run at once.
+        ffmpeg (str): The ffmpeg executable.
+        timeout (float | None): Seconds one task may take.
+    """
+    def __init__(self, max_workers: Optional[int] = None, ffmpeg: Optional[str] = None,
+                 timeout: Optional[float] = None) -> None:
+        self.max_workers = max(1, max_workers or os.cpu_count() or 1)
+        self.ffmpeg = ffmpeg or DEPENDENCY_PATHS.ffmpeg
+        self.timeout = timeout
+        self._slots = asyncio.Semaphore(self.max_workers)
+        self._waiting = 0
+
+    @property
+    def waiting(self) -> int:
+        """The number of tasks waiting for a free worker."""
+        return self._waiting
+
+    async def run(self, supervisor: ProcessSupervisor, task: PostTask,
+                  status_callback: Callable[[str, bool], None]) -> bool:
+        """Runs a task on the supervisor's loop, once a worker is free.
+
+        On success the result is moved into place and the raw files are
+        deleted; on failure the raw files are kept. Cancelling kills ffmpeg.
+
+        Returns:
+            bool: True if the result is in place.
+        """
+        if self._slots.locked():
+            status_callback(f"[Postprocess] Waiting for a free worker ({self._waiting + 1} waiting)...", False)
+        self._waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self._waiting -= 1
+
+        root, ext = os.path.splitext(task.output)
+        temp_path = f"{root}.temp{ext}"
+        verb = "Converting" if task.processing == PROCESSING_TRANSCODE else "Merging"
+        status_callback(f"[Postprocess] {verb} into {os.path.basename(task.output)}", False)
+        try:
+            cmd = ffmpeg_command(self.ffmpeg, task, temp_path)
+            returncode = await supervisor.run_process(
+                cmd, lambda line: status_callback(f"[ffmpeg] {line}", False) if line.strip() else None,
+                self.timeout
+            )
+            if returncode != 0:
+                status_callback(f"[Postprocess] ffmpeg exited with error code: {returncode}", False)
+                return False
+            os.replace(temp_path, task.output)
+        except FileNotFoundError:
+            status_callback(f"Error: Executable not found at {self.ffmpeg}", False)
+            return False
+        except ProcessTimeout as e:
+            status_callback(f"[Postprocess] {e}", False)
+            return False
+        except OSError as e:
+            status_callback(f"[Postprocess] Could not save the result: {e}", False)
+            return False
+        finally:
+            self._slots.release()
+            if os.path.exists(temp_path):
+                try:
+                    os.remove(temp_path)
+                except OSError:
+                    pass
+
+        for path in task.inputs:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        return True
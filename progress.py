@@ -0,0 +1,206 @@
+"""This module defines the machine-readable progress protocol spoken between yt-dlp and the app.
+
+yt-dlp is asked (through `--newline` and `--progress-template`) to print every
+progress update as a single delimited line starting with PROGRESS_MARKER.
+Those lines are parsed into ProgressEvent tuples instead of scraping yt-dlp's
+human-readable output with regular expressions. Each file that reaches its
+final location is also announced with a FILE_MARKER line.
+
+Classes:
+    - ProgressEvent: A typed progress update.
+    - CompletedFile: A media file that finished downloading and processing.
+
+Functions:
+    - progress_args: The yt-dlp arguments that enable the protocol.
+    - parse_progress_line: Parses a line of output into a ProgressEvent, if it is one.
+    - parse_file_line: Parses a line of output into a CompletedFile, if it is one.
+    - format_bytes: Formats a byte count for display.
+    - format_eta: Formats a number of seconds as H:MM:SS / MM:SS.
+"""
+from typing import NamedTuple, Optional
+
+PROGRESS_MARKER = "@progress|"
+FILE_MARKER = "@file|"
+_SEP = "|"
+_NA = "NA"
+
+# Field order shared by both templates and the parser below
+_DOWNLOAD_TEMPLATE = PROGRESS_MARKER + _SEP.join([
+    "download",
+    "%(progress.status)s",
+    "%(progress.downloaded_bytes)s",
+    "%(progress.total_bytes)s",
+    "%(progress.total_bytes_estimate)s",
+    "%(progress.speed)s",
+    "%(progress.eta)s",
+    "%(progress.fragment_index)s",
+    "%(progress.fragment_count)s",
+    "",
+])
+_POSTPROCESS_TEMPLATE = PROGRESS_MARKER + _SEP.join([
+    "postprocess",
+    "%(progress.status)s",
+    _NA, _NA, _NA, _NA, _NA, _NA, _NA,
+    "%(progress.postprocessor)s",
+])
+_FIELD_COUNT = 10
+
+
+class ProgressEvent(NamedTuple):
+    """
+    A single progress update reported by yt-dlp.
+
+    Attributes:
+        phase (str): "download" or "postprocess".
+        status (str): yt-dlp's status, e.g. "downloading", "finished", "started".
+        downloaded_bytes (int | None): Bytes downloaded so far.
+        total_bytes (int | None): Total size in bytes (exact or estimated).
+        speed (float | None): Current speed in bytes per second.
+        eta (int | None): Estimated seconds remaining.
+        fragment_index (int | None): Current fragment, for fragmented formats.
+        fragment_count (int | None): Number of fragments, for fragmented formats.
+        postprocessor (str | None): The running post-processor (postprocess phase only).
+    """
+    phase: str
+    status: str
+    downloaded_bytes: Optional[int] = None
+    total_bytes: Optional[int] = None
+    speed: Optional[float] = None
+    eta: Optional[int] = None
+    fragment_index: Optional[int] = None
+    fragment_count: Optional[int] = None
+    postprocessor: Optional[str] = None
+
+    @property
+    def percent(self) -> Optional[float]:
+        """The completed percentage, if the total size is known."""
+        if self.downloaded_bytes is None or not self.total_bytes:
+            return None
+        return min(100.0, self.downloaded_bytes * 100.0 / self.total_bytes)
+
+    def format(self) -> str:
+        """Formats the event as a human-readable console line."""
+        if self.phase == "postprocess":
+            return f"[{self.postprocessor or 'postprocess'}] {self.status}"
+
+        percent = self.percent
+        parts = ["[download]", f"{percent:5.1f}%" if percent is not None else "  ?  %"]
+        if self.total_bytes:
+            parts.append(f"of {format_bytes(self.total_bytes)}")
+        elif self.downloaded_bytes is not None:
+            parts.append(format_bytes(self.downloaded_bytes))
+        if self.speed:
+            parts.append(f"at {format_bytes(self.speed)}/s")
+        if self.eta is not None:
+            parts.append(f"ETA {format_eta(self.eta)}")
+        if self.fragment_index is not None and self.fragment_count:
+            parts.append(f"(frag {self.fragment_index}/{self.fragment_count})")
+        return " ".join(parts)
+
+
+class CompletedFile(NamedTuple):
+    """
+    A media file that has been downloaded, processed and moved into place.
+
+    Attributes:
+        extractor (str): yt-dlp's extractor key, e.g. "Youtube".
+        video_id (str): The media ID within that extractor.
+        filepath (str): The final path of the file.
+    """
+    extractor: str
+    video_id: str
+    filepath: str
+
+
+def progress_args() -> list[str]:
+    """Returns the yt-dlp arguments that make it print protocol lines."""
+    return [
+        "--newline",
+        "--progress-template", f"download:{_DOWNLOAD_TEMPLATE}",
+        "--progress-template", f"postprocess:{_POSTPROCESS_TEMPLATE}",
+        "--print", f"after_move:{FILE_MARKER}%(extractor_key)s|%(id)s|%(filepath)s",
+    ]
+
+
+def _int(value: str) -> Optional[int]:
+    if value == _NA or not value:
+        return None
+    try:
+        return int(float(value))
+    except ValueError:
+        return None
+
+def _float(value: str) -> Optional[float]:
+    if value == _NA or not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def parse_progress_line(line: str) -> Optional[ProgressEvent]:
+    """Parses one line of yt-dlp output.
+
+    Args:
+        line (str): A raw output line (trailing whitespace is allowed).
+
+    Returns:
+        ProgressEvent | None: The event, or None if the line is not a protocol line.
+    """
+    if not line.startswith(PROGRESS_MARKER):
+        return None
+
+    fields = line[len(PROGRESS_MARKER):].rstrip().split(_SEP, _FIELD_COUNT - 1)
+    if len(fields) != _FIELD_COUNT:
+        return None
+
+    phase, status, done, total, estimate, speed, eta, frag_idx, frag_cnt, pp = fields
+    return ProgressEvent(
+        phase=phase,
+        status=status,
+        downloaded_bytes=_int(done),
+        total_bytes=_int(total) or _int(estimate),
+        speed=_float(speed),
+        eta=_int(eta),
+        fragment_index=_int(frag_idx),
+        fragment_count=_int(frag_cnt),
+        postprocessor=pp if pp and pp != _NA else None,
+    )
+
+
+def parse_file_line(line: str) -> Optional[CompletedFile]:
+    """Parses one line of yt-dlp output.
+
+    Args:
+        line (str): A raw output line (trailing whitespace is allowed).
+
+    Returns:
+        CompletedFile | None: The file, or None if the line is not a file line.
+    """
+    if not line.startswith(FILE_MARKER):
+        return None
+
+    # The path comes last, so a "|" inside it survives the split
+    fields = line[len(FILE_MARKER):].rstrip("\r\n").split(_SEP, 2)
+    if len(fields) != 3:
+        return None
+    return CompletedFile(*fields)
+
+
+def format_bytes(num: float) -> str:
+    """Formats a byte count using binary units, e.g. 12.34MiB."""
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if abs(num) < 1024:
+            return f"{num:.2f}{unit}"
+        num /= 1024
+    return f"{num:.2f}TiB"
+
+
+def format_eta(seconds: int) -> str:
+    """Formats a number of seconds as MM:SS or H:MM:SS."""
+    minutes, secs = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{secs:02d}"
+    return f"{minutes:02d}:{secs:02d}"
@@ -0,0 +1,269 @@
+"""This module decides when a failed download is tried again, and when a host needs a break.
+
+A download's output is read as it runs, and a failure is classified from
+it: throttled (HTTP 429, rate limits, bot checks), transient (timeouts,
+resets, 5xx errors) or permanent (removed or private videos, 404s,
+unsupported URLs). Permanent failures are final. The others are retried,
+resuming from their .part files, after a jittered exponential backoff
+that is longer for throttling.
+
+Every host also has a circuit breaker. Throttling halves the number of
+downloads the host may run at once (each success adds one back), and a
+burst of failures opens the breaker: the host's queue is paused for a
+cooldown, then a single download is let through to test the water. A
+throttling site thus gets fewer, slower requests instead of a stampede of
+retries, while other hosts keep their slots.
+
+Classes:
+    - FailureClassifier: Classifies a download's failure from its output.
+    - RetryPolicy: How often and how long after a failure a download is retried.
+    - HostBreakers: Per-host concurrency limits and circuit breakers.
+
+Functions:
+    - classify_line: Classifies one line of yt-dlp output.
+    - retry_from_spec: Builds a retry policy from a config value.
+"""
+import re
+import time
+import random
+import threading
+from collections import deque
+from typing import Optional, Union
+
+THROTTLED = "throttled"
+TRANSIENT = "transient"
+PERMANENT = "permanent"
+
+# Most severe first: a run that saw several kinds is classified by the first
+_SEVERITY = (PERMANENT, THROTTLED, TRANSIENT)
+
+_PATTERNS = {
+    PERMANENT: re.compile(
+        r"Video unavailable|Private video|This video (?:is not available|has been removed|is private)"
+        r"|HTTP Error (?:404|410)|Unsupported URL|is not a valid URL|members.only|account .* terminated"
+        r"|copyright|confirm your age|Requested format is not available|(?-i:\bDRM\b)|not available in your country"
+        r"|geo.?restrict|This live event will begin|Premieres in|Executable not found|Error building command",
+        re.IGNORECASE),
+    THROTTLED: re.compile(
+        r"HTTP Error (?:429|403)|Too Many Requests|rate.?limit|confirm you.re not a bot|throttl",
+        re.IGNORECASE),
+    TRANSIENT: re.compile(
+        r"timed out|time.?out|HTTP Error 5\d\d|Connection (?:reset|refused|aborted)|Remote end closed"
+        r"|IncompleteRead|Temporary failure in name resolution|Name or service not known"
+        r"|Network is unreachable|No route to host|urlopen error|SSL|EOF occurred|Broken pipe"
+        r"|Unable to download (?:webpage|JSON metadata|API page)|giving up after|No output for",
+        re.IGNORECASE),
+}
+
+DEFAULT_ATTEMPTS = 4
+# Seconds before the first retry, doubling with every attempt, at most MAX_DELAY
+BASE_DELAY = 2.0
+MAX_DELAY = 300.0
+# Throttled retries wait this much longer
+THROTTLE_FACTOR = 8.0
+
+# Failures from one host within FAILURE_WINDOW seconds that open its breaker
+FAILURE_THRESHOLD = 4
+FAILURE_WINDOW = 60.0
+# Seconds an open breaker pauses its host, doubling with every trip in a row
+COOLDOWN = 30.0
+MAX_COOLDOWN = 900.0
+
+
+def classify_line(line: str) -> Optional[str]:
+    """Classifies one line of yt-dlp output.
+
+    Returns:
+        str | None: "permanent", "throttled", "transient", or None for lines
+        that say nothing about a failure.
+    """
+    # Titles and file names can contain anything; only errors are taken at their word
+    fatal = "ERROR" in line or line.startswith("Error")
+    for kind in _SEVERITY:
+        if (kind != PERMANENT or fatal) and _PATTERNS[kind].search(line):
+            return kind
+    return None
+
+
+class FailureClassifier:
+    """Classifies a download's failure from the output lines it printed.
+
+    Attributes:
+        kind (str): The most severe kind seen so far; "transient" if the
+            output named no cause (e.g. the process was killed for going quiet).
+        reason (str | None): The line that decided the kind.
+    """
+    def __init__(self) -> None:
+        self._kind: Optional[str] = None
+        self.reason: Optional[str] = None
+
+    def observe(self, line: str):
+        kind = classify_line(line)
+        if kind is not None and (self._kind is None or _SEVERITY.index(kind) < _SEVERITY.index(self._kind)):
+            self._kind = kind
+            self.reason = line.strip()
+
+    @property
+    def kind(self) -> str:
+        return self._kind or TRANSIENT
+
+
+class RetryPolicy:
+    """How often, and how long after a failure, a download is tried again.
+
+    Attributes:
+        max_attempts (int): Attempts per download, the first one included.
+        base_delay (float): Seconds before the first retry.
+        max_delay (float): The longest wait between two attempts.
+    """
+    def __init__(self, max_attempts: int = DEFAULT_ATTEMPTS, base_delay: float = BASE_DELAY,
+                 max_delay: float = MAX_DELAY) -> None:
+        self.max_attempts = max(1, int(max_attempts))
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def backoff(self, attempt: int, kind: str) -> Optional[float]:
+        """Returns how long to wait before trying again after a failed attempt.
+
+        Uses "full jitter": a random wait between zero and the exponential
+        bound, so retries from parallel downloads don't arrive together.
+
+        Args:
+            attempt (int): The attempt that failed, starting at 1.
+            kind (str): How it failed.
+
+        Returns:
+            float | None: Seconds to wait, or None if it shouldn't be retried.
+        """
+        if kind == PERMANENT or attempt >= self.max_attempts:
+            return None
+        bound = self.base_delay * (2 ** (attempt - 1))
+        if kind == THROTTLED:
+            bound *= THROTTLE_FACTOR
+        bound = min(self.max_delay, bound)
+        # Never retry immediately: at least a tenth of the bound
+        return random.uniform(bound / 10, bound)
+
+
+def retry_from_spec(spec: Union[None, bool, int, str]) -> Optional[RetryPolicy]:
+    """Builds a retry policy from a config value: the number of retries after
+    the first attempt (None or True for the default), or 0, False or "off"
+    for none.
+
+    Raises:
+        ValueError: If the value can't be parsed.
+    """
+    if spec is None or spec is True:
+        return RetryPolicy()
+    if spec is False or str(spec).strip().lower() == "off":
+        return None
+    try:
+        retries = int(spec)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid retry count: {spec!r}") from None
+    if retries < 0:
+        raise ValueError(f"Invalid retry count: {spec!r}")
+    return RetryPolicy(retries + 1) if retries else None
+
+
+class _Breaker:
+    def __init__(self, limit: int) -> None:
+        self.limit = limit
+        self.failures: deque[float] = deque()
+        self.open_until = 0.0
+        self.trips = 0
+        # After a cooldown, a single download tests the host
+        self.probing = False
+
+
+class HostBreakers:
+    """Per-host concurrency limits and circuit breakers. Thread-safe.
+
+    Attributes:
+        threshold (int): Failures within `window` seconds that open a breaker.
+        window (float): The failure counting window, in seconds.
+        cooldown (float): Seconds the first trip pauses a host.
+    """
+    def __init__(self, threshold: int = FAILURE_THRESHOLD, window: float = FAILURE_WINDOW,
+                 cooldown: float = COOLDOWN) -> None:
+        self.threshold = max(1, threshold)
+        self.window = window
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._hosts: dict[str, _Breaker] = {}
+
+    def _get(self, host: str, maximum: int) -> _Breaker:
+        breaker = self._hosts.get(host)
+        if breaker is None:
+            breaker = self._hosts[host] = _Breaker(maximum)
+        return breaker
+
+    def limit(self, host: str, maximum: int) -> int:
+        """The number of downloads a host may run at once now (0 while its breaker is open).
+
+        Args:
+            maximum (int): The host's normal limit.
+        """
+        with self._lock:
+            breaker = self._hosts.get(host)
+            if breaker is None:
+                return maximum
+            if breaker.open_until:
+                if time.monotonic() < breaker.open_until:
+                    return 0
+                breaker.open_until = 0.0
+                breaker.probing = True
+            if breaker.probing:
+                return 1
+            return min(maximum, breaker.limit)
+
+    def reopens_in(self, host: str) -> Optional[float]:
+        """Seconds until a host's open breaker lets a download through, or None if it isn't open."""
+        with self._lock:
+            breaker = self._hosts.get(host)
+            if breaker is None or not breaker.open_until:
+                return None
+            return max(0.0, breaker.open_until - time.monotonic())
+
+    def succeeded(self, host: str, maximum: int):
+        """Records a download that finished; closes the host's breaker and raises its limit."""
+        with self._lock:
+            breaker = self._hosts.get(host)
+            if breaker is None:
+                return
+            breaker.probing = False
+            breaker.trips = 0
+            breaker.failures.clear()
+            breaker.limit = min(maximum, breaker.limit + 1)
+
+    def failed(self, host: str, kind: str, maximum: int) -> Optional[float]:
+        """Records a failed download.
+
+        Throttling halves the host's limit. Throttled and transient failures
+        count towards opening the breaker; a failed test download reopens it
+        at once, for twice as long.
+
+        Returns:
+            float | None: The cooldown in seconds, if this failure opened the breaker.
+        """
+        if kind == PERMANENT:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            breaker = self._get(host, maximum)
+            if kind == THROTTLED:
+                breaker.limit = max(1, min(maximum, breaker.limit) // 2)
+            breaker.failures.append(now)
+            while breaker.failures and breaker.failures[0] < now - self.window:
+                breaker.failures.popleft()
+
+            if breaker.open_until and now < breaker.open_until:
+                return None
+            if not breaker.probing and len(breaker.failures) < self.threshold:
+                return None
+            cooldown = min(MAX_COOLDOWN, self.cooldown * (2 ** breaker.trips))
+            breaker.trips += 1
+            breaker.probing = False
+            breaker.failures.clear()
+            breaker.open_until = now + cooldown
+            return cooldown
@@ -0,0 +1,1301 @@
+"""This module contains the job queue and scheduler that run downloads concurrently.
+
+Playlists are expanded into one job per entry (when a Prober is available),
+and no host gets more than `max_per_host` downloads at a time. A download
+of media that is already queued or running (the same canonical video, see
+urls.py) with the same options is not queued twice. With a
+DownloadArchive, media that was downloaded before is skipped without
+spawning yt-dlp. With a JobJournal, every job is recorded so unfinished
+ones can be resumed after a restart. Every job records JobMetrics, which a
+MetricsExporter can export when it finishes.
+
+Jobs run as coroutines on a ProcessSupervisor's event loop rather than on
+worker threads, so they can be timed out and cancelled, and a cancelled
+job's whole process tree is killed.
+
+Queued jobs start in priority order. When every slot is busy, a
+higher-priority job preempts the lowest-priority running one, which is
+stopped and requeued; like a paused job, it resumes from its .part files
+(`--continue`) when it runs again.
+
+With a BandwidthBudget, every download is started with its share of the
+budget as `--limit-rate`, and is restarted in place when its share has
+changed a lot (see bandwidth.py). Likewise, a FragmentTuner picks each
+download's `--concurrent-fragments` and restarts it with a new count when
+that should be faster, or when the host throttles (see fragments.py).
+
+Each download's formats are planned from its probed metadata so they only
+need remuxing, never transcoding, unless mp3 audio was asked for (see
+formats.py); every job reports which it ended up doing.
+
+With a PostProcessPool, downloads whose streams are known up front are
+saved unprocessed, and their slot is freed as soon as the bytes have
+landed. The merge or conversion then runs in the pool (see postprocess.py)
+while the slot downloads something else.
+
+With a StagingArea, each job downloads and merges in its own folder on a
+fast local disk, and only its finished files are moved to the save
+location. With a DiskBudget, a job is only started once its expected size
+fits on the volumes it writes to; while running downloads hold the space,
+it waits for them (see staging.py).
+
+With a RetryPolicy, a failed download is classified from its output as
+throttled, transient or permanent, and all but permanent failures are
+requeued after a jittered exponential backoff. With HostBreakers, a host
+that throttles gets fewer slots, and one whose downloads keep failing has
+its queue paused for a cooldown while other hosts carry on (see retry.py).
+
+Classes:
+    - Priority: Named job priorities.
+    - JobState: The lifecycle states a job moves through.
+    - Job: A single queued download and its current state.
+    - Scheduler: Runs queued jobs on a bounded number of slots.
+"""
+import os
+import asyncio
+import threading
+import time
+import uuid
+import itertools
+from collections import deque
+from enum import Enum, IntEnum
+from urllib.parse import urlsplit
+from typing import Awaitable, Callable, Optional
+from app_config import binary_version, engine_path
+from download import Download
+from progress import CompletedFile, ProgressEvent, format_bytes, format_eta
+from metadata import Prober, ProbeError
+from archive import DownloadArchive
+from journal import JobJournal
+from metrics import JobMetrics, MetricsExporter
+from supervisor import ProcessSupervisor
+from bandwidth import BandwidthBudget
+from fragments import FragmentTuner, is_throttle_line
+from formats import PROCESSING_NONE, PROCESSING_REMUX, PROCESSING_TRANSCODE, FormatPlan, classify, estimate_size, plan_for
+from postprocess import PostProcessPool, PostTask, task_for
+from staging import DiskBudget, StagingArea, move_file
+from retry import THROTTLED, FailureClassifier, HostBreakers, RetryPolicy
+
+
+DEFAULT_PER_HOST = 4
+
+# Why a running job's task was stopped
+_STOP_CANCEL = "cancel"
+_STOP_PAUSE = "pause"
+_STOP_PREEMPT = "preempt"
+_STOP_ORDER = (_STOP_CANCEL, _STOP_PAUSE, _STOP_PREEMPT)
+
+# Seconds between checks of the running downloads' bandwidth shares and fragment counts
+RETUNE_INTERVAL = 5.0
+
+# Why a download was restarted in its slot
+_RETUNE_BANDWIDTH = "bandwidth"
+_RETUNE_FRAGMENTS = "fragments"
+
+
+class _WaitForSpace(Exception):
+    """Raised in a slot when a job has to wait for running jobs to free disk space."""
+    def __init__(self, releases: int) -> None:
+        super().__init__()
+        # The number of space releases seen when the job was turned away
+        self.releases = releases
+
+
+class _RetryLater(Exception):
+    """Raised in a slot when a failed job should be tried again after a backoff."""
+    def __init__(self, delay: float) -> None:
+        super().__init__()
+        self.delay = delay
+
+
+def default_worker_count() -> int:
+    """Returns the default number of concurrent downloads (the core count)."""
+    return os.cpu_count() or 1
+
+
+def _dedupe_key(download: Download) -> tuple:
+    """Downloads with the same key would produce the same files."""
+    audio_mode = download.audio_mode if download.aud_only else None
+    return (download.media_key(), download.aud_only, audio_mode, os.path.normcase(os.path.abspath(download.save_path)))
+
+
+def _space_needs(plan: FormatPlan, info: Optional[dict], work_dir: Optional[str],
+                 save_path: str) -> dict[str, int]:
+    """The bytes a download needs per folder (see DiskBudget.reserve).
+
+    Downloading and merging need room for the streams and the merged
+    result at once, in the work folder; the save location needs room for
+    the result. Without a work folder, both happen in the save location.
+    """
+    size = estimate_size(plan, info) or 0
+    work = size * 2 if plan.processing != PROCESSING_NONE else size
+    if work_dir is None:
+        return {save_path: work}
+    return {work_dir: work, save_path: size}
+
+
+def host_of(url: str) -> str:
+    """Returns the host a URL downloads from, used for per-host limits."""
+    if url.startswith("www."):
+        url = "https://" + url
+    host = urlsplit(url).hostname or ""
+    return host[4:] if host.startswith("www.") else host
+
+
+class Priority(IntEnum):
+    """Named job priorities. Any int works; higher runs first."""
+    LOW = -10
+    NORMAL = 0
+    HIGH = 10
+
+
+class JobState(Enum):
+    """The states a job moves through: queued -> running -> done/failed/cancelled.
+
+    A queued or running job can be paused, and is queued again when resumed.
+    A job whose merge or conversion was left to the post-processing pool is
+    processing between running and done.
+    """
+    QUEUED = "queued"
+    RUNNING = "running"
+    PROCESSING = "processing"
+    PAUSED = "paused"
+    DONE = "done"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+class Job:
+    """A class to represent a single download job.
+
+    Attributes:
+        id (int): A unique, increasing job number.
+        uid (str): A globally unique ID that identifies the job across restarts.
+        download (Download): The download handler this job runs.
+        state (JobState): The current state of the job.
+        error (str | None): The last error message, if the job failed.
+        progress (ProgressEvent | None): The most recent progress update.
+        info (dict | None): The probed metadata summary, if probing is enabled.
+        host (str): The host the job downloads from.
+        parent (Job | None): The playlist job this entry was expanded from.
+        index (int | None): The 1-based position of this entry in its playlist.
+        children (list[Job]): The entry jobs of an expanded playlist.
+        files (list[str]): The final paths of the files the job produced.
+        skipped (bool): True if the job was skipped because it is in the archive.
+        extractor (str | None): yt-dlp's extractor for the job, once known.
+        metrics (JobMetrics): The job's timings and throughput.
+        priority (int): Higher-priority jobs start first and may preempt others.
+        plan (FormatPlan | None): The formats the job downloads, once planned.
+        postprocessors (list[str]): The yt-dlp post-processors that ran.
+        processing (str | None): Whether the job's output was remuxed,
+            transcoded or neither ("remux", "transcode", "none"), once done.
+        engine_version (str | None): The version of the yt-dlp that ran the job.
+        canonical (CanonicalURL | None): The job's normalized URL and IDs.
+        key (str): The same for every job of the same media (see urls.CanonicalURL.key).
+        retries (int): How many times the job's download was retried after failing.
+        not_before (float): The monotonic time before which a retried job may not start.
+    """
+    def __init__(self, job_id: int, download: Download,
+                 parent: Optional["Job"] = None, index: Optional[int] = None,
+                 uid: Optional[str] = None, priority: int = Priority.NORMAL) -> None:
+        self.id = job_id
+        self.uid = uid or uuid.uuid4().hex
+        self.download = download
+        self.priority = int(priority)
+        self.state = JobState.QUEUED
+        self.error: Optional[str] = None
+        self.progress: Optional[ProgressEvent] = None
+        self.info: Optional[dict] = None
+        self.host = host_of(download.link)
+        self.parent = parent
+        self.index = index
+        self.children: list["Job"] = []
+        self.files: list[str] = []
+        self.skipped = False
+        self.extractor: Optional[str] = None
+        self.metrics = JobMetrics()
+        self.plan: Optional[FormatPlan] = None
+        self.postprocessors: list[str] = []
+        self.processing: Optional[str] = None
+        self.engine_version: Optional[str] = None
+        self.key = download.media_key()
+        self.canonical = download.canonical
+        self.retries = 0
+        self.not_before = 0.0
+
+    @property
+    def finished(self) -> bool:
+        """True once the job is done, has failed or was cancelled."""
+        return self.state in (JobState.DONE, JobState.FAILED, JobState.CANCELLED)
+
+    def __repr__(self) -> str:
+        return f"<Job #{self.id} {self.state.value} {self.download.link}>"
+
+
+# Callback signatures used by the scheduler
+StatusCallback = Callable[[Job, str, bool], None]
+StateCallback = Callable[[Job], None]
+ProgressCallback = Callable[[Job, ProgressEvent], None]
+
+
+class Scheduler:
+    """A job queue drained through a bounded number of download slots.
+
+    Every job is run through `Download.run_download_async` as a coroutine on
+    the supervisor's event loop; its output is forwarded to `status_callback`
+    tagged with the job. Progress updates are stored on the job and sent to
+    `progress_callback`, or formatted into `status_callback` progress lines
+    if there is none. Callbacks are called from the supervisor's loop thread.
+
+    Attributes:
+        max_workers (int): The number of downloads that may run at once.
+        status_callback (StatusCallback | None): Receives (job, line, is_progress).
+        state_callback (StateCallback | None): Called whenever a job changes state.
+        progress_callback (ProgressCallback | None): Receives (job, event).
+        prober (Prober | None): If set, each job's metadata is probed before it
+            downloads, and playlists are expanded into one job per entry.
+        max_per_host (int): The number of downloads that may run at once per host.
+        archive (DownloadArchive | None): If set, media in the archive is skipped
+            (this needs the probed IDs, so it only applies with a prober) and
+            every finished file is recorded in it.
+        journal (JobJournal | None): If set, submissions, state changes and
+            files are journaled, and `recover` can resume unfinished jobs.
+        metrics (MetricsExporter | None): If set, receives every finished
+            download's metrics.
+        supervisor (ProcessSupervisor): Runs the jobs and their processes. One
+            is created (and stopped by `shutdown`) if none is given.
+        job_timeout (float | None): Seconds a download may run before it is killed.
+        idle_timeout (float | None): Seconds a download may go without output
+            before it is killed.
+        bandwidth (BandwidthBudget | None): If set, the running downloads share
+            its budget.
+        fragments (FragmentTuner | None): If set, picks how many fragments each
+            download fetches at once.
+        downloader (str | None): An external downloader for yt-dlp to use.
+        postprocess (PostProcessPool | None): If set, merges and conversions
+            run in this pool, outside the download slots.
+        staging (StagingArea | None): If set, jobs download in their own
+            folder there, and their finished files are moved to the save location.
+        disk (DiskBudget | None): If set, jobs only start once their expected
+            size fits on the volumes they write to.
+        retry (RetryPolicy | None): If set, failed downloads that may succeed
+            later are requeued after a backoff.
+        breakers (HostBreakers | None): If set, throttling and failing hosts
+            get fewer slots, or none for a while.
+    """
+    def __init__(self,
+                 max_workers: Optional[int] = None,
+                 status_callback: Optional[StatusCallback] = None,
+                 state_callback: Optional[StateCallback] = None,
+                 progress_callback: Optional[ProgressCallback] = None,
+                 prober: Optional[Prober] = None,
+                 max_per_host: Optional[int] = None,
+                 archive: Optional[DownloadArchive] = None,
+                 journal: Optional[JobJournal] = None,
+                 metrics: Optional[MetricsExporter] = None,
+                 supervisor: Optional[ProcessSupervisor] = None,
+                 job_timeout: Optional[float] = None,
+                 idle_timeout: Optional[float] = None,
+                 bandwidth: Optional[BandwidthBudget] = None,
+                 fragments: Optional[FragmentTuner] = None,
+                 downloader: Optional[str] = None,
+                 postprocess: Optional[PostProcessPool] = None,
+                 staging: Optional[StagingArea] = None,
+                 disk: Optional[DiskBudget] = None,
+                 retry: Optional[RetryPolicy] = None,
+                 breakers: Optional[HostBreakers] = None) -> None:
+        self.max_workers = max(1, max_workers or default_worker_count())
+        self.status_callback = status_callback
+        self.state_callback = state_callback
+        self.progress_callback = progress_callback
+        self.prober = prober
+        self.max_per_host = max(1, max_per_host or DEFAULT_PER_HOST)
+        self.archive = archive
+        self.journal = journal
+        self.metrics = metrics
+        self.supervisor = supervisor or ProcessSupervisor()
+        self.job_timeout = job_timeout or None
+        self.idle_timeout = idle_timeout or None
+        self.bandwidth = bandwidth
+        self.fragments = fragments
+        self.downloader = downloader or None
+        self.postprocess = postprocess
+        self.staging = staging
+        self.disk = disk
+        self.retry = retry
+        self.breakers = breakers
+
+        self._owns_supervisor = supervisor is None
+        self._jobs: list[Job] = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+
+        # Jobs waiting for a slot (highest priority first, FIFO within a
+        # priority), the jobs holding a slot (in start order), and running
+        # jobs per host
+        self._pending: deque[Job] = deque()
+        self._running: dict[int, Job] = {}
+        self._host_active: dict[str, int] = {}
+        # Running jobs already being stopped to make room for others
+        self._preempting: set[int] = set()
+        # Jobs whose slot is freed but whose files are still being processed
+        self._postprocessing: set[int] = set()
+        # The latest job for each media and set of options, to spot duplicates
+        self._by_key: dict[tuple, Job] = {}
+        # Jobs waiting for running jobs to release disk space, and how many
+        # releases there have been
+        self._space_waiting: deque[Job] = deque()
+        self._space_releases = 0
+        # Stop requests for jobs created but not yet queued
+        self._held: dict[int, str] = {}
+        # When the queue is next checked for jobs whose backoff or host cooldown is over
+        self._wake_at: Optional[float] = None
+
+        # Only touched on the supervisor's loop thread
+        self._tasks: dict[int, asyncio.Task] = {}
+        self._stop_requests: dict[int, str] = {}
+        # The current yt-dlp run of each downloading job, why it is being
+        # restarted, and the periodic retuning task
+        self._attempts: dict[int, asyncio.Future] = {}
+        self._retunes: dict[int, set[str]] = {}
+        self._retuner: Optional[asyncio.Task] = None
+
+    def submit(self, download: Download, priority: int = Priority.NORMAL) -> Job:
+        """Queues a download and returns its job.
+
+        If the same media is already queued, running or paused with the same
+        options, nothing is queued and that job is returned instead.
+        """
+        job = self._create_job(download, priority=priority, dedupe=True)
+        if job.download is download:
+            self._enqueue(job)
+        return job
+
+    def recover(self) -> list[Job]:
+        """Requeues the jobs the journal says never finished.
+
+        Call this once at startup, before submitting anything else. The
+        journal is compacted down to the requeued jobs. Interrupted
+        downloads pick up from their .part files. Jobs keep their priority,
+        and paused jobs come back paused.
+
+        Returns:
+            list[Job]: The recovered jobs.
+        """
+        if self.journal is None:
+            return []
+
+        records = []
+        for record in self.journal.unfinished():
+            try:
+                records.append((record, Download.from_dict(record["download"])))
+            except (KeyError, TypeError):
+                continue
+        # The survivors replace the journal in one atomic step; they are not recorded again
+        self.journal.compact([record for record, _ in records])
+        if self.staging is not None:
+            # Work folders of jobs that won't resume are only taking up space
+            self.staging.prune({record["uid"] for record, _ in records})
+
+        jobs = []
+        for record, download in records:
+            job = self._create_job(download, uid=record["uid"], priority=record.get("priority") or 0,
+                                   journaled=True)
+            jobs.append((job, record.get("state") == JobState.PAUSED.value))
+
+        for job, paused in jobs:
+            if paused:
+                self._set_state(job, JobState.PAUSED)
+            else:
+                self._enqueue(job)
+        return [job for job, _ in jobs]
+
+    def _create_job(self, download: Download, parent: Optional[Job] = None,
+                    index: Optional[int] = None, info: Optional[dict] = None,
+                    uid: Optional[str] = None, priority: int = Priority.NORMAL,
+                    dedupe: bool = False, journaled: bool = False) -> Job:
+        key = _dedupe_key(download)
+        with self._lock:
+            existing = self._by_key.get(key)
+            if dedupe and existing is not None and not existing.finished:
+                return existing
+            job = Job(next(self._ids), download, parent, index, uid, priority)
+            job.info = info
+            self._jobs.append(job)
+            self._by_key[key] = job
+            if parent is not None:
+                parent.children.append(job)
+
+        if self.journal is not None and not journaled:
+            self.journal.record_submit(job.uid, download.to_dict(), parent.uid if parent else None, job.priority)
+        return job
+
+    def _enqueue(self, job: Job, front: bool = False):
+        with self._lock:
+            held = self._held.pop(job.id, None)
+        if held == _STOP_CANCEL:
+            self._finish_cancelled(job)
+            return
+        if held == _STOP_PAUSE:
+            self._set_state(job, JobState.PAUSED)
+            return
+
+        if job.state != JobState.QUEUED:
+            self._set_state(job, JobState.QUEUED)
+        else:
+            self._notify_state(job)
+        with self._lock:
+            self._insert_pending(job, front)
+        self._pump()
+
+    def _insert_pending(self, job: Job, front: bool = False):
+        """Queues a job behind every job of at least its priority, or of higher
+        priority only with `front`. Caller holds the lock."""
+        position = len(self._pending)
+        # Scanning from the back keeps same-priority bursts (playlists) cheap
+        while position > 0:
+            ahead = self._pending[position - 1].priority
+            if ahead > job.priority or (ahead == job.priority and not front):
+                break
+            position -= 1
+        self._pending.insert(position, job)
+
+    def submit_many(self, downloads: list[Download], priority: int = Priority.NORMAL) -> list[Job]:
+        """Queues several downloads at once and returns their jobs."""
+        return [self.submit(d, priority) for d in downloads]
+
+    def jobs(self) -> list[Job]:
+        """Returns a snapshot of every job submitted so far."""
+        with self._lock:
+            return list(self._jobs)
+
+    def engines_in_use(self) -> set[str]:
+        """Returns the yt-dlp binaries that unfinished jobs are pinned to."""
+        with self._lock:
+            return {job.download.yt_dlp_exe for job in self._jobs if not job.finished and job.download.yt_dlp_exe}
+
+    def counts(self) -> dict[JobState, int]:
+        """Returns the number of jobs in each state (expanded playlists are counted by their entries)."""
+        result = {state: 0 for state in JobState}
+        for job in self.jobs():
+            if not job.children:
+                result[job.state] += 1
+        return result
+
+    def is_idle(self) -> bool:
+        """True when no job is queued or running (paused jobs don't count)."""
+        return all(job.finished or job.state == JobState.PAUSED for job in self.jobs())
+
+    def wait(self):
+        """Blocks until every job submitted so far has finished or been paused."""
+        with self._idle:
+            while self._pending or self._running or self._postprocessing or self._space_waiting:
+                self._idle.wait()
+
+    def cancel(self, job: Job) -> bool:
+        """Cancels a queued, paused or running job, killing its process tree.
+
+        Cancelling an expanded playlist cancels its unfinished entries, and
+        cancelling a processing job kills its ffmpeg.
+
+        Returns:
+            bool: False if there was nothing left to cancel.
+        """
+        return self._stop(job, _STOP_CANCEL)
+
+    def pause(self, job: Job) -> bool:
+        """Pauses a queued or running job (or a playlist's entries).
+
+        A running job's process tree is stopped and its slot freed; `resume`
+        queues it again and yt-dlp continues from the .part files. Processing
+        jobs can't be paused.
+
+        Returns:
+            bool: False if there was nothing to pause.
+        """
+        return self._stop(job, _STOP_PAUSE)
+
+    def resume(self, job: Job) -> bool:
+        """Queues a paused job (or a playlist's paused entries) again.
+
+        Returns:
+            bool: False if there was nothing to resume.
+        """
+        if job.children:
+            return any([self.resume(child) for child in list(job.children)])
+        with self._lock:
+            if job.state != JobState.PAUSED:
+                return False
+            # Set under the lock, so a second resume can't queue it twice
+            job.state = JobState.QUEUED
+        if self.status_callback is not None:
+            self.status_callback(job, "[Queue] Resumed.", False)
+        if self.journal is not None:
+            self.journal.record_state(job.uid, job.state.value)
+        self._enqueue(job, front=True)
+        return True
+
+    def set_priority(self, job: Job, priority: int):
+        """Changes a job's (or a playlist's entries') priority.
+
+        A queued job moves to its new place in the queue, which may
+        preempt a running job.
+        """
+        for child in list(job.children):
+            self.set_priority(child, priority)
+        with self._lock:
+            job.priority = int(priority)
+            if job in self._pending:
+                self._pending.remove(job)
+                self._insert_pending(job)
+        if self.journal is not None:
+            self.journal.record_priority(job.uid, job.priority)
+        self._pump()
+
+    def cancel_all(self) -> int:
+        """Cancels every unfinished job, and returns how many were cancelled."""
+        return sum(self.cancel(job) for job in self.jobs() if not job.finished and not job.children)
+
+    def pause_all(self) -> int:
+        """Pauses every queued and running job, and returns how many were paused."""
+        return sum(self.pause(job) for job in self.jobs()
+                   if job.state in (JobState.QUEUED, JobState.RUNNING) and not job.children)
+
+    def resume_all(self) -> int:
+        """Resumes every paused job, and returns how many were resumed."""
+        return sum(self.resume(job) for job in self.jobs() if job.state == JobState.PAUSED)
+
+    def shutdown(self, wait: bool = True, kill: bool = False):
+        """Stops the scheduler.
+
+        Args:
+            wait (bool): Block until every job has finished first.
+            kill (bool): Drop the queue and kill the running process trees
+                instead. The journal is detached first, so the interrupted
+                jobs stay unfinished in it and are resumed by `recover`.
+        """
+        if kill:
+            with self._lock:
+                self.journal = None
+                self._pending.clear()
+                self._space_waiting.clear()
+                running = list(self._running) + list(self._postprocessing)
+                self._idle.notify_all()
+            for job_id in running:
+                self.supervisor.call_soon(self._stop_task, job_id, _STOP_CANCEL)
+        elif wait:
+            self.wait()
+
+        if self._owns_supervisor and (wait or kill):
+            # Waits for the killed trees to exit
+            self.supervisor.stop()
+
+
+    def _stop(self, job: Job, reason: str) -> bool:
+        """Cancels or pauses a job wherever it is."""
+        if job.children:
+            return any([self._stop(child, reason) for child in list(job.children)])
+
+        with self._lock:
+            if job.finished or (job.state == JobState.PAUSED and reason == _STOP_PAUSE):
+                return False
+            if job in self._pending:
+                self._pending.remove(job)
+                where = "queue"
+            elif job in self._space_waiting:
+                self._space_waiting.remove(job)
+                where = "queue"
+            elif job.id in self._running:
+                where = "slot"
+            elif job.id in self._postprocessing:
+                if reason != _STOP_CANCEL:
+                    return False
+                where = "slot"
+            elif job.state == JobState.PAUSED:
+                where = "paused"
+            else:
+                # Created but not queued yet: handled by _enqueue
+                self._held[job.id] = reason
+                return True
+
+        if where == "slot":
+            # The slot is freed once the process tree is gone (see _run_slot)
+            self.supervisor.call_soon(self._stop_task, job.id, reason)
+            return True
+
+        if reason == _STOP_CANCEL:
+            self._finish_cancelled(job)
+        else:
+            self._set_state(job, JobState.PAUSED)
+            if self.status_callback is not None:
+                self.status_callback(job, "[Queue] Paused.", False)
+        with self._idle:
+            self._idle.notify_all()
+        return True
+
+    def _stop_task(self, job_id: int, reason: str):
+        """Stops a job's task. Runs on the loop thread."""
+        with self._lock:
+            if reason != _STOP_CANCEL and job_id in self._postprocessing:
+                # Its download finished in the meantime; only a cancel stops ffmpeg
+                return
+        # Cancelling beats pausing beats preempting; a task that hasn't
+        # started yet checks its request when it does
+        current = self._stop_requests.get(job_id)
+        if current is None or _STOP_ORDER.index(reason) < _STOP_ORDER.index(current):
+            self._stop_requests[job_id] = reason
+        task = self._tasks.get(job_id)
+        if task is not None:
+            task.cancel()
+
+    def _host_limit(self, host: str) -> int:
+        """The number of downloads a host may run at once now."""
+        if self.breakers is None:
+            return self.max_per_host
+        return self.breakers.limit(host, self.max_per_host)
+
+    def _pump(self):
+        """Starts queued jobs while there are free slots, skipping jobs whose host
+        is full or whose backoff isn't over, and preempts lower-priority jobs
+        when the slots are all busy."""
+        starting = []
+        now = time.monotonic()
+        wake = None
+        with self._lock:
+            skipped: deque[Job] = deque()
+            while self._pending and len(self._running) < self.max_workers:
+                job = self._pending.popleft()
+                limit = self._host_limit(job.host)
+                if job.not_before > now:
+                    skipped.append(job)
+                    wake = min(wake or job.not_before, job.not_before)
+                elif self._host_active.get(job.host, 0) >= limit:
+                    skipped.append(job)
+                    reopens = self.breakers.reopens_in(job.host) if limit == 0 else None # type: ignore
+                    if reopens is not None:
+                        wake = min(wake or now + reopens, now + reopens)
+                else:
+                    self._host_active[job.host] = self._host_active.get(job.host, 0) + 1
+                    self._running[job.id] = job
+                    starting.append(job)
+            skipped.extend(self._pending)
+            self._pending = skipped
+            victims = self._choose_victims(now)
+            self._preempting.update(victim.id for victim in victims)
+            if wake is not None and (self._wake_at is None or wake < self._wake_at):
+                self._wake_at = wake
+            else:
+                wake = None
+
+        if wake is not None:
+            self.supervisor.call_later(max(0.0, wake - now), self._wake)
+
+        # Started outside the lock: a job that finishes at once re-enters _pump
+        for job in starting:
+            self.supervisor.submit(self._run_slot(job))
+        for victim in victims:
+            self.supervisor.call_soon(self._stop_task, victim.id, _STOP_PREEMPT)
+
+    def _wake(self):
+        """Starts the jobs whose backoff or host cooldown is over. Runs on the loop thread."""
+        with self._lock:
+            self._wake_at = None
+        self._pump()
+
+    def _choose_victims(self, now: float) -> list[Job]:
+        """Picks running jobs to stop for higher-priority queued ones. Caller holds the lock."""
+        if len(self._running) < self.max_workers or not self._pending:
+            return []
+
+        victims: list[Job] = []
+        # Each preemption already under way makes room for one waiting job
+        spare = len(self._preempting)
+        for job in self._pending:
+            if job.not_before > now:
+                continue
+            limit = self._host_limit(job.host)
+            candidates = [
+                running for running in self._running.values()
+                if running.priority < job.priority and not running.children
+                and running.id not in self._preempting and running not in victims
+                and limit > 0 and (running.host == job.host or self._host_active.get(job.host, 0) < limit)
+            ]
+            if not candidates:
+                continue
+            if spare:
+                spare -= 1
+                continue
+            # The lowest priority loses; among equals, the most recently started
+            victims.append(min(reversed(candidates), key=lambda running: running.priority))
+        return victims
+
+    async def _run_slot(self, job: Job):
+        """Runs a job in its slot. The slot is freed only once the job's process
+        tree is gone, so a requeued job never runs twice at the same time. A
+        post-processing stage runs after the slot is freed."""
+        self._tasks[job.id] = asyncio.current_task() # type: ignore
+        stopped = None
+        post_stage = None
+        waiting = None
+        backoff = None
+        try:
+            if job.id in self._stop_requests:
+                raise asyncio.CancelledError()
+            post_stage = await self._run_job(job)
+        except asyncio.CancelledError:
+            stopped = self._stop_requests.get(job.id, _STOP_CANCEL)
+        except _WaitForSpace as e:
+            waiting = e
+        except _RetryLater as e:
+            backoff = e.delay
+        finally:
+            if post_stage is None:
+                del self._tasks[job.id]
+                self._stop_requests.pop(job.id, None)
+        self._job_exited(job, stopped, post_stage is not None, waiting, backoff)
+        if post_stage is not None:
+            await self._run_post_stage(job, post_stage)
+
+    async def _run_post_stage(self, job: Job, post_stage: Callable[[], Awaitable[None]]):
+        """Runs a job's post-processing outside its (already freed) slot."""
+        stopped = None
+        try:
+            if job.id in self._stop_requests:
+                raise asyncio.CancelledError()
+            await post_stage()
+        except asyncio.CancelledError:
+            stopped = _STOP_CANCEL
+        finally:
+            del self._tasks[job.id]
+            self._stop_requests.pop(job.id, None)
+            with self._lock:
+                self._postprocessing.discard(job.id)
+
+        if stopped is not None and not job.finished:
+            self._finish_cancelled(job)
+        self._release_space(job)
+        with self._idle:
+            self._idle.notify_all()
+
+    def _job_exited(self, job: Job, stopped: Optional[str], processing: bool = False,
+                    waiting: Optional[_WaitForSpace] = None, backoff: Optional[float] = None):
+        """Frees a job's slot, settles a stopped job, requeues a job that will
+        be retried, and starts the next queued jobs."""
+        retry = False
+        with self._lock:
+            del self._running[job.id]
+            self._host_active[job.host] -= 1
+            self._preempting.discard(job.id)
+            if processing:
+                self._postprocessing.add(job.id)
+            elif waiting is not None and stopped is None:
+                # Space released since the job was turned away is tried at once
+                retry = waiting.releases != self._space_releases
+                if not retry:
+                    # Set under the lock, so a cancel can't be overwritten
+                    job.state = JobState.QUEUED
+                    self._space_waiting.append(job)
+
+        if not processing:
+            # A job in the pool keeps its space until its result is in place
+            self._release_space(job)
+        if waiting is not None and stopped is None:
+            if retry:
+                self._enqueue(job, front=True)
+            else:
+                if self.journal is not None:
+                    self.journal.record_state(job.uid, JobState.QUEUED.value)
+                self._notify_state(job)
+        if backoff is not None and stopped is None:
+            # Waits in the queue, keeping its place, until the backoff is over
+            job.not_before = time.monotonic() + backoff
+            self._enqueue(job, front=True)
+
+        if stopped is not None and not job.finished:
+            if stopped == _STOP_PAUSE:
+                self._set_state(job, JobState.PAUSED)
+                if self.status_callback is not None:
+                    self.status_callback(job, "[Queue] Paused.", False)
+            elif stopped == _STOP_PREEMPT:
+                if self.status_callback is not None:
+                    self.status_callback(job, "[Queue] Preempted by a higher-priority job, requeued.", False)
+                self._enqueue(job, front=True)
+            else:
+                self._finish_cancelled(job)
+        self._pump()
+        with self._idle:
+            self._idle.notify_all()
+
+    def _release_space(self, job: Job):
+        """Releases a job's disk space reservation and requeues the jobs waiting for space."""
+        if self.disk is None or not self.disk.release(job.id):
+            return
+        with self._lock:
+            self._space_releases += 1
+            waiting = list(self._space_waiting)
+            self._space_waiting.clear()
+        for other in waiting:
+            self._enqueue(other, front=True)
+
+    def _finish_cancelled(self, job: Job):
+        if self.staging is not None:
+            self.staging.remove(job.uid)
+        job.metrics.mark_finished()
+        self._set_state(job, JobState.CANCELLED)
+        if self.status_callback is not None:
+            self.status_callback(job, "[Queue] Download cancelled.", False)
+        self._export_metrics(job)
+        if job.parent is not None:
+            self._entry_finished(job.parent)
+
+    async def _run_job(self, job: Job) -> Optional[Callable[[], Awaitable[None]]]:
+        """Runs a single job and records its final state.
+
+        Returns:
+            The job's post-processing stage, if its files still need merging or
+            converting; the job is finished by that stage instead.
+        """
+        job.metrics.mark_started()
+        self._set_state(job, JobState.RUNNING)
+
+        classifier = FailureClassifier()
+
+        def forward(line: str, is_progress: bool = False):
+            if not is_progress:
+                classifier.observe(line)
+            if self.fragments is not None and not is_progress and is_throttle_line(line):
+                if self.fragments.throttled(job.id):
+                    self._retune(job.id, _RETUNE_FRAGMENTS)
+            if self.status_callback is not None:
+                self.status_callback(job, line, is_progress)
+
+        def forward_progress(event: ProgressEvent):
+            job.progress = event
+            job.metrics.on_progress(event)
+            if event.phase == "postprocess" and event.postprocessor and event.postprocessor not in job.postprocessors:
+                job.postprocessors.append(event.postprocessor)
+            if self.bandwidth is not None:
+                if event.phase == "postprocess":
+                    # ffmpeg doesn't need the share; the others get it at their next rebalance
+                    self.bandwidth.remove(job.id)
+                elif event.speed is not None:
+                    self.bandwidth.observe(job.id, event.speed)
+            if self.fragments is not None:
+                self.fragments.observe(job.id, event)
+            if self.disk is not None and event.downloaded_bytes:
+                self.disk.wrote(job.id, event.downloaded_bytes)
+            if self.progress_callback is not None:
+                self.progress_callback(job, event)
+            else:
+                forward(f"[Engine] {event.format()}", True)
+
+        def record_file(completed: CompletedFile):
+            job.files.append(completed.filepath)
+            job.extractor = completed.extractor
+            if self.journal is not None:
+                self.journal.record_file(job.uid, completed.filepath)
+            if self.archive is not None:
+                self.archive.add(DownloadArchive.make_key(completed.extractor, completed.video_id))
+            forward(f"[Engine] Saved: {completed.filepath}", False)
+
+        collected: list[CompletedFile] = []
+
+        def collect(completed: CompletedFile):
+            # Unprocessed streams or staged files; they are recorded once final and in place
+            job.extractor = completed.extractor
+            collected.append(completed)
+
+        if self._archived(job):
+            # Known from the URL alone: no probe needed either
+            job.skipped = True
+            forward("[Archive] Already downloaded, skipping.", False)
+            self._finish_job(job, True)
+            return None
+
+        # Pinned for the job's lifetime: an engine update only affects jobs started after it
+        job.download.yt_dlp_exe = engine_path()
+        # Cached by the binary registry; only a new binary is actually run
+        job.engine_version = await asyncio.to_thread(binary_version, job.download.yt_dlp_exe)
+
+        if self.prober is not None and job.parent is None:
+            # Playlist entries already carry the metadata listed by the playlist probe
+            probe_start = time.monotonic()
+            await self._probe(job, forward)
+            job.metrics.probe_seconds = time.monotonic() - probe_start
+            if self._expand_playlist(job, forward):
+                # The entries now carry the work; the playlist finishes with them
+                return
+
+        if self.archive is not None and DownloadArchive.key_for(job.info) in self.archive:
+            job.skipped = True
+            forward("[Archive] Already downloaded, skipping.", False)
+            ok = True
+        else:
+            job.plan = plan_for(job.download.aud_only, job.download.audio_mode, job.info)
+            if job.info and job.info.get("formats"):
+                forward(f"[Format] {job.plan.description}", False)
+            raw = self.postprocess is not None and job.plan.raw_selector is not None
+            work_dir = None
+            if self.staging is not None:
+                work_dir = await asyncio.to_thread(self.staging.job_dir, job.uid)
+            if self.disk is not None and not await self._reserve_space(job, work_dir, forward):
+                self._finish_job(job, False)
+                return None
+            job.metrics.mark_spawned()
+            try:
+                ok = await self._download(job, forward, forward_progress,
+                                          collect if raw or work_dir else record_file, raw, work_dir)
+            except Exception as e:
+                job.error = str(e)
+                ok = False
+            if not ok:
+                # Raises _RetryLater if the download should be tried again
+                self._failed(job, classifier, forward)
+            elif self.breakers is not None:
+                self.breakers.succeeded(job.host, self.max_per_host)
+
+            if ok and raw:
+                task = task_for(job.plan, [completed.filepath for completed in collected])
+                if task is not None:
+                    return self._post_stage(job, task, collected[0], forward, record_file)
+            if ok and collected:
+                # Staged files, or raw ones with nothing left to do (e.g. the source was an mp3 already)
+                moved = await self._move_out(job, collected, forward)
+                for completed in moved or []:
+                    record_file(completed)
+                ok = moved is not None
+
+            if ok:
+                job.processing = classify(job.plan, job.postprocessors)
+                if job.processing == PROCESSING_TRANSCODE:
+                    forward("[Format] Transcoded.", False)
+                elif job.processing == PROCESSING_REMUX:
+                    forward("[Format] Remuxed without re-encoding.", False)
+            if ok and self.archive is not None:
+                # In case yt-dlp didn't announce the file (e.g. it was already on disk)
+                self.archive.add(DownloadArchive.key_for(job.info))
+
+        self._finish_job(job, ok)
+        return None
+
+    def _post_stage(self, job: Job, task: PostTask, source: CompletedFile,
+                    forward, record_file) -> Callable[[], Awaitable[None]]:
+        """Marks a downloaded job as processing, and returns the stage that
+        runs its PostTask in the pool and finishes it."""
+        self._set_state(job, JobState.PROCESSING)
+
+        async def post_stage():
+            started = time.monotonic()
+            ok = await self.postprocess.run(self.supervisor, task, forward) # type: ignore
+            job.metrics.postprocess_seconds += time.monotonic() - started
+            if ok:
+                moved = await self._move_out(job, [CompletedFile(source.extractor, source.video_id, task.output)], forward)
+                ok = moved is not None
+            else:
+                # Kept for the user, so they belong in the save location too
+                await self._move_out(job, [CompletedFile(source.extractor, source.video_id, path)
+                                           for path in task.inputs if os.path.exists(path)], forward)
+                job.error = "Post-processing failed; the unprocessed files were kept."
+            if ok:
+                record_file(moved[0])
+                job.processing = task.processing
+                forward("[Format] Transcoded." if task.processing == PROCESSING_TRANSCODE
+                        else "[Format] Remuxed without re-encoding.", False)
+                if self.archive is not None:
+                    self.archive.add(DownloadArchive.key_for(job.info))
+            self._finish_job(job, ok)
+
+        return post_stage
+
+    def _failed(self, job: Job, classifier: FailureClassifier, forward):
+        """Records a failed download against its host, and decides whether it is retried.
+
+        Raises:
+            _RetryLater: If the job should be tried again after a backoff.
+        """
+        kind = classifier.kind
+        if self.breakers is not None:
+            cooldown = self.breakers.failed(job.host, kind, self.max_per_host)
+            if cooldown is not None:
+                forward(f"[Retry] {job.host} keeps failing; pausing its downloads for {cooldown:.0f}s.", False)
+            elif kind == THROTTLED:
+                limit = self.breakers.limit(job.host, self.max_per_host)
+                forward(f"[Retry] {job.host} is throttling; running at most {limit} of its downloads at a time.", False)
+
+        delay = self.retry.backoff(job.retries + 1, kind) if self.retry is not None else None
+        if delay is None:
+            job.error = job.error or classifier.reason
+            return
+        job.retries += 1
+        forward(f"[Retry] Download failed ({kind}); retrying in {delay:.1f}s, "
+                f"attempt {job.retries + 1} of {self.retry.max_attempts}.", False) # type: ignore
+        raise _RetryLater(delay)
+
+    def _archived(self, job: Job) -> bool:
+        """True if the archive has the video the job's URL names."""
+        canonical = job.canonical
+        if self.archive is None or canonical is None or not canonical.extractor or not canonical.video_id:
+            return False
+        if canonical.playlist_id and not job.download.ignore_playlist:
+            return False
+        return DownloadArchive.make_key(canonical.extractor, canonical.video_id) in self.archive
+
+    async def _reserve_space(self, job: Job, work_dir: Optional[str], forward) -> bool:
+        """Reserves the disk space a job needs before it downloads (see `_space_needs`).
+
+        Returns:
+            bool: False if there isn't enough space and waiting won't help
+            (the job's error says why).
+
+        Raises:
+            _WaitForSpace: If running jobs hold the space it needs.
+        """
+        needs = _space_needs(job.plan, job.info, work_dir, job.download.save_path) # type: ignore
+        with self._lock:
+            releases = self._space_releases
+        try:
+            shortage = await asyncio.to_thread(self.disk.reserve, job.id, needs) # type: ignore
+        except OSError as e:
+            forward(f"[Space] Could not check the free space: {e}", False)
+            return True
+        if shortage is None:
+            return True
+        if await asyncio.to_thread(self.disk.waiting_helps, job.id, needs): # type: ignore
+            forward(f"[Space] {shortage}; waiting for running downloads to finish...", False)
+            raise _WaitForSpace(releases)
+        job.error = shortage
+        forward(f"[Space] {shortage}", False)
+        return False
+
+    async def _move_out(self, job: Job, files: list[CompletedFile], forward) -> Optional[list[CompletedFile]]:
+        """Moves a job's finished files from its staging folder to the save location.
+
+        Returns:
+            list[CompletedFile] | None: The files at their final paths, or None
+            if one couldn't be moved (the job's error says why).
+        """
+        moved = []
+        for completed in files:
+            if self.staging is None or not self.staging.contains(completed.filepath):
+                moved.append(completed)
+                continue
+            name = os.path.basename(completed.filepath)
+            try:
+                path = await asyncio.to_thread(move_file, completed.filepath, job.download.save_path)
+            except OSError as e:
+                job.error = f"Could not move {name} to {job.download.save_path}: {e}"
+                forward(f"[Staging] {job.error}", False)
+                return None
+            moved.append(completed._replace(filepath=path))
+        return moved
+
+    def _finish_job(self, job: Job, ok: bool):
+        if self.staging is not None:
+            self.staging.remove(job.uid)
+        job.metrics.mark_finished()
+        self._set_state(job, JobState.DONE if ok else JobState.FAILED)
+        self._export_metrics(job)
+        if job.parent is not None:
+            self._entry_finished(job.parent)
+
+    async def _download(self, job: Job, forward, forward_progress, record_file, raw: bool = False,
+                        work_dir: Optional[str] = None) -> bool:
+        """Runs the job's download, restarting it in place (it continues from its
+        .part files) whenever its bandwidth share or fragment count is retuned."""
+        rate = fragments = None
+        if self.bandwidth is not None:
+            self.bandwidth.add(job.id)
+            rate = self.bandwidth.share(job.id)
+            if rate is not None:
+                forward(f"[Bandwidth] Limited to {format_bytes(rate)}/s", False)
+        if self.fragments is not None:
+            fragments = self.fragments.begin(job.id, job.host)
+        if self.bandwidth is not None or self.fragments is not None:
+            self._start_retuner()
+
+        try:
+            while True:
+                if self.bandwidth is not None:
+                    self.bandwidth.assign(job.id, rate)
+                attempt = asyncio.ensure_future(job.download.run_download_async(
+                    self.supervisor, forward, forward_progress, record_file,
+                    timeout=self.job_timeout, idle_timeout=self.idle_timeout,
+                    rate_limit=rate, fragments=fragments, downloader=self.downloader,
+                    plan=job.plan, raw=raw, work_dir=work_dir
+                ))
+                self._attempts[job.id] = attempt
+                try:
+                    return await attempt
+                except asyncio.CancelledError:
+                    if asyncio.current_task().cancelling(): # type: ignore
+                        # The job itself was stopped, not just this run
+                        raise
+                finally:
+                    self._attempts.pop(job.id, None)
+
+                reasons = self._retunes.pop(job.id, set())
+                if _RETUNE_BANDWIDTH in reasons:
+                    rate = self.bandwidth.share(job.id) # type: ignore
+                    shown = f"{format_bytes(rate)}/s" if rate is not None else "unlimited"
+                    forward(f"[Bandwidth] Share changed to {shown}, continuing the download...", False)
+                if _RETUNE_FRAGMENTS in reasons:
+                    fragments = self.fragments.restarted(job.id) # type: ignore
+                    forward(f"[Fragments] Continuing with {fragments} concurrent fragment(s)...", False)
+        finally:
+            if self.bandwidth is not None:
+                self.bandwidth.remove(job.id)
+            if self.fragments is not None:
+                self.fragments.end(job.id)
+
+    def _retune(self, job_id: int, reason: str):
+        """Restarts a job's current yt-dlp run with new settings. Runs on the loop thread."""
+        attempt = self._attempts.get(job_id)
+        if attempt is not None and not attempt.done():
+            self._retunes.setdefault(job_id, set()).add(reason)
+            attempt.cancel()
+
+    def _start_retuner(self):
+        """Starts the periodic retuning if it isn't running. Runs on the loop thread."""
+        if self._retuner is None or self._retuner.done():
+            self._retuner = asyncio.ensure_future(self._retune_loop())
+
+    async def _retune_loop(self):
+        """Retunes the running downloads' shares and fragment counts, until none is downloading."""
+        while True:
+            await asyncio.sleep(RETUNE_INTERVAL)
+            if not self._attempts:
+                return
+            if self.bandwidth is not None:
+                for job_id in self.bandwidth.stale():
+                    self._retune(job_id, _RETUNE_BANDWIDTH)
+            if self.fragments is not None:
+                for job_id in list(self._attempts):
+                    if self.fragments.retune(job_id):
+                        self._retune(job_id, _RETUNE_FRAGMENTS)
+
+    def _export_metrics(self, job: Job):
+        """Hands a finished download's metrics to the exporter."""
+        if self.metrics is None:
+            return
+        info = job.info or {}
+        record = {
+            "time": time.time(),
+            "uid": job.uid,
+            "url": job.download.link,
+            "host": job.host,
+            "extractor": job.extractor or info.get("extractor_key") or info.get("ie_key"),
+            "status": job.state.value,
+            "skipped": job.skipped,
+            "files": len(job.files),
+            "processing": job.processing,
+            "engine_version": job.engine_version,
+            "retries": job.retries,
+        }
+        record.update(job.metrics.to_dict())
+        self.metrics.export(record)
+
+    async def _probe(self, job: Job, forward: Callable[[str, bool], None]):
+        """Fetches the job's metadata (usually from cache) and reports it."""
+        try:
+            job.info = await self.prober.probe( # type: ignore
+                self.supervisor, job.download.link,
+                playlist=not job.download.ignore_playlist
+            )
+        except ProbeError as e:
+            # Not fatal: yt-dlp will report the real error if the download fails too
+            forward(f"[Probe] {e}", False)
+            return
+
+        details = []
+        if job.info.get("duration"):
+            details.append(format_eta(job.info["duration"]))
+        size = job.info.get("filesize") or job.info.get("filesize_approx")
+        if size:
+            details.append(format_bytes(size))
+        if job.info.get("entries") is not None:
+            details.append(f"{len(job.info['entries'])} entries")
+        suffix = f" ({', '.join(details)})" if details else ""
+        forward(f"[Probe] {job.info.get('title') or job.download.link}{suffix}", False)
+
+    def _expand_playlist(self, job: Job, forward: Callable[[str, bool], None]) -> bool:
+        """Queues one job per playlist entry, in playlist order.
+
+        Returns:
+            bool: True if the job was expanded, False if it should download as-is.
+        """
+        if job.download.ignore_playlist or not job.info or not job.info.get("entries"):
+            return False
+
+        entries = job.info["entries"]
+        if not all((entry.get("url") or "").startswith(("https://", "http://")) for entry in entries):
+            # Some extractors only list IDs; let yt-dlp fetch the playlist itself
+            return False
+
+        # Entries keep their playlist position even when archived ones are left out
+        pending = [
+            (i, entry) for i, entry in enumerate(entries, start=1)
+            if self.archive is None or DownloadArchive.key_for(entry) not in self.archive
+        ]
+        known = len(entries) - len(pending)
+        if not pending:
+            job.skipped = True
+            forward(f"[Archive] All {known} entries already downloaded, skipping.", False)
+            self._finish_job(job, True)
+            return True
+
+        # Every entry is attached before any is queued, so the playlist can't finish early
+        children = [
+            self._create_job(job.download.for_entry(entry["url"]), parent=job, index=i, info=entry,
+                             priority=job.priority)
+            for i, entry in pending
+        ]
+        for child in children:
+            self._enqueue(child)
+        message = f"[Playlist] Queued {len(children)} entries as jobs #{children[0].id}-#{children[-1].id}"
+        if known:
+            message += f" ({known} already downloaded)"
+        forward(message, False)
+        return True
+
+    def _entry_finished(self, parent: Job):
+        """Completes a playlist job once all of its entries have finished."""
+        with self._lock:
+            if parent.finished or not all(child.finished for child in parent.children):
+                return
+            failed = [child for child in parent.children if child.state == JobState.FAILED]
+            cancelled = [child for child in parent.children if child.state == JobState.CANCELLED]
+            if failed:
+                parent.state = JobState.FAILED
+            else:
+                parent.state = JobState.CANCELLED if cancelled else JobState.DONE
+
+        if failed:
+            parent.error = f"{len(failed)} of {len(parent.children)} entries failed: " + ", ".join(
+                f"{child.index} (#{child.id})" for child in failed
+            )
+        if self.journal is not None:
+            self.journal.record_state(parent.uid, parent.state.value)
+        if self.status_callback is not None:
+            if parent.error:
+                summary = parent.error
+            elif cancelled:
+                summary = f"{len(cancelled)} of {len(parent.children)} entries cancelled."
+            else:
+                summary = f"All {len(parent.children)} entries downloaded."
+            self.status_callback(parent, f"[Playlist] {summary}", False)
+        self._notify_state(parent)
+
+    def _set_state(self, job: Job, state: JobState):
+        job.state = state
+        if self.journal is not None:
+            self.journal.record_state(job.uid, state.value)
+        self._notify_state(job)
+
+    def _notify_state(self, job: Job):
+        if self.state_callback is not None:
+            try:
+                self.state_callback(job)
+            except Exception:
+                # A faulty UI callback must never kill a job
+                pass
@@ -0,0 +1,255 @@
+"""This module keeps unfinished downloads off the save location.
+
+With a StagingArea, every job downloads (and merges) in its own folder on
+a fast local disk. yt-dlp's .part files, fragments and merge temporaries
+never touch the save location, which may be a slow network share: only
+the finished files are moved there. The move is an atomic rename on the
+same filesystem, and otherwise a copy with a large buffer into a hidden
+temporary file that is then renamed into place, so a file in the save
+location is always complete.
+
+A DiskBudget admits a download only if the volumes it writes to have room
+for its expected size, counting the space already promised to the
+downloads that are running.
+
+Classes:
+    - StagingArea: Per-job work folders, and the move out of them.
+    - DiskBudget: Free-space reservations for running downloads.
+
+Functions:
+    - move_file: Moves a file into a folder atomically, across filesystems too.
+    - free_bytes: Returns the free space of the volume a path is on.
+    - staging_from_spec: Builds a staging area from a config value.
+    - disk_budget_from_spec: Builds a disk budget from a config value.
+"""
+import os
+import time
+import errno
+import shutil
+import tempfile
+import threading
+from typing import Optional, Union
+from bandwidth import parse_rate
+from progress import format_bytes
+
+# Buffer size for copies across filesystems
+COPY_BUFFER = 16 * 1024 * 1024
+# Free space kept on every volume by default, on top of the expected sizes
+DEFAULT_MIN_FREE = 256 * 1024 * 1024
+# Seconds a job folder may sit untouched before `prune` considers it abandoned
+STALE_AFTER = 24 * 60 * 60
+
+
+def move_file(source: str, folder: str) -> str:
+    """Moves a file into a folder, keeping its name.
+
+    A rename is used on the same filesystem. Across filesystems, the file is
+    copied with a COPY_BUFFER buffer into a hidden temporary file next to its
+    destination, which is renamed into place once complete; only then is the
+    source deleted.
+
+    Returns:
+        str: The file's new path.
+
+    Raises:
+        OSError: If the file couldn't be moved (the source is left as it was).
+    """
+    os.makedirs(folder, exist_ok=True)
+    destination = os.path.join(folder, os.path.basename(source))
+    try:
+        os.replace(source, destination)
+        return destination
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+
+    handle, temp_path = tempfile.mkstemp(prefix=f".{os.path.basename(source)}.", suffix=".partial", dir=folder)
+    try:
+        with open(source, "rb") as src, os.fdopen(handle, "wb") as dst:
+            shutil.copyfileobj(src, dst, COPY_BUFFER)
+            dst.flush()
+            os.fsync(dst.fileno())
+        shutil.copystat(source, temp_path)
+        os.replace(temp_path, destination)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+    os.remove(source)
+    return destination
+
+
+def _existing(path: str) -> str:
+    """The nearest existing folder at or above a path."""
+    path = os.path.abspath(path)
+    while not os.path.exists(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    return path
+
+
+def free_bytes(path: str) -> int:
+    """Returns the free space of the volume a path is (or would be) on."""
+    return shutil.disk_usage(_existing(path)).free
+
+
+class StagingArea:
+    """Per-job work folders under a root on a fast local disk.
+
+    Attributes:
+        root (str): The folder the job folders are created in.
+    """
+    def __init__(self, root: str) -> None:
+        self.root = os.path.abspath(root)
+
+    def job_dir(self, uid: str) -> str:
+        """Creates (if needed) and returns a job's work folder.
+
+        It is named after the job's uid, so a resumed job finds its .part files.
+        """
+        path = os.path.join(self.root, uid)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def contains(self, path: str) -> bool:
+        """True if a path is inside the staging area."""
+        return os.path.abspath(path).startswith(self.root + os.sep)
+
+    def remove(self, uid: str):
+        """Deletes a job's work folder and whatever is left in it."""
+        shutil.rmtree(os.path.join(self.root, uid), ignore_errors=True)
+
+    def prune(self, keep: set[str]) -> int:
+        """Deletes the work folders of jobs that will never resume: those not in
+        `keep` that haven't been touched for STALE_AFTER seconds (another
+        instance may still be using a recent one).
+
+        Returns:
+            int: The number of folders deleted.
+        """
+        try:
+            names = os.listdir(self.root)
+        except OSError:
+            return 0
+        cutoff = time.time() - STALE_AFTER
+        removed = 0
+        for name in names:
+            path = os.path.join(self.root, name)
+            try:
+                if name in keep or not os.path.isdir(path) or os.path.getmtime(path) > cutoff:
+                    continue
+            except OSError:
+                continue
+            shutil.rmtree(path, ignore_errors=True)
+            removed += 1
+        return removed
+
+
+def staging_from_spec(spec: Union[None, bool, str]) -> Optional[StagingArea]:
+    """Builds a staging area from a config value: a folder, "auto" (or True)
+    for a folder in the system's temporary directory, or None/False/"off"
+    to download straight into the save location."""
+    if spec is None or spec is False or str(spec).strip().lower() in ("", "off"):
+        return None
+    if spec is True or str(spec).strip().lower() == "auto":
+        return StagingArea(os.path.join(tempfile.gettempdir(), "yt-dlp-simplified"))
+    return StagingArea(os.path.expanduser(str(spec)))
+
+
+class DiskBudget:
+    """Free-space reservations for the running downloads.
+
+    A download reserves its expected size on every volume it writes to when
+    it is admitted, and releases it when it finishes. A volume admits a
+    download only if its free space, less what the others have reserved on
+    it but not yet written and `min_free`, covers the download's reservation
+    there. Thread-safe.
+
+    Attributes:
+        min_free (int): Bytes to always leave free on every volume.
+    """
+    def __init__(self, min_free: int = DEFAULT_MIN_FREE) -> None:
+        self.min_free = max(0, int(min_free))
+        self._lock = threading.Lock()
+        # Job ID -> {volume (st_dev): (folder, bytes)}
+        self._reserved: dict[int, dict[int, tuple[str, int]]] = {}
+        # Job ID -> bytes it has written so far
+        self._written: dict[int, int] = {}
+
+    def reserve(self, job_id: int, needs: dict[str, int]) -> Optional[str]:
+        """Reserves space for a download.
+
+        Args:
+            job_id (int): The download's job.
+            needs (dict[str, int]): Bytes needed per folder. Folders on the same
+                volume share their space: the largest need counts.
+
+        Returns:
+            str | None: None if the space was reserved, else the folder that
+            is short of space and by how much, as a message.
+        """
+        volumes: dict[int, tuple[str, int]] = {}
+        for folder, size in needs.items():
+            device = os.stat(_existing(folder)).st_dev
+            if device not in volumes or size > volumes[device][1]:
+                volumes[device] = (folder, max(0, int(size)))
+
+        with self._lock:
+            for device, (folder, size) in volumes.items():
+                promised = sum(max(0, reserved[device][1] - self._written.get(other, 0))
+                               for other, reserved in self._reserved.items()
+                               if other != job_id and device in reserved)
+                free = free_bytes(folder)
+                if free - promised - self.min_free < size:
+                    return _shortage(folder, size, free - promised - self.min_free)
+            self._reserved[job_id] = volumes
+        return None
+
+    def release(self, job_id: int) -> bool:
+        """Releases a download's reservation.
+
+        Returns:
+            bool: False if it had none.
+        """
+        with self._lock:
+            self._written.pop(job_id, None)
+            return self._reserved.pop(job_id, None) is not None
+
+    def wrote(self, job_id: int, written: int):
+        """Records how many bytes a download has written, which no longer
+        need to be kept free for it."""
+        with self._lock:
+            if job_id in self._reserved and written > self._written.get(job_id, 0):
+                self._written[job_id] = written
+
+    def waiting_helps(self, job_id: int, needs: dict[str, int]) -> bool:
+        """True if other downloads hold space on a volume `needs` is short on,
+        so waiting for them to finish may make room."""
+        devices = {os.stat(_existing(folder)).st_dev for folder in needs}
+        with self._lock:
+            return any(device in reserved for other, reserved in self._reserved.items()
+                       if other != job_id for device in devices)
+
+
+def _shortage(folder: str, size: int, available: int) -> str:
+    return (f"Not enough free space in {folder}: about {format_bytes(size)} needed, "
+            f"{format_bytes(max(0, available))} available")
+
+
+def disk_budget_from_spec(spec: Union[None, bool, int, float, str]) -> Optional[DiskBudget]:
+    """Builds a disk budget from a config value: the space to always leave
+    free, like "1G" (None or True for the default), or False/"off" to admit
+    downloads without checking.
+
+    Raises:
+        ValueError: If the value can't be parsed.
+    """
+    if spec is None or spec is True:
+        return DiskBudget()
+    if spec is False or str(spec).strip().lower() == "off":
+        return None
+    return DiskBudget(int(parse_rate(spec) or 0))
@@ -0,0 +1,273 @@
+"""This module contains the asyncio process supervisor and the bridge that feeds its events to Tk.
+
+All yt-dlp/ffmpeg children are started with `asyncio.create_subprocess_exec`
+and supervised from a single event loop running on one background thread,
+instead of one blocked OS thread per process. Output is read without
+blocking, processes can be given overall and idle timeouts, and
+cancellation kills the whole process tree.
+
+Classes:
+    - ProcessTimeout: Raised when a supervised process hits a timeout.
+    - ProcessSupervisor: Runs and supervises child processes on one event loop.
+    - TkBridge: Runs callbacks posted from any thread on the Tk main thread.
+"""
+import os
+import sys
+import signal
+import asyncio
+import threading
+import concurrent.futures
+from collections import deque
+from typing import Any, Callable, Coroutine, Optional
+
+# Seconds a process gets to exit after SIGTERM before it is killed
+KILL_GRACE = 3.0
+# Longest output line accepted from a child
+LINE_LIMIT = 1024 * 1024
+
+
+class ProcessTimeout(Exception):
+    """Raised when a supervised process runs too long or goes quiet for too long."""
+
+
+class ProcessSupervisor:
+    """Runs child processes from one asyncio event loop on a background thread.
+
+    The loop thread is started on first use. Coroutine methods must run on
+    the loop; the other public methods are safe to call from any thread.
+    """
+    def __init__(self) -> None:
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._processes: set[asyncio.subprocess.Process] = set()
+
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """The supervisor's event loop, started on first access."""
+        with self._lock:
+            if self._loop is None:
+                ready = threading.Event()
+                self._thread = threading.Thread(
+                    target=self._run_loop,
+                    args=(ready,),
+                    name="process-supervisor",
+                    daemon=True
+                )
+                self._thread.start()
+                ready.wait()
+            return self._loop # type: ignore
+
+    def _run_loop(self, ready: threading.Event):
+        if sys.platform == "win32":
+            # Only the proactor loop can run subprocesses on Windows
+            self._loop = asyncio.ProactorEventLoop()
+        else:
+            self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        ready.set()
+        self._loop.run_forever()
+
+    def submit(self, coro: Coroutine) -> concurrent.futures.Future:
+        """Schedules a coroutine on the loop from any thread."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def call_soon(self, func: Callable, *args):
+        """Calls a function on the loop thread."""
+        self.loop.call_soon_threadsafe(func, *args)
+
+    def call_later(self, delay: float, func: Callable, *args):
+        """Calls a function on the loop thread after `delay` seconds."""
+        loop = self.loop
+        loop.call_soon_threadsafe(loop.call_later, delay, func, *args)
+
+    def run(self, cmd: list[str], on_line: Callable[[str], None],
+            timeout: Optional[float] = None,
+            idle_timeout: Optional[float] = None) -> concurrent.futures.Future:
+        """Starts a process from any thread; see `run_process`.
+
+        Returns:
+            concurrent.futures.Future: Resolves to the exit code. Cancelling it
+            kills the process tree.
+        """
+        return self.submit(self.run_process(cmd, on_line, timeout, idle_timeout))
+
+    def stop(self):
+        """Kills every supervised process tree and stops the loop."""
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if loop is None:
+            return
+
+        async def shutdown():
+            tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            # Anything not owned by a task (shouldn't happen) goes too
+            await asyncio.gather(*(self.kill_tree(p) for p in list(self._processes)), return_exceptions=True)
+
+        try:
+            asyncio.run_coroutine_threadsafe(shutdown(), loop).result(timeout=KILL_GRACE + 5)
+        except Exception:
+            pass
+        loop.call_soon_threadsafe(loop.stop)
+        if thread is not None:
+            thread.join(timeout=5)
+
+
+    async def run_process(self, cmd: list[str], on_line: Callable[[str], None],
+                          timeout: Optional[float] = None,
+                          idle_timeout: Optional[float] = None,
+                          line_limit: int = LINE_LIMIT) -> int:
+        """Runs a process, feeding each line of its combined output to `on_line`.
+
+        Args:
+            cmd (list[str]): The command to run.
+            on_line (Callable[[str], None]): Called on the loop thread for every
+                line of stdout/stderr, without its line ending.
+            timeout (float | None): Seconds the process may run in total.
+            idle_timeout (float | None): Seconds the process may go without output.
+            line_limit (int): The longest line passed on; longer ones are dropped.
+
+        Returns:
+            int: The exit code.
+
+        Raises:
+            FileNotFoundError: If the executable doesn't exist.
+            ProcessTimeout: If a timeout was hit (the process tree is killed).
+            asyncio.CancelledError: If cancelled (the process tree is killed).
+        """
+        proc = await self.start_process(cmd, line_limit=line_limit)
+        try:
+            async with asyncio.timeout(timeout):
+                await self._pump_output(proc, on_line, idle_timeout)
+                return await proc.wait()
+        except TimeoutError:
+            await self.kill_tree(proc)
+            raise ProcessTimeout(f"Process timed out: {os.path.basename(cmd[0])}")
+        except BaseException:
+            # Cancellation (or a failing callback): never leave the tree running
+            await self.kill_tree(proc)
+            raise
+        finally:
+            self._processes.discard(proc)
+
+    async def start_process(self, cmd: list[str], stdin: int = asyncio.subprocess.DEVNULL,
+                            line_limit: int = LINE_LIMIT) -> asyncio.subprocess.Process:
+        """Starts a process in its own process group, with its stdout and stderr
+        combined into one pipe. It is killed by `stop` until it exits.
+
+        Args:
+            cmd (list[str]): The command to run.
+            stdin (int): asyncio.subprocess.PIPE to write to the process.
+            line_limit (int): The longest output line that can be read.
+
+        Raises:
+            FileNotFoundError: If the executable doesn't exist.
+        """
+        if sys.platform == "win32":
+            import subprocess
+            platform_args: dict[str, Any] = {
+                "creationflags": subprocess.CREATE_NO_WINDOW | subprocess.CREATE_NEW_PROCESS_GROUP
+            }
+        else:
+            # Own process group, so the whole tree (e.g. ffmpeg) can be signalled at once
+            platform_args = {"start_new_session": True}
+
+        proc = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdin=stdin,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+            limit=line_limit,
+            **platform_args
+        )
+        self._processes.add(proc)
+        asyncio.ensure_future(proc.wait()).add_done_callback(lambda _: self._processes.discard(proc))
+        return proc
+
+    async def _pump_output(self, proc: asyncio.subprocess.Process,
+                           on_line: Callable[[str], None],
+                           idle_timeout: Optional[float]):
+        reader = proc.stdout
+        assert reader is not None
+        while True:
+            try:
+                raw = await asyncio.wait_for(reader.readline(), idle_timeout)
+            except ValueError:
+                # An absurdly long line: the reader has dropped it, carry on
+                continue
+            except TimeoutError:
+                raise ProcessTimeout(f"No output for {idle_timeout:g} seconds")
+            if not raw:
+                return
+            on_line(raw.decode("utf-8", errors="replace").rstrip("\r\n"))
+
+    async def kill_tree(self, proc: asyncio.subprocess.Process):
+        """Terminates a process and all of its children, escalating to a hard kill."""
+        if proc.returncode is not None:
+            return
+
+        if sys.platform == "win32":
+            killer = await asyncio.create_subprocess_exec(
+                "taskkill", "/F", "/T", "/PID", str(proc.pid),
+                stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL
+            )
+            await killer.wait()
+        else:
+            try:
+                os.killpg(proc.pid, signal.SIGTERM)
+            except ProcessLookupError:
+                return
+
+        try:
+            await asyncio.wait_for(proc.wait(), KILL_GRACE)
+        except TimeoutError:
+            try:
+                if sys.platform == "win32":
+                    proc.kill()
+                else:
+                    os.killpg(proc.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            await proc.wait()
+
+
+class TkBridge:
+    """Delivers callbacks from any thread to the Tk main thread in batches.
+
+    Callbacks are queued without touching Tk and run once per frame by a
+    single `after` loop. Identical (function, args) pairs posted within one
+    frame run only once, so bursts of state changes cost one UI update.
+
+    Attributes:
+        interval (int): The delay between frames, in milliseconds.
+    """
+    def __init__(self, root, interval: int = 33) -> None:
+        self.interval = interval
+        self._root = root
+        self._pending: deque = deque()
+        self._root.after(self.interval, self._tick)
+
+    def post(self, func: Callable, *args):
+        """Queues `func(*args)` to run on the Tk thread. Safe to call from any thread."""
+        self._pending.append((func, args))
+
+    def _tick(self):
+        try:
+            seen = set()
+            while self._pending:
+                item = self._pending.popleft()
+                try:
+                    if item in seen:
+                        continue
+                    seen.add(item)
+                except TypeError:
+                    # Unhashable arguments: just run it
+                    pass
+                item[0](*item[1])
+        finally:
+            self._root.after(self.interval, self._tick)
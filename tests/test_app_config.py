@@ -0,0 +1,116 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+from app_config import BinaryRegistry, EngineSlots
+
+# Prints a version and counts how often it was run
+_TOOL = """#!/bin/sh
+echo run >> "$0.runs"
+echo 2024.01.01
+"""
+
+
+@unittest.skipUnless(sys.platform == "linux", "runs a shell script as the binary")
+class BinaryRegistryTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        cwd = os.getcwd()
+        # config.json stays in the scratch dir
+        os.chdir(self.tmp.name)
+        self.addCleanup(os.chdir, cwd)
+
+        self.tool = os.path.join(self.tmp.name, "tool")
+        self.write_tool(_TOOL)
+        self.cache_path = os.path.join(self.tmp.name, "binary_cache.json")
+        self.registry = BinaryRegistry(self.cache_path)
+
+    def write_tool(self, text, mode=0o644):
+        with open(self.tool, "w") as f:
+            f.write(text)
+        os.chmod(self.tool, mode)
+
+    def runs(self):
+        try:
+            with open(self.tool + ".runs") as f:
+                return len(f.readlines())
+        except FileNotFoundError:
+            return 0
+
+    def test_check_fixes_permissions_once(self):
+        self.assertIsNone(self.registry.check(self.tool))
+        self.assertTrue(os.access(self.tool, os.X_OK))
+        with open(self.cache_path) as f:
+            self.assertTrue(json.load(f)[os.path.abspath(self.tool)]["executable"])
+        self.assertEqual(self.registry.check(os.path.join(self.tmp.name, "missing")),
+                         f"Missing executable: {os.path.join(self.tmp.name, 'missing')}")
+
+    def test_version_is_probed_once(self):
+        self.registry.check(self.tool)
+        self.assertEqual(self.registry.version(self.tool), "2024.01.01")
+        self.assertEqual(self.registry.version(self.tool), "2024.01.01")
+        # A new registry reads the cache file instead of running the binary again
+        self.assertEqual(BinaryRegistry(self.cache_path).version(self.tool), "2024.01.01")
+        self.assertEqual(self.runs(), 1)
+
+    def test_changed_binary_is_probed_again(self):
+        self.registry.check(self.tool)
+        self.registry.version(self.tool)
+        self.write_tool(_TOOL.replace("2024.01.01", "2024.02.02-longer"), 0o755)
+        self.assertEqual(self.registry.version(self.tool), "2024.02.02-longer")
+        self.assertEqual(self.runs(), 2)
+
+    def test_config_override_wins(self):
+        with open("config.json", "w") as f:
+            json.dump({"path": "", "binaries": {"ffmpeg": self.tool}}, f)
+        self.assertEqual(self.registry.resolve("ffmpeg"), self.tool)
+
+
+class EngineSlotsTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.slots = EngineSlots(os.path.join(self.tmp.name, "engines"))
+
+    def install(self, version):
+        # Staged next to the slots, as the updater does
+        os.makedirs(self.slots.root, exist_ok=True)
+        staged = tempfile.mkdtemp(prefix=".staging-", dir=self.slots.root)
+        with open(os.path.join(staged, self.slots.exe_name), "w") as f:
+            f.write(version)
+        return self.slots.install(staged, version)
+
+    def test_switch_and_rollback(self):
+        self.assertIsNone(self.slots.active_path())
+        path = self.install("2024.01.01")
+        self.slots.switch("2024.01.01")
+        self.assertEqual(self.slots.active_path(), path)
+        self.install("2024.02.02")
+        self.slots.switch("2024.02.02")
+        self.assertEqual(self.slots.previous(), "2024.01.01")
+
+        self.assertEqual(self.slots.rollback(), "2024.01.01")
+        self.assertEqual((self.slots.active(), self.slots.previous()), ("2024.01.01", "2024.02.02"))
+        self.slots.switch(None)
+        self.assertIsNone(self.slots.active_path())
+
+    def test_nothing_to_roll_back_to(self):
+        with self.assertRaises(ValueError):
+            self.slots.rollback()
+
+    def test_prune_keeps_engines_in_use(self):
+        pinned = self.install("2023.12.01")
+        for version in ("2024.01.01", "2024.02.02", "2024.03.03"):
+            self.install(version)
+            self.slots.switch(version)
+        self.slots.prune(in_use=[pinned, "/elsewhere/yt-dlp"])
+        self.assertEqual(self.slots.versions(), ["2023.12.01", "2024.02.02", "2024.03.03"])
+        self.slots.prune()
+        self.assertEqual(self.slots.versions(), ["2024.02.02", "2024.03.03"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import unittest
+from datetime import datetime
+
+from bandwidth import MIN_SAMPLES, BandwidthBudget, BandwidthSchedule, budget_from_spec, parse_rate
+
+MiB = 1024 ** 2
+
+
+class ParseRateTest(unittest.TestCase):
+    def test_rates(self):
+        for value, expected in (("500K", 500 * 1024), ("4.2M", 4.2 * MiB), ("1g", 1024 ** 3),
+                                ("2MiB/s", 2 * MiB), (1000, 1000.0), ("750", 750.0)):
+            with self.subTest(value=value):
+                self.assertEqual(parse_rate(value), expected)
+
+    def test_unlimited(self):
+        for value in (None, "", 0, "0K"):
+            with self.subTest(value=value):
+                self.assertIsNone(parse_rate(value))
+
+    def test_invalid(self):
+        for value in ("fast", "1T", -5):
+            with self.subTest(value=value):
+                with self.assertRaises(ValueError):
+                    parse_rate(value)
+
+
+class BandwidthScheduleTest(unittest.TestCase):
+    def test_time_of_day(self):
+        schedule = BandwidthSchedule({"08:00": "2M", "19:00": None})
+        self.assertEqual(schedule.limit_at(datetime(2024, 1, 1, 12, 0)), 2 * MiB)
+        self.assertIsNone(schedule.limit_at(datetime(2024, 1, 1, 20, 0)))
+        # The evening entry carries over past midnight
+        self.assertIsNone(schedule.limit_at(datetime(2024, 1, 1, 3, 0)))
+        self.assertFalse(schedule.unlimited)
+
+    def test_never_limits(self):
+        self.assertIsNone(budget_from_spec(None))
+        self.assertIsNone(budget_from_spec({"08:00": None}))
+        with self.assertRaises(ValueError):
+            BandwidthSchedule({"25:00": "1M"})
+
+
+class BandwidthBudgetTest(unittest.TestCase):
+    def budget(self, total, *keys, min_rate=0.0):
+        budget = BandwidthBudget(BandwidthSchedule(total), min_rate=min_rate)
+        for key in keys:
+            budget.add(key)
+        return budget
+
+    def underuse(self, budget, key, speed, limit):
+        budget.assign(key, limit)
+        for _ in range(MIN_SAMPLES):
+            budget.observe(key, speed)
+
+    def test_even_split(self):
+        budget = self.budget(3 * MiB, "a", "b", "c")
+        self.assertEqual(budget.allocate(), {"a": MiB, "b": MiB, "c": MiB})
+
+    def test_unused_share_goes_to_the_others(self):
+        budget = self.budget(3 * MiB, "a", "b", "c")
+        self.underuse(budget, "a", 100 * 1024, MiB)
+        shares = budget.allocate()
+        self.assertAlmostEqual(shares["a"], 125 * 1024)
+        self.assertAlmostEqual(shares["b"], shares["c"])
+        self.assertAlmostEqual(sum(shares.values()), 3 * MiB)
+
+    def test_floor_is_taken_from_the_larger_shares(self):
+        budget = self.budget(MiB, "a", "b", min_rate=200 * 1024)
+        self.underuse(budget, "a", 10 * 1024, 512 * 1024)
+        shares = budget.allocate()
+        self.assertAlmostEqual(shares["a"], 200 * 1024)
+        self.assertAlmostEqual(sum(shares.values()), MiB)
+
+    def test_floor_never_exceeds_the_budget(self):
+        budget = self.budget(100 * 1024, *"abcd", min_rate=50 * 1024)
+        self.underuse(budget, "a", 1024, 25 * 1024)
+        shares = budget.allocate()
+        self.assertAlmostEqual(sum(shares.values()), 100 * 1024)
+        for key, share in shares.items():
+            with self.subTest(key=key):
+                self.assertAlmostEqual(share, 25 * 1024)
+
+    def test_unlimited(self):
+        budget = BandwidthBudget(BandwidthSchedule({"00:00": None}))
+        budget.add("a")
+        self.assertEqual(budget.allocate(), {"a": None})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import io
+import os
+import sys
+import tempfile
+import unittest
+from contextlib import redirect_stderr, redirect_stdout
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+import app_config
+import cli
+import download
+from engine import _set_env, install_stub
+from scheduler import Scheduler
+
+
+class CliTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        cwd = os.getcwd()
+        # config.json, the journal and the binary cache stay in the scratch dir
+        os.chdir(self.tmp.name)
+        self.addCleanup(os.chdir, cwd)
+
+        paths = app_config.DEPENDENCY_PATHS
+        self.addCleanup(setattr, app_config, "DEPENDENCY_PATHS", paths)
+        self.addCleanup(setattr, download, "DEPENDENCY_PATHS", download.DEPENDENCY_PATHS)
+        install_stub(self.tmp.name)
+        environ = dict(os.environ)
+        self.addCleanup(lambda: (os.environ.clear(), os.environ.update(environ)))
+        _set_env(LINES=10, RATE=0, LOG_EVERY=5)
+
+        # The stub is the only binary there is
+        patcher = mock.patch.object(app_config, "check_dependencies", lambda: [])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.shutdowns = []
+        shutdowns = self.shutdowns
+
+        class RecordingScheduler(Scheduler):
+            def shutdown(self, wait=True, kill=False):
+                shutdowns.append((wait, kill))
+                super().shutdown(wait, kill)
+
+        patcher = mock.patch.object(cli, "Scheduler", RecordingScheduler)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def run_cli(self, *argv):
+        out, err = io.StringIO(), io.StringIO()
+        reporter = cli.TerminalReporter
+        with redirect_stdout(out), redirect_stderr(err), \
+                mock.patch.object(cli, "TerminalReporter", lambda: reporter(out)):
+            code = cli.main(["--no-probe", "--no-archive", *argv])
+        return code, out.getvalue(), err.getvalue()
+
+    def test_no_urls_still_shuts_the_scheduler_down(self):
+        code, _, err = self.run_cli("--resume")
+        self.assertEqual(code, cli.EXIT_USAGE)
+        self.assertIn("No URLs given", err)
+        self.assertEqual(len(self.shutdowns), 1)
+
+    def test_invalid_url(self):
+        code, _, err = self.run_cli("ftp://example.com/a")
+        self.assertEqual(code, cli.EXIT_USAGE)
+        self.assertIn("Invalid URL", err)
+
+    def test_downloads(self):
+        code, out, _ = self.run_cli("-o", self.tmp.name, "https://fake.invalid/video/a", "https://fake.invalid/video/b")
+        self.assertEqual(code, cli.EXIT_OK)
+        self.assertIn("Finished: 2 succeeded, 0 failed.", out)
+        self.assertEqual(self.shutdowns, [(True, False)])
+
+
+if __name__ == "__main__":
+    unittest.main()
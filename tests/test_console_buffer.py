@@ -0,0 +1,57 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+from console_buffer import ConsoleBuffer
+from engine import FakeText
+
+
+class ConsoleBufferTest(unittest.TestCase):
+    def setUp(self):
+        self.text = FakeText()
+        self.console = ConsoleBuffer(max_lines=10)
+        # No render loop: frames are drawn by calling flush
+        self.console._widget = self.text
+
+    def test_progress_keeps_one_line_per_key(self):
+        self.console.write("[#1] 10%", 1)
+        self.console.write("[#2] 10%", 2)
+        self.console.write("[#1] 20%", 1)
+        self.console.flush()
+        self.assertEqual(self.text.lines, ["[#1] 20%", "[#2] 10%"])
+
+        self.console.write("[#1] Merging")
+        self.console.write("[#2] 50%", 2)
+        self.console.write("[#1] 30%", 1)
+        self.console.flush()
+        self.assertEqual(self.text.lines, ["[#1] 30%", "[#2] 50%", "[#1] Merging"])
+
+    def test_multiline_entries_do_not_shift_progress_lines(self):
+        self.console.write("Update successful!\n")
+        self.console.write("[#1] 10%", 1)
+        self.console.write("first\nsecond")
+        self.console.write("[#2] 10%", 2)
+        self.console.flush()
+        self.console.write("[#1] 20%", 1)
+        self.console.write("[#2] 20%", 2)
+        self.console.flush()
+        self.assertEqual(self.text.lines,
+                         ["Update successful!", "", "[#1] 20%", "first", "second", "[#2] 20%"])
+
+    def test_trimmed_progress_lines_start_over_at_the_end(self):
+        self.console.write("[#1] 10%", 1)
+        for i in range(12):
+            self.console.write(f"line {i}")
+        self.console.flush()
+        self.assertEqual(self.text.lines, [f"line {i}" for i in range(3, 12)])
+
+        self.console.write("[#1] 20%", 1)
+        self.console.flush()
+        self.assertEqual(self.text.lines[-1], "[#1] 20%")
+        self.assertEqual(self.text.lines[:-1], [f"line {i}" for i in range(3, 12)])
+
+
+if __name__ == "__main__":
+    unittest.main()
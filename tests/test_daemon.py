@@ -0,0 +1,102 @@
+import json
+import os
+import tempfile
+import unittest
+import http.client
+
+from daemon import EventHub, JobServer, MAX_BODY
+from scheduler import Scheduler
+
+TOKEN = "secret"
+
+
+class RequestValidationTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        # The binary cache and other relative paths stay in the scratch dir
+        cls.cwd = os.getcwd()
+        os.chdir(cls.tmp.name)
+        cls.scheduler = Scheduler(max_workers=1)
+        cls.server = JobServer(cls.scheduler, EventHub(), port=0, token=TOKEN).start()
+        cls.port = cls.server._httpd.server_address[1]
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.scheduler.shutdown(wait=False, kill=True)
+        os.chdir(cls.cwd)
+        cls.tmp.cleanup()
+
+    def request(self, method, path, body=None, host=None, token=TOKEN, headers=None):
+        conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=10)
+        self.addCleanup(conn.close)
+        conn.putrequest(method, path, skip_host=True, skip_accept_encoding=True)
+        conn.putheader("Host", host or f"127.0.0.1:{self.port}")
+        if token:
+            conn.putheader("Authorization", "Bearer " + token)
+        for name, value in (headers or {}).items():
+            conn.putheader(name, value)
+        if body is not None:
+            conn.putheader("Content-Length", str(len(body)))
+        conn.endheaders(body)
+        response = conn.getresponse()
+        return response.status, json.loads(response.read() or b"null")
+
+    def post_json(self, path, data, **kwargs):
+        headers = dict(kwargs.pop("headers", {}), **{"Content-Type": "application/json"})
+        return self.request("POST", path, json.dumps(data).encode(), headers=headers, **kwargs)
+
+    def test_get(self):
+        status, data = self.request("GET", "/api/jobs")
+        self.assertEqual((status, data), (200, {"jobs": []}))
+        self.assertEqual(self.request("GET", "/api/nothing")[0], 404)
+        self.assertEqual(self.request("GET", "/api/jobs/12345")[0], 404)
+
+    def test_token(self):
+        self.assertEqual(self.request("GET", "/api/jobs", token=None)[0], 401)
+        self.assertEqual(self.request("GET", "/api/jobs", token="wrong")[0], 401)
+        self.assertEqual(self.request("GET", f"/api/jobs?token={TOKEN}", token=None)[0], 200)
+
+    def test_host_and_origin(self):
+        self.assertEqual(self.request("GET", "/api/jobs", host=f"localhost:{self.port}")[0], 200)
+        self.assertEqual(self.request("GET", "/api/jobs", host="attacker.example")[0], 403)
+        self.assertEqual(self.request("GET", "/api/jobs", headers={"Origin": "http://localhost:8000"})[0], 200)
+        for origin in ("https://attacker.example", "null", "file://"):
+            with self.subTest(origin=origin):
+                self.assertEqual(self.request("GET", "/api/jobs", headers={"Origin": origin})[0], 403)
+
+    def test_content_type_is_required_even_without_a_body(self):
+        self.assertEqual(self.request("POST", "/api/pause-all")[0], 415)
+        form = {"Content-Type": "application/x-www-form-urlencoded"}
+        self.assertEqual(self.request("POST", "/api/jobs", b"urls=x", headers=form)[0], 415)
+        status, data = self.request("POST", "/api/pause-all", headers={"Content-Type": "application/json"})
+        self.assertEqual((status, data), (200, {"count": 0}))
+
+    def test_bad_bodies(self):
+        json_type = {"Content-Type": "application/json"}
+        self.assertEqual(self.request("POST", "/api/jobs", b"{", headers=json_type)[0], 400)
+        self.assertEqual(self.request("POST", "/api/jobs", b"[]", headers=json_type)[0], 400)
+        self.assertEqual(self.request("POST", "/api/jobs", headers=dict(json_type, **{"Content-Length": "-1"}))[0], 400)
+        self.assertEqual(self.request("POST", "/api/jobs", headers=dict(json_type, **{"Content-Length": "x"}))[0], 400)
+        too_long = dict(json_type, **{"Content-Length": str(MAX_BODY + 1)})
+        self.assertEqual(self.request("POST", "/api/jobs", headers=too_long)[0], 413)
+
+    def test_submission_is_validated(self):
+        save_path = self.tmp.name
+        cases = [
+            {"save_path": save_path},
+            {"urls": "https://example.com/a", "save_path": save_path},
+            {"urls": ["https://example.com/a"], "save_path": "relative"},
+            {"urls": ["https://example.com/a"], "save_path": save_path, "audio_mode": "wav?"},
+            {"urls": ["ftp://example.com/a"], "save_path": save_path},
+        ]
+        for body in cases:
+            with self.subTest(body=body):
+                self.assertEqual(self.post_json("/api/jobs", body)[0], 400)
+        self.assertEqual(self.scheduler.jobs(), [])
+        self.assertTrue(os.path.isdir(save_path))
+
+
+if __name__ == "__main__":
+    unittest.main()
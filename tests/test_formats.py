@@ -0,0 +1,67 @@
+import unittest
+
+from formats import (PROCESSING_NONE, PROCESSING_REMUX, PROCESSING_TRANSCODE, classify,
+                     estimate_size, plan_for)
+
+INFO = {
+    "formats": [
+        {"format_id": "137", "vcodec": "avc1.640028", "acodec": "none", "height": 1080, "filesize": 5000},
+        {"format_id": "248", "vcodec": "vp9", "acodec": "none", "height": 1080, "filesize": 4000},
+        {"format_id": "136", "vcodec": "avc1.4d401f", "acodec": "none", "height": 720, "filesize": 3000},
+        {"format_id": "140", "vcodec": "none", "acodec": "mp4a.40.2", "tbr": 128, "filesize": 1000},
+        {"format_id": "251", "vcodec": "none", "acodec": "opus", "tbr": 160, "filesize": 1200},
+    ],
+}
+
+
+class PlanForTest(unittest.TestCase):
+    def test_video_pairs_streams_that_remux_into_mp4(self):
+        plan = plan_for(False, info=INFO)
+        self.assertEqual(plan.selector, "137+140/bv*+ba/b")
+        self.assertEqual(plan.merge_format, "mp4/mkv")
+        self.assertEqual(plan.raw_selector, "137,140")
+        self.assertEqual(plan.processing, PROCESSING_REMUX)
+        self.assertEqual(estimate_size(plan, INFO), 6000)
+
+    def test_vp9_goes_with_opus_in_webm(self):
+        info = {"formats": [fmt for fmt in INFO["formats"] if fmt["format_id"] not in ("137", "136")]}
+        plan = plan_for(False, info=info)
+        self.assertEqual(plan.selector, "248+251/bv*+ba/b")
+        self.assertEqual(plan.merge_format, "webm/mkv")
+
+    def test_without_metadata(self):
+        plan = plan_for(False)
+        self.assertEqual(plan.args(), ["-f", "bv*+ba/b", "-S", "res,vcodec:h264,acodec:aac",
+                                       "--merge-output-format", "mp4/mkv"])
+        self.assertIsNone(estimate_size(plan, None))
+
+    def test_audio(self):
+        mp3 = plan_for(True)
+        self.assertEqual(mp3.processing, PROCESSING_TRANSCODE)
+        self.assertEqual(mp3.args(), ["-f", "ba/b", "-x", "--audio-format", "mp3"])
+        native = plan_for(True, "native", INFO)
+        self.assertEqual(native.selector, "140/ba[acodec^=mp4a]/ba/b")
+        self.assertEqual(native.processing, PROCESSING_NONE)
+
+
+class ClassifyTest(unittest.TestCase):
+    def test_from_the_postprocessors_that_ran(self):
+        video = plan_for(False, info=INFO)
+        mp3 = plan_for(True)
+        native = plan_for(True, "native", INFO)
+        for plan, postprocessors, expected in (
+            (video, ["Merger"], PROCESSING_REMUX),
+            (video, [], PROCESSING_NONE),
+            (video, ["VideoConvertor"], PROCESSING_TRANSCODE),
+            (mp3, ["ExtractAudio"], PROCESSING_TRANSCODE),
+            (mp3, [], PROCESSING_NONE),
+            # The plan expected no processing, but yt-dlp still copied the audio out
+            (native, ["ExtractAudio"], PROCESSING_REMUX),
+            (native, ["FixupM4a"], PROCESSING_REMUX),
+        ):
+            with self.subTest(plan=plan.description, postprocessors=postprocessors):
+                self.assertEqual(classify(plan, postprocessors), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
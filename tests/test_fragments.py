@@ -0,0 +1,96 @@
+import unittest
+from unittest import mock
+
+import fragments
+from fragments import MIN_SAMPLES, FragmentTuner, is_throttle_line, tuner_from_spec
+from progress import ProgressEvent
+
+
+def feed(tuner, key, speed, count=MIN_SAMPLES, eta=600):
+    for _ in range(count):
+        tuner.observe(key, ProgressEvent("download", "downloading", speed=speed, eta=eta,
+                                         fragment_index=1, fragment_count=100))
+
+
+class TunerFromSpecTest(unittest.TestCase):
+    def test_specs(self):
+        for spec in (None, True, "auto", " AUTO "):
+            with self.subTest(spec=spec):
+                self.assertIsInstance(tuner_from_spec(spec), FragmentTuner)
+        for spec in (False, "off", 0, 1, "1"):
+            with self.subTest(spec=spec):
+                self.assertIsNone(tuner_from_spec(spec))
+        fixed = tuner_from_spec("8")
+        self.assertEqual((fixed.initial, fixed.maximum), (8, 8))
+
+    def test_invalid(self):
+        for spec in ("many", -2):
+            with self.subTest(spec=spec):
+                with self.assertRaises(ValueError):
+                    tuner_from_spec(spec)
+
+
+class FragmentTunerTest(unittest.TestCase):
+    def setUp(self):
+        # Retune as soon as enough samples are in
+        patcher = mock.patch.object(fragments, "PROBE_AFTER", 0.0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.tuner = FragmentTuner(initial=2, maximum=8)
+
+    def test_throttle_lines(self):
+        self.assertTrue(is_throttle_line("ERROR: unable to download video data: HTTP Error 429: Too Many Requests"))
+        self.assertTrue(is_throttle_line("WARNING: got HTTP Error 403 for fragment 12"))
+        self.assertFalse(is_throttle_line("[download]  42.0% of 10.00MiB"))
+
+    def test_steps_up_while_it_pays_off(self):
+        self.assertEqual(self.tuner.begin("a", "cdn.example"), 2)
+        feed(self.tuner, "a", 1000)
+        self.assertTrue(self.tuner.retune("a"))
+        self.assertEqual(self.tuner.restarted("a"), 4)
+
+        # Twice the fragments didn't make it faster: stay at 4
+        feed(self.tuner, "a", 1050)
+        self.assertFalse(self.tuner.retune("a"))
+        self.assertFalse(self.tuner.retune("a"))
+
+    def test_steps_back_when_slower(self):
+        self.tuner.begin("a", "cdn.example")
+        feed(self.tuner, "a", 1000)
+        self.assertTrue(self.tuner.retune("a"))
+        self.tuner.restarted("a")
+        feed(self.tuner, "a", 500)
+        self.assertTrue(self.tuner.retune("a"))
+        self.assertEqual(self.tuner.restarted("a"), 2)
+
+    def test_short_downloads_are_left_alone(self):
+        self.tuner.begin("a", "cdn.example")
+        feed(self.tuner, "a", 1000, eta=10)
+        self.assertFalse(self.tuner.retune("a"))
+
+    def test_host_remembers_best_count(self):
+        self.tuner.begin("a", "cdn.example")
+        feed(self.tuner, "a", 1000)
+        self.tuner.retune("a")
+        self.tuner.restarted("a")
+        feed(self.tuner, "a", 2000)
+        self.tuner.end("a")
+        self.assertEqual(self.tuner.begin("b", "cdn.example"), 4)
+        self.assertEqual(self.tuner.begin("c", "other.example"), 2)
+
+    def test_throttling_halves_the_count(self):
+        tuner = FragmentTuner(initial=8, maximum=8)
+        tuner.begin("a", "cdn.example")
+        feed(tuner, "a", 1000)
+        self.assertFalse(tuner.throttled("a"))
+        self.assertFalse(tuner.throttled("a"))
+        self.assertTrue(tuner.throttled("a"))
+        self.assertEqual(tuner.restarted("a"), 4)
+        # The host isn't probed with more fragments while it is throttling
+        feed(tuner, "a", 1000)
+        self.assertFalse(tuner.retune("a"))
+        self.assertEqual(tuner.begin("b", "cdn.example"), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
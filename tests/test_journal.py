@@ -0,0 +1,63 @@
+import os
+import tempfile
+import unittest
+
+from journal import JobJournal
+
+
+class JobJournalTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, "jobs.journal")
+        self.journal = JobJournal(self.path)
+
+    def test_missing_journal(self):
+        self.assertEqual(self.journal.unfinished(), [])
+
+    def test_replay(self):
+        self.journal.record_submit("a", {"url": "https://example.com/a"})
+        self.journal.record_submit("b", {"url": "https://example.com/b"}, priority=1)
+        self.journal.record_submit("c", {"url": "https://example.com/c"})
+        self.journal.record_state("a", "running")
+        self.journal.record_state("b", "paused")
+        self.journal.record_priority("b", 2)
+        self.journal.record_state("c", "done")
+
+        records = self.journal.unfinished()
+        self.assertEqual([record["uid"] for record in records], ["a", "b"])
+        self.assertEqual(records[0]["state"], "running")
+        self.assertEqual(records[0]["download"], {"url": "https://example.com/a"})
+        self.assertEqual((records[1]["state"], records[1]["priority"]), ("paused", 2))
+
+    def test_expanded_playlists_are_replaced_by_their_entries(self):
+        self.journal.record_submit("list", {"url": "https://example.com/list"})
+        self.journal.record_submit("one", {"url": "https://example.com/1"}, parent="list")
+        self.journal.record_submit("two", {"url": "https://example.com/2"}, parent="list")
+        self.journal.record_state("one", "failed")
+        self.assertEqual([record["uid"] for record in self.journal.unfinished()], ["two"])
+
+    def test_torn_last_line_is_skipped(self):
+        self.journal.record_submit("a", {"url": "https://example.com/a"})
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write('{"event":"state","uid":"a","sta')
+        self.assertEqual([record["uid"] for record in self.journal.unfinished()], ["a"])
+
+    def test_compact_round_trips(self):
+        self.journal.record_submit("a", {"url": "https://example.com/a"}, priority=1)
+        self.journal.record_state("a", "paused")
+        self.journal.record_submit("b", {"url": "https://example.com/b"})
+        self.journal.record_state("b", "done")
+        self.journal.record_file("b", "/tmp/b.mp4")
+
+        records = self.journal.unfinished()
+        self.journal.compact(records)
+        with open(self.path, encoding="utf-8") as f:
+            self.assertEqual(len(f.readlines()), 2)
+        self.assertFalse(os.path.exists(self.path + ".tmp"))
+        self.assertEqual([(r["uid"], r["state"], r["priority"]) for r in self.journal.unfinished()],
+                         [("a", "paused", 1)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,41 @@
+import unittest
+
+from progress import CompletedFile, parse_file_line, parse_progress_line
+
+
+class ParseProgressLineTest(unittest.TestCase):
+    def test_download_line(self):
+        event = parse_progress_line("@progress|download|downloading|1024|2048|NA|512.5|3|1|4|NA\r\n")
+        self.assertEqual(event.phase, "download")
+        self.assertEqual(event.status, "downloading")
+        self.assertEqual(event.downloaded_bytes, 1024)
+        self.assertEqual(event.total_bytes, 2048)
+        self.assertEqual(event.speed, 512.5)
+        self.assertEqual(event.eta, 3)
+        self.assertEqual((event.fragment_index, event.fragment_count), (1, 4))
+        self.assertIsNone(event.postprocessor)
+
+    def test_estimated_total(self):
+        event = parse_progress_line("@progress|download|downloading|10|NA|4096.0|NA|NA|NA|NA|NA")
+        self.assertEqual(event.total_bytes, 4096)
+        self.assertIsNone(event.speed)
+        self.assertIsNone(event.eta)
+
+    def test_postprocess_line(self):
+        event = parse_progress_line("@progress|postprocess|started|NA|NA|NA|NA|NA|NA|NA|Merger")
+        self.assertEqual(event.phase, "postprocess")
+        self.assertEqual(event.postprocessor, "Merger")
+
+    def test_other_lines(self):
+        for line in ("[download] 10% of 5MiB", "", "@progress|download|downloading|1|2",
+                     "@file|Youtube|abc|/tmp/x.mp4"):
+            with self.subTest(line=line):
+                self.assertIsNone(parse_progress_line(line))
+
+    def test_file_line_keeps_separators_in_the_path(self):
+        self.assertEqual(parse_file_line("@file|Youtube|abc|/tmp/a|b.mp4\n"),
+                         CompletedFile("Youtube", "abc", "/tmp/a|b.mp4"))
+
+
+if __name__ == "__main__":
+    unittest.main()
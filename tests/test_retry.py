@@ -0,0 +1,111 @@
+import unittest
+from unittest import mock
+
+import retry
+from retry import (PERMANENT, THROTTLED, TRANSIENT, FailureClassifier, HostBreakers, RetryPolicy,
+                   classify_line, retry_from_spec)
+
+
+class ClassifyLineTest(unittest.TestCase):
+    def test_kinds(self):
+        cases = {
+            "ERROR: [youtube] abc: Video unavailable": PERMANENT,
+            "ERROR: [youtube] abc: Private video. Sign in if you've been granted access": PERMANENT,
+            "ERROR: unable to download video data: HTTP Error 404: Not Found": PERMANENT,
+            "ERROR: unable to download video data: HTTP Error 429: Too Many Requests": THROTTLED,
+            "ERROR: [youtube] abc: Sign in to confirm you're not a bot": THROTTLED,
+            "ERROR: unable to download video data: HTTP Error 503: Service Unavailable": TRANSIENT,
+            "ERROR: [Errno 104] Connection reset by peer": TRANSIENT,
+            "[download] 12.0% of 10.00MiB at 1.00MiB/s ETA 00:09": None,
+        }
+        for line, kind in cases.items():
+            with self.subTest(line=line):
+                self.assertEqual(classify_line(line), kind)
+
+    def test_permanent_only_from_errors(self):
+        # A title that happens to say "Private video" is not a failure
+        self.assertIsNone(classify_line("[download] Destination: Private video tour.mp4"))
+
+    def test_classifier_keeps_most_severe(self):
+        classifier = FailureClassifier()
+        self.assertEqual(classifier.kind, TRANSIENT)
+        classifier.observe("ERROR: HTTP Error 503")
+        classifier.observe("ERROR: HTTP Error 429: Too Many Requests")
+        classifier.observe("ERROR: HTTP Error 500")
+        self.assertEqual(classifier.kind, THROTTLED)
+        self.assertEqual(classifier.reason, "ERROR: HTTP Error 429: Too Many Requests")
+
+
+class RetryPolicyTest(unittest.TestCase):
+    def test_backoff(self):
+        policy = RetryPolicy(max_attempts=3, base_delay=2.0, max_delay=100.0)
+        for _ in range(50):
+            self.assertTrue(0.2 <= policy.backoff(1, TRANSIENT) <= 2.0)
+            self.assertTrue(0.4 <= policy.backoff(2, TRANSIENT) <= 4.0)
+            self.assertTrue(3.2 <= policy.backoff(2, THROTTLED) <= 32.0)
+        self.assertIsNone(policy.backoff(3, TRANSIENT))
+        self.assertIsNone(policy.backoff(1, PERMANENT))
+
+    def test_from_spec(self):
+        self.assertEqual(retry_from_spec(None).max_attempts, retry.DEFAULT_ATTEMPTS)
+        self.assertEqual(retry_from_spec("2").max_attempts, 3)
+        for spec in (0, False, "off", " OFF "):
+            with self.subTest(spec=spec):
+                self.assertIsNone(retry_from_spec(spec))
+        for spec in ("-1", "many"):
+            with self.subTest(spec=spec):
+                with self.assertRaises(ValueError):
+                    retry_from_spec(spec)
+
+
+class HostBreakersTest(unittest.TestCase):
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch.object(retry.time, "monotonic", lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.breakers = HostBreakers(threshold=3, window=60.0, cooldown=30.0)
+
+    def test_throttling_halves_limit_and_success_restores_it(self):
+        self.assertEqual(self.breakers.limit("a.com", 4), 4)
+        self.assertIsNone(self.breakers.failed("a.com", THROTTLED, 4))
+        self.assertEqual(self.breakers.limit("a.com", 4), 2)
+        self.breakers.succeeded("a.com", 4)
+        self.assertEqual(self.breakers.limit("a.com", 4), 3)
+        self.assertEqual(self.breakers.limit("b.com", 4), 4)
+
+    def test_permanent_failures_do_not_count(self):
+        for _ in range(5):
+            self.assertIsNone(self.breakers.failed("a.com", PERMANENT, 4))
+        self.assertEqual(self.breakers.limit("a.com", 4), 4)
+
+    def test_old_failures_leave_the_window(self):
+        self.breakers.failed("a.com", TRANSIENT, 4)
+        self.breakers.failed("a.com", TRANSIENT, 4)
+        self.now += 61
+        self.assertIsNone(self.breakers.failed("a.com", TRANSIENT, 4))
+        self.assertIsNone(self.breakers.reopens_in("a.com"))
+
+    def test_breaker_opens_probes_and_reopens_for_longer(self):
+        self.breakers.failed("a.com", TRANSIENT, 4)
+        self.breakers.failed("a.com", TRANSIENT, 4)
+        self.assertEqual(self.breakers.failed("a.com", TRANSIENT, 4), 30.0)
+        self.assertEqual(self.breakers.limit("a.com", 4), 0)
+        self.now += 10
+        self.assertEqual(self.breakers.reopens_in("a.com"), 20.0)
+
+        # After the cooldown a single test download goes through; its failure doubles the pause
+        self.now += 20
+        self.assertEqual(self.breakers.limit("a.com", 4), 1)
+        self.assertEqual(self.breakers.failed("a.com", TRANSIENT, 4), 60.0)
+        self.assertEqual(self.breakers.limit("a.com", 4), 0)
+
+        self.now += 60
+        self.assertEqual(self.breakers.limit("a.com", 4), 1)
+        self.breakers.succeeded("a.com", 4)
+        self.assertEqual(self.breakers.limit("a.com", 4), 4)
+        self.assertIsNone(self.breakers.reopens_in("a.com"))
+
+
+if __name__ == "__main__":
+    unittest.main()
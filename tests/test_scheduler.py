@@ -0,0 +1,80 @@
+"""End-to-end scheduler runs against benchmarks/fake_yt_dlp.py instead of the network."""
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+import app_config
+import download
+from engine import _set_env, install_stub
+from download import Download
+from retry import RetryPolicy
+from scheduler import JobState, Scheduler
+
+
+class SchedulerTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        cwd = os.getcwd()
+        # The binary cache and other relative paths stay in the scratch dir
+        os.chdir(self.tmp.name)
+        self.addCleanup(os.chdir, cwd)
+
+        paths = app_config.DEPENDENCY_PATHS
+        self.addCleanup(setattr, app_config, "DEPENDENCY_PATHS", paths)
+        self.addCleanup(setattr, download, "DEPENDENCY_PATHS", download.DEPENDENCY_PATHS)
+        install_stub(self.tmp.name)
+
+        environ = dict(os.environ)
+        self.addCleanup(lambda: (os.environ.clear(), os.environ.update(environ)))
+        _set_env(LINES=20, RATE=0, LOG_EVERY=5, WRITE=16)
+
+        self.save_path = os.path.join(self.tmp.name, "out")
+        os.makedirs(self.save_path)
+        self.output = []
+        self.scheduler = Scheduler(max_workers=2, retry=RetryPolicy(max_attempts=2, base_delay=0.01),
+                                   status_callback=lambda job, line, is_progress: self.output.append(line))
+        self.addCleanup(self.scheduler.shutdown, wait=False, kill=True)
+
+    def run_jobs(self, *videos):
+        jobs = [self.scheduler.submit(Download(f"https://fake.invalid/video/{video}", False, True, self.save_path))
+                for video in videos]
+        self.scheduler.wait()
+        return jobs
+
+    def test_downloads_finish(self):
+        jobs = self.run_jobs("a", "b", "c")
+        for job in jobs:
+            with self.subTest(job=job):
+                self.assertEqual(job.state, JobState.DONE)
+                self.assertEqual(len(job.files), 1)
+                self.assertTrue(os.path.isfile(job.files[0]))
+        self.assertEqual(sorted(os.listdir(self.save_path)),
+                         ["Fake video a.mp4", "Fake video b.mp4", "Fake video c.mp4"])
+
+    def test_duplicates_are_queued_once(self):
+        first = self.scheduler.submit(Download("https://fake.invalid/video/a", False, True, self.save_path))
+        second = self.scheduler.submit(Download("https://fake.invalid/video/a#again", False, True, self.save_path))
+        self.assertIs(first, second)
+        self.scheduler.wait()
+        self.assertEqual(len(self.scheduler.jobs()), 1)
+
+    def test_transient_failure_is_retried(self):
+        _set_env(FAILURES=1, ERROR="ERROR: unable to download video data: HTTP Error 503: Service Unavailable")
+        job, = self.run_jobs("flaky")
+        self.assertEqual(job.state, JobState.DONE)
+        self.assertEqual(job.retries, 1)
+
+    def test_permanent_failure_is_final(self):
+        _set_env(EXIT=1, ERROR="ERROR: [fake] gone: Video unavailable")
+        job, = self.run_jobs("gone")
+        self.assertEqual(job.state, JobState.FAILED)
+        self.assertEqual(job.retries, 0)
+        self.assertIn("[Engine] ERROR: [fake] gone: Video unavailable", self.output)
+
+
+if __name__ == "__main__":
+    unittest.main()
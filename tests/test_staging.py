@@ -0,0 +1,104 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import staging
+from formats import plan_for
+from scheduler import _space_needs
+from staging import DiskBudget, StagingArea, disk_budget_from_spec, move_file
+
+
+class DiskBudgetTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.folder = self.tmp.name
+        self.free = 1000
+        patcher = mock.patch.object(staging, "free_bytes", lambda path: self.free)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.budget = DiskBudget(min_free=100)
+
+    def test_reservations_share_the_volume(self):
+        self.assertIsNone(self.budget.reserve(1, {self.folder: 500}))
+        message = self.budget.reserve(2, {self.folder: 500})
+        self.assertIn("Not enough free space in " + self.folder, message)
+        self.assertTrue(self.budget.waiting_helps(2, {self.folder: 500}))
+        self.assertTrue(self.budget.release(1))
+        self.assertFalse(self.budget.release(1))
+        self.assertIsNone(self.budget.reserve(2, {self.folder: 500}))
+
+    def test_written_bytes_are_no_longer_promised(self):
+        self.assertIsNone(self.budget.reserve(1, {self.folder: 500}))
+        # The first download has written 300 bytes, which the free space now reflects
+        self.budget.wrote(1, 300)
+        self.free = 700
+        self.assertIsNone(self.budget.reserve(2, {self.folder: 400}))
+
+    def test_folders_on_one_volume_count_once(self):
+        sub = os.path.join(self.folder, "not yet created")
+        self.assertIsNone(self.budget.reserve(1, {self.folder: 800, sub: 600}))
+        self.assertFalse(self.budget.waiting_helps(1, {self.folder: 800}))
+
+    def test_from_spec(self):
+        self.assertEqual(disk_budget_from_spec(None).min_free, staging.DEFAULT_MIN_FREE)
+        self.assertEqual(disk_budget_from_spec("1K").min_free, 1024)
+        self.assertIsNone(disk_budget_from_spec("off"))
+        with self.assertRaises(ValueError):
+            disk_budget_from_spec("lots")
+
+
+class SpaceNeedsTest(unittest.TestCase):
+    INFO = {"formats": [
+        {"format_id": "137", "vcodec": "avc1", "acodec": "none", "height": 1080, "filesize": 700},
+        {"format_id": "140", "vcodec": "none", "acodec": "mp4a", "filesize": 300},
+    ]}
+
+    def test_staged(self):
+        plan = plan_for(False, info=self.INFO)
+        self.assertEqual(_space_needs(plan, self.INFO, "/staging/job", "/videos"),
+                         {"/staging/job": 2000, "/videos": 1000})
+
+    def test_without_staging_the_save_location_needs_room_to_merge(self):
+        plan = plan_for(False, info=self.INFO)
+        self.assertEqual(_space_needs(plan, self.INFO, None, "/videos"), {"/videos": 2000})
+
+    def test_unknown_size(self):
+        self.assertEqual(_space_needs(plan_for(False), None, None, "/videos"), {"/videos": 0})
+
+
+class StagingAreaTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.area = StagingArea(os.path.join(self.tmp.name, "staging"))
+
+    def test_prune_keeps_recent_and_kept_folders(self):
+        old = time.time() - staging.STALE_AFTER - 60
+        for uid in ("kept", "stale", "recent"):
+            self.area.job_dir(uid)
+        for uid in ("kept", "stale"):
+            os.utime(os.path.join(self.area.root, uid), (old, old))
+        self.assertEqual(self.area.prune({"kept"}), 1)
+        self.assertEqual(sorted(os.listdir(self.area.root)), ["kept", "recent"])
+
+    def test_move_file(self):
+        work = self.area.job_dir("job")
+        source = os.path.join(work, "a.mp4")
+        with open(source, "w") as f:
+            f.write("video")
+        self.assertTrue(self.area.contains(source))
+        self.assertFalse(self.area.contains(os.path.join(self.tmp.name, "a.mp4")))
+        moved = move_file(source, os.path.join(self.tmp.name, "out"))
+        self.assertEqual(moved, os.path.join(self.tmp.name, "out", "a.mp4"))
+        self.assertFalse(os.path.exists(source))
+        with open(moved) as f:
+            self.assertEqual(f.read(), "video")
+        self.area.remove("job")
+        self.assertFalse(os.path.exists(work))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,24 @@
+import importlib.util
+import os
+import subprocess
+import sys
+import unittest
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Loaded on background threads after the first paint, never by importing ui
+_DEFERRED = ("asyncio", "scheduler", "download", "supervisor", "app_config", "api_client")
+
+
+@unittest.skipIf(importlib.util.find_spec("tkinter") is None or importlib.util.find_spec("ttkthemes") is None,
+                 "needs tkinter and ttkthemes")
+class StartupImportsTest(unittest.TestCase):
+    def test_ui_defers_the_engine(self):
+        script = f"import sys, ui; print(' '.join(n for n in {_DEFERRED!r} if n in sys.modules))"
+        result = subprocess.run([sys.executable, "-c", script], cwd=REPO, capture_output=True, text=True, timeout=60)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.strip(), "")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+
+from urls import UnsupportedURL, canonicalize
+
+
+class CanonicalizeTest(unittest.TestCase):
+    def test_youtube_spellings_share_one_url(self):
+        expected = "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+        for url in ("https://youtu.be/dQw4w9WgXcQ?si=abc",
+                    "https://m.youtube.com/watch?v=dQw4w9WgXcQ&feature=share",
+                    "www.youtube.com/shorts/dQw4w9WgXcQ",
+                    "https://www.youtube.com/embed/dQw4w9WgXcQ"):
+            with self.subTest(url=url):
+                canonical = canonicalize(url)
+                self.assertEqual(canonical.url, expected)
+                self.assertEqual(canonical.video_id, "dQw4w9WgXcQ")
+                self.assertEqual(canonical.extractor, "Youtube")
+
+    def test_video_in_playlist(self):
+        canonical = canonicalize("https://www.youtube.com/watch?v=dQw4w9WgXcQ&list=PL123&utm_source=x")
+        self.assertEqual(canonical.url, "https://www.youtube.com/watch?v=dQw4w9WgXcQ&list=PL123")
+        self.assertEqual(canonical.key(), "youtube.com playlist PL123")
+        self.assertEqual(canonical.key(playlist=False), "youtube dQw4w9WgXcQ")
+
+    def test_playlist(self):
+        canonical = canonicalize("https://www.youtube.com/playlist?list=PL123&feature=share")
+        self.assertEqual(canonical.url, "https://www.youtube.com/playlist?list=PL123")
+        self.assertIsNone(canonical.video_id)
+        self.assertEqual(canonical.key(playlist=False), "youtube.com playlist PL123")
+
+    def test_known_sites_are_rewritten(self):
+        self.assertEqual(canonicalize("https://twitter.com/user/status/123?s=20").url,
+                         "https://x.com/user/status/123")
+        self.assertEqual(canonicalize("https://vimeo.com/channels/staff/12345").url, "https://vimeo.com/12345")
+
+    def test_vimeo_keeps_the_unlisted_hash(self):
+        for url, expected in (
+            ("https://vimeo.com/12345/abcdef0123?share=copy", "https://vimeo.com/12345/abcdef0123"),
+            ("https://player.vimeo.com/video/12345?h=abcdef0123&badge=0",
+             "https://player.vimeo.com/video/12345?h=abcdef0123"),
+            ("https://vimeo.com/12345?h=abcdef0123", "https://vimeo.com/12345/abcdef0123"),
+            ("https://player.vimeo.com/video/12345", "https://vimeo.com/12345"),
+        ):
+            with self.subTest(url=url):
+                canonical = canonicalize(url)
+                self.assertEqual(canonical.url, expected)
+                # The hash only unlocks the video; it is the same media either way
+                self.assertEqual(canonical.key(), "vimeo 12345")
+
+    def test_other_sites_only_lose_tracking_and_fragment(self):
+        canonical = canonicalize("https://example.com/a?utm_medium=x&b=1&fbclid=y#frag")
+        self.assertEqual(canonical.url, "https://example.com/a?b=1")
+        self.assertEqual(canonical.host, "example.com")
+        self.assertEqual(canonical.key(), canonical.url)
+
+    def test_rejected(self):
+        for url in ("", "ftp://example.com/a", "https://you tube.com", "https://bad_host/x",
+                    "https://www.netflix.com/watch/1", "https://youtube.com/watch?v=short",
+                    "https://example.com:99999/"):
+            with self.subTest(url=url):
+                with self.assertRaises(UnsupportedURL):
+                    canonicalize(url)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,21 +2,33 @@
     Also, the main entry point for the program."""
 
 import sys
+
+if __name__ == "__main__" and len(sys.argv) > 1:
+    # Arguments mean headless use: hand off before Tk and the GUI modules are loaded
+    import cli
+    sys.exit(cli.main())
+
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog, font
 from ttkthemes import ThemedTk
 import threading
-import webbrowser
-import subprocess
-import os
-import sys
-import download as download_module
-import update_ytdlp
+from typing import TYPE_CHECKING, Optional
+import console_buffer
+import formats
 import configManager as cfm
-import app_config
 
 from version import __version__
-import self_updater
+
+# Only needed once the user clicks something; imported on demand:
+# webbrowser (open_github), update_ytdlp (updDlp), self_updater (check_for_updates)
+# The download engine (scheduler and everything it pulls in, asyncio included),
+# the daemon client and the binary checks are imported on the background threads
+# that start after the first paint (see connect_scheduler_thread and
+# run_startup_checks_thread); elsewhere they are imported where they are used.
+if TYPE_CHECKING:
+    import concurrent.futures
+    import progress
+    import scheduler as scheduler_module
 
 
 
@@ -44,7 +56,7 @@ class Window:
 
         self._pending_logs = []
         def _cfm_logger(text):
-            if hasattr(self, 'console_output'):
+            if hasattr(self, 'console'):
                 self.append_to_console(text)
             else:
                 self._pending_logs.append(text)
@@ -103,13 +115,12 @@ class Window:
         self.urlEntry.bind("<FocusOut>", on_focus_out)
         self.urlEntry.bind("<<Paste>>", on_after_paste)
         self.urlEntry.bind("<Return>", lambda e: self.download())
+        self.urlEntry.bind("<Shift-Return>", lambda e: self.download_next())
 
 
-        dat = ""
+        dat = cfm.getKeyValue("path")
 
-        if cfm.getKeyValue("path") != None:
-            dat = cfm.getKeyValue("path")
-        else:
+        if dat is None:
             cfm.setDefaultParams()
             dat = ""
 
@@ -123,8 +134,11 @@ class Window:
         self.updLocEntry(dat) # type: ignore
 
 
+        # "native" keeps the original audio codec instead of converting to mp3
+        self.audioMode = formats.AUDIO_NATIVE if cfm.getKeyValue("audio_format") == formats.AUDIO_NATIVE else formats.AUDIO_MP3
         self.audOnly = tk.BooleanVar(value=False)
-        self.audOnlyBtn = ttk.Checkbutton(container, text="Save as mp3", variable=self.audOnly)
+        audio_label = "Audio only (original format)" if self.audioMode == formats.AUDIO_NATIVE else "Save as mp3"
+        self.audOnlyBtn = ttk.Checkbutton(container, text=audio_label, variable=self.audOnly)
         self.audOnlyBtn.grid(row=2, column=0, sticky="w", pady=(8, 0))
 
 
@@ -141,6 +155,10 @@ class Window:
         self.dwnBtn.pack(side="right")
 
 
+        self.cancelBtn = ttk.Button(btn_frame, text="Cancel All", command=self.cancel_all, state="disabled")
+        self.cancelBtn.pack(side="right", padx=(0, 8))
+
+
         self.updEngineBtn = ttk.Button(btn_frame, text="Update Engine", command=self.updDlp)
         self.updEngineBtn.pack(side="right", padx=(0, 8))
 
@@ -165,6 +183,11 @@ class Window:
         self.console_output.grid(row=0, column=0, sticky="nsew")
         self.console_scrollbar.grid(row=0, column=1, sticky="ns")
 
+        self.console = console_buffer.ConsoleBuffer(
+            max_lines=cfm.getKeyValue("console_max_lines") or console_buffer.DEFAULT_MAX_LINES
+        )
+        self.console.attach(self.root, self.console_output)
+
         self.append_to_console(f"yt-dlp Simplified {self.version}\nNot intended for any unethical purpose.\nAuthor: Ayman Ibne Zakir (github.com/aymanibnezakir)\n")
         self.append_to_console("Note: If a download fails, try updating the engine.\n")
         
@@ -174,7 +197,159 @@ class Window:
         
         self.create_menu()
 
-        self.run_startup_checks()
+        self._updating = False
+        # Set once the daemon has answered or been found missing (see connect_scheduler).
+        # One event loop supervises every download and update process;
+        # the bridge carries their results back to the Tk thread
+        self.supervisor = None
+        self.bridge = None
+        self.scheduler = None
+        self._remote = False
+        self._checks_passed = False
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
+
+        # Let the window paint first; the checks and the daemon lookup run in the background
+        self.root.after_idle(self.connect_scheduler)
+        self.root.after_idle(self.run_startup_checks)
+
+    def connect_scheduler(self):
+        """Looks for the download daemon on a worker thread; with one running,
+        this window is just one of its clients."""
+        threading.Thread(
+            target=self.connect_scheduler_thread,
+            daemon=True
+        ).start()
+
+    def connect_scheduler_thread(self):
+        """Worker thread for the daemon lookup (it may wait on the network).
+        Also builds the local queue if there is no daemon, so the engine is
+        imported here rather than before the first paint."""
+        import supervisor
+        process_supervisor = supervisor.ProcessSupervisor()
+        try:
+            remote = self._remote_scheduler()
+        except Exception as e:
+            self.append_to_console(f"Warning: Could not use the download daemon: {e}")
+            remote = None
+        scheduler = remote or self._local_scheduler(process_supervisor)
+        self.root.after(0, lambda: self.finish_connect(process_supervisor, scheduler, remote is not None))
+
+    def finish_connect(self, process_supervisor, scheduler, remote: bool):
+        """Takes the daemon's queue, or the local one (on the main thread)."""
+        import supervisor
+        self.supervisor = process_supervisor
+        self.bridge = supervisor.TkBridge(self.root)
+        self.scheduler = scheduler
+        self._remote = remote
+        self.update_job_status()
+        if self._checks_passed:
+            self.resume_jobs()
+
+    def _local_scheduler(self, process_supervisor):
+        """Builds the scheduler that downloads in this window."""
+        import scheduler as scheduler_module
+        import metadata
+        import archive
+        import journal
+        import retry
+        import staging
+        return scheduler_module.Scheduler(
+            max_workers=cfm.getKeyValue("max_workers"),
+            status_callback=self.on_job_output,
+            state_callback=self.on_job_state,
+            progress_callback=self.on_job_progress,
+            prober=metadata.Prober() if cfm.getKeyValue("probe_metadata") is not False else None,
+            max_per_host=cfm.getKeyValue("max_per_host"),
+            archive=archive.DownloadArchive() if cfm.getKeyValue("use_archive") is not False else None,
+            journal=journal.JobJournal(),
+            metrics=self._metrics_exporter(),
+            supervisor=process_supervisor,
+            job_timeout=cfm.getKeyValue("job_timeout"),
+            idle_timeout=cfm.getKeyValue("idle_timeout"),
+            bandwidth=self._bandwidth_budget(),
+            fragments=self._fragment_tuner(),
+            downloader=cfm.getKeyValue("external_downloader"),
+            postprocess=self._postprocess_pool(),
+            staging=staging.staging_from_spec(cfm.getKeyValue("staging_dir")),
+            disk=self._disk_budget(),
+            retry=self._retry_policy(),
+            breakers=retry.HostBreakers() if cfm.getKeyValue("host_breakers") is not False else None
+        )
+
+    def _remote_scheduler(self):
+        """Connects to the download daemon (config daemon_url, else the default
+        address; "off" never connects), if one is running. Blocks; runs on a
+        worker thread."""
+        url = cfm.getKeyValue("daemon_url")
+        if url is False or str(url).strip().lower() == "off":
+            return None
+        import api_client
+        import app_config
+        client = api_client.connect(url or app_config.DAEMON_URL, cfm.getKeyValue("daemon_token"))
+        if client is None:
+            if url:
+                self.append_to_console(f"Warning: No download daemon at {url}; downloading in this window.")
+            return None
+        return api_client.RemoteScheduler(
+            client,
+            status_callback=self.on_job_output,
+            state_callback=self.on_job_state,
+            progress_callback=self.on_job_progress
+        )
+
+    def _metrics_exporter(self):
+        """Builds the metrics exporter if a metrics file is configured."""
+        jsonl_path = cfm.getKeyValue("metrics_jsonl")
+        prom_path = cfm.getKeyValue("metrics_prom")
+        if not jsonl_path and not prom_path:
+            return None
+        import metrics
+        return metrics.MetricsExporter(jsonl_path, prom_path)
+
+    def _bandwidth_budget(self):
+        """Builds the shared bandwidth budget if a limit is configured."""
+        import bandwidth
+        try:
+            return bandwidth.budget_from_spec(cfm.getKeyValue("bandwidth_limit"))
+        except ValueError as e:
+            self.append_to_console(f"Warning: Ignoring bandwidth_limit: {e}")
+            return None
+
+    def _fragment_tuner(self):
+        """Builds the fragment tuner from the concurrent_fragments setting (auto by default)."""
+        import fragments
+        try:
+            return fragments.tuner_from_spec(cfm.getKeyValue("concurrent_fragments"))
+        except ValueError as e:
+            self.append_to_console(f"Warning: Ignoring concurrent_fragments: {e}")
+            return fragments.FragmentTuner()
+
+    def _postprocess_pool(self):
+        """Builds the post-processing pool from the postprocess_workers setting (core count by default)."""
+        import postprocess
+        try:
+            return postprocess.pool_from_spec(cfm.getKeyValue("postprocess_workers"))
+        except ValueError as e:
+            self.append_to_console(f"Warning: Ignoring postprocess_workers: {e}")
+            return postprocess.PostProcessPool()
+
+    def _disk_budget(self):
+        """Builds the free-space check from the min_free_space setting (256M by default)."""
+        import staging
+        try:
+            return staging.disk_budget_from_spec(cfm.getKeyValue("min_free_space"))
+        except ValueError as e:
+            self.append_to_console(f"Warning: Ignoring min_free_space: {e}")
+            return staging.DiskBudget()
+
+    def _retry_policy(self):
+        """Builds the retry policy from the retries setting (3 retries by default)."""
+        import retry
+        try:
+            return retry.retry_from_spec(cfm.getKeyValue("retries"))
+        except ValueError as e:
+            self.append_to_console(f"Warning: Ignoring retries: {e}")
+            return retry.RetryPolicy()
 
     def create_menu(self):
         self.menubar = tk.Menu(self.root)
@@ -184,12 +359,23 @@ class Window:
         self.file_menu = tk.Menu(self.menubar, tearoff=0)
         self.file_menu.add_command(label="Settings", command=self.open_settings)
         self.file_menu.add_separator()
-        self.file_menu.add_command(label="Exit", command=self.root.destroy)
+        self.file_menu.add_command(label="Exit", command=self.close)
         self.menubar.add_cascade(label="File", menu=self.file_menu)
 
+        # Queue Menu
+        self.queue_menu = tk.Menu(self.menubar, tearoff=0)
+        self.queue_menu.add_command(label="Download Next (High Priority)", accelerator="Shift+Enter",
+                                    command=self.download_next)
+        self.queue_menu.add_separator()
+        self.queue_menu.add_command(label="Pause All", command=self.pause_all)
+        self.queue_menu.add_command(label="Resume All", command=self.resume_all)
+        self.queue_menu.add_command(label="Cancel All", command=self.cancel_all)
+        self.menubar.add_cascade(label="Queue", menu=self.queue_menu)
+
         # Help Menu
         self.help_menu = tk.Menu(self.menubar, tearoff=0)
         self.help_menu.add_command(label="Check for updates", command=self.check_for_updates)
+        self.help_menu.add_command(label="Roll Back Engine", command=self.rollback_engine)
         self.help_menu.add_separator()
         self.help_menu.add_command(label="About", command=self.show_about)
         self.help_menu.add_separator()
@@ -206,6 +392,7 @@ class Window:
         messagebox.showinfo("About", f"yt-dlp Simplified {self.version}\nAuthor: Ayman Ibne Zakir\n\nA simple UI for yt-dlp.")
 
     def open_github(self):
+        import webbrowser
         webbrowser.open("https://github.com/aymanibnezakir/yt-dlp-Simplified")
 
     def check_for_updates(self):
@@ -219,6 +406,7 @@ class Window:
     def run_update_check_thread(self):
         """Worker thread for checking updates."""
         try:
+            import self_updater
             upd = self_updater.Updater()
             result = upd.check_for_update()
             if result:
@@ -257,36 +445,13 @@ class Window:
             messagebox.showwarning("Warning", "Could not save location.")
 
     
-    def append_to_console(self, text: str):
+    def append_to_console(self, text: str, progress_key=None):
         """
         Appends a line of text to the console output area.
-        This method is thread-safe as it schedules the update on the main GUI thread.
+        This method is thread-safe: the line is buffered and drawn by the console's render loop.
+        Lines sharing a `progress_key` replace each other in place (e.g. download progress).
         """
-        def _append():
-            self.console_output.config(state="normal")
-            self.console_output.insert(tk.END, text + "\n")
-            self.console_output.config(state="disabled")
-            self.console_output.see(tk.END) # Auto-scroll
-        
-        self.last_line_was_progress = False
-        self.root.after(0, _append)
-
-    def replace_last_console_line(self, text: str):
-        """
-        Replaces the previous line of text in the console with new text.
-        This provides in-place updates for repetitive output like download progress.
-        """
-        def _replace():
-            self.console_output.config(state="normal")
-            # Delete the contents of the last inserted line (which is at end-2l because of tk's trailing newline)
-            if int(self.console_output.index('end-1c').split('.')[0]) > 1:
-                self.console_output.delete("end-2l", "end-2l lineend")
-            # Insert the new text at the same line
-            self.console_output.insert("end-2l", text)
-            self.console_output.config(state="disabled")
-            self.console_output.see(tk.END)
-            
-        self.root.after(0, _replace)
+        self.console.write(text, progress_key)
 
     def disable_buttons(self):
         """Disables buttons during an operation."""
@@ -302,13 +467,39 @@ class Window:
     
     
     def run_startup_checks(self):
-        """Runs dependency checks and initial update check."""
+        """Starts the dependency checks on a worker thread."""
         self.append_to_console("Executing file check...")
-        
-        problems = app_config.check_dependencies()
-        
+
+        threading.Thread(
+            target=self.run_startup_checks_thread,
+            daemon=True
+        ).start()
+
+    def run_startup_checks_thread(self):
+        """Worker thread for the dependency checks (they may spawn chmod)."""
+        import app_config
+        versions = {}
+        try:
+            problems = app_config.check_dependencies()
+            if not problems:
+                # Cached after the first start, so this only runs a new binary
+                versions = {name: app_config.binary_version(path)
+                            for name, path in app_config.DEPENDENCY_PATHS._asdict().items()}
+        except Exception as e:
+            problems = [f"Dependency check failed: {e}"]
+        self.root.after(0, lambda: self.finish_startup_checks(problems, versions))
+
+    def finish_startup_checks(self, problems: list[str], versions: Optional[dict] = None):
+        """Reports the dependency check results on the main thread."""
         if not problems:
+            if versions:
+                self.append_to_console(", ".join(
+                    f"{name.replace('_', '-')} {version or 'unknown version'}" for name, version in versions.items()
+                ))
             self.append_to_console("Dependencies found & standby...\n")
+            self._checks_passed = True
+            if self.scheduler is not None:
+                self.resume_jobs()
             
         else:
             for item in problems:
@@ -318,38 +509,67 @@ class Window:
             self.append_to_console("All operations disabled until dependencies are fixed.")
 
 
+    def resume_jobs(self):
+        """Requeues downloads that were still unfinished when the app last closed."""
+        import scheduler as scheduler_module
+        if self._remote:
+            self.append_to_console(f"Connected to the download daemon at {self.scheduler.url} "
+                                   f"({len(self.scheduler.jobs())} job(s) in its queue).")
+        jobs = self.scheduler.recover()
+        if jobs:
+            self.append_to_console(f"Resuming {len(jobs)} unfinished download(s) from the last session...")
+            for job in jobs:
+                verb = "Paused" if job.state == scheduler_module.JobState.PAUSED else "Queued"
+                self.append_to_console(f"[#{job.id}] {verb} download for: {job.download.link}")
+
+
     def updDlp(self):
-        update_handler = update_ytdlp.Update()       
-        self.disable_buttons()
+        """Updates the engine into a new slot. Downloads keep running: the
+        running ones finish with the old engine, new ones get the new one."""
+        if self.scheduler is None:
+            messagebox.showinfo("Starting", "The download queue is still starting, try again in a moment.")
+            return
+        import update_ytdlp
+        update_handler = update_ytdlp.Update()
+        self._updating = True
+        self.updEngineBtn.config(state="disabled")
         self.append_to_console("Initializing engine update...")
-        
-        threading.Thread(
-            target=self.run_update_thread, 
-            args=(update_handler,), 
-            daemon=True
-        ).start()
+
+        future = update_handler.start(self.supervisor, self.append_to_console,
+                                      in_use=lambda: self.scheduler.engines_in_use() if self.scheduler else ())
+        future.add_done_callback(lambda f: self.bridge.post(self.finish_update, f))
 
     
-    def run_update_thread(self, update_handler: update_ytdlp.Update):
-        """Worker thread for running the update process."""
-        try:
-            update_handler.update(self.append_to_console)
-        except Exception as e:
-            self.append_to_console(f"Update failed: {e}")
-        finally:
-            self.root.after(0, self.enable_buttons)
+    def finish_update(self, future: "concurrent.futures.Future"):
+        """Re-enables the UI once the engine update has finished (on the main thread)."""
+        if not future.cancelled() and future.exception() is not None:
+            self.append_to_console(f"Update failed: {future.exception()}")
+        self._updating = False
+        self.updEngineBtn.config(state="normal")
+        self.update_job_status()
+
+    def rollback_engine(self):
+        """Switches back to the engine that was active before the last update."""
+        import update_ytdlp
+        update_ytdlp.Update().rollback(self.append_to_console)
 
     
-    def download(self):
-        url = self.urlEntry.get().strip()
-        if url == "Enter or paste URL":
-            url = ""
+    def download_next(self):
+        """Queues the URLs ahead of everything else (see `download`)."""
+        import scheduler as scheduler_module
+        self.download(scheduler_module.Priority.HIGH)
+
+    def download(self, priority: Optional[int] = None):
+        raw = self.urlEntry.get().strip()
+        if raw == "Enter or paste an URL":
+            raw = ""
+        urls = raw.split()
         save_path = self.locationEntry.get().strip() 
         aud_only = self.audOnly.get()
         ignore_playlist = self.ignorePlaylist.get()
 
         # --- Validation ---
-        if not url:
+        if not urls:
             messagebox.showerror("Error", "Please enter a valid URL.")
             return
 
@@ -357,59 +577,135 @@ class Window:
             messagebox.showerror("Error", "Please choose a save location (directory).")
             return
         
+        import download as download_module
+        downloads = [download_module.Download(url, aud_only, ignore_playlist, save_path, self.audioMode)
+                     for url in urls]
+        invalid = [f"{d.link} ({d.link_error})" for d in downloads if not d.verifyLink()]
+        if invalid:
+            messagebox.showerror("Error", "Invalid URL provided:\n" + "\n".join(invalid))
+            return
+
         # Playlist warning
-        if not ignore_playlist and "list=" in url:
+        if not ignore_playlist and any(d.canonical.video_id and d.canonical.playlist_id for d in downloads):
             result = messagebox.askyesno("Playlist Warning", "The URL refers to a video and a playlist. Do you want to download the video only?")
             if result:
-                ignore_playlist = True
-             
+                for d in downloads:
+                    d.ignore_playlist = True
+        
+        if self.scheduler is None:
+            messagebox.showinfo("Starting", "The download queue is still starting, try again in a moment.")
+            return
 
-        # Use a temporary handler just for validation
-        validator = download_module.Download(url, aud_only, ignore_playlist, save_path)
-        if not validator.verifyLink():
-            messagebox.showerror("Error", "Invalid URL provided.")
+        # --- Queue the downloads ---
+        import scheduler as scheduler_module
+        if priority is None:
+            priority = scheduler_module.Priority.NORMAL
+        known = {job.id for job in self.scheduler.jobs()}
+        try:
+            jobs = self.scheduler.submit_many(downloads, priority)
+        except self._remote_errors() as e:
+            messagebox.showerror("Error", f"The download daemon refused the download:\n{e}")
             return
-        
-        # --- Start Download Thread ---
-        self.disable_buttons()
-        self.append_to_console(f"Starting download for: {url}")
-        
-        # Create the real handler for the thread
-        download_handler = download_module.Download(url, aud_only, ignore_playlist, save_path)
-        
-        threading.Thread(
-            target=self.run_download_thread, 
-            args=(download_handler,), 
-            daemon=True
-        ).start()
+        for job in jobs:
+            if job.id in known:
+                self.append_to_console(f"[#{job.id}] Already in the queue: {job.download.link}")
+            else:
+                known.add(job.id)
+                self.append_to_console(f"[#{job.id}] Queued download for: {job.download.link}")
 
     
-    def run_download_thread(self, download_handler: download_module.Download):
-        """Worker thread for running the download process."""
+    def on_job_output(self, job: "scheduler_module.Job", line: str, is_progress: bool = False):
+        """Receives output from a running job (called from a worker thread)."""
+        line = f"[#{job.id}] {line}" if line else line
+        self.append_to_console(line, progress_key=job.id if is_progress else None)
+
+    def on_job_progress(self, job: "scheduler_module.Job", event: "progress.ProgressEvent"):
+        """Shows a job's progress on a single, in-place console line (called from a worker thread)."""
+        self.append_to_console(f"[#{job.id}] [Engine] {event.format()}", progress_key=job.id)
+
+    def on_job_state(self, job: "scheduler_module.Job"):
+        """Reports job state changes (called from any thread)."""
+        import scheduler as scheduler_module
+        if job.state == scheduler_module.JobState.FAILED and job.error and not job.children:
+            self.append_to_console(f"[#{job.id}] Download failed: {job.error}")
+        if self.bridge is not None:
+            # Before the bridge exists, finish_connect updates the status itself
+            self.bridge.post(self.update_job_status)
+
+    def cancel_all(self):
+        """Cancels every queued and running download."""
+        cancelled = self._queue_action("cancel_all")
+        if cancelled:
+            self.append_to_console(f"Cancelling {cancelled} download(s)...")
+
+    def pause_all(self):
+        """Pauses every queued and running download."""
+        paused = self._queue_action("pause_all")
+        if paused:
+            self.append_to_console(f"Pausing {paused} download(s)...")
+
+    def resume_all(self):
+        """Queues every paused download again."""
+        resumed = self._queue_action("resume_all")
+        if resumed:
+            self.append_to_console(f"Resuming {resumed} download(s)...")
+
+    def _queue_action(self, action: str) -> int:
+        """Runs a queue-wide scheduler method, reporting a daemon that can't be reached."""
+        if self.scheduler is None:
+            return 0
         try:
-            # Pass the console append method as a callback
-            def console_manager(line: str, is_progress: bool = False):
-                if is_progress:
-                    if self.last_line_was_progress:
-                        self.replace_last_console_line(line)
-                    else:
-                        self.append_to_console(line)
-                        self.last_line_was_progress = True
-                else:
-                    self.append_to_console(line)
-
-            download_handler.run_download(console_manager)
-        except Exception as e:
-            self.append_to_console(f"Download failed: {e}")
-        finally:
-            # Re-enable buttons back on the main thread
-            self.root.after(0, self.enable_buttons)
+            return getattr(self.scheduler, action)()
+        except self._remote_errors() as e:
+            self.append_to_console(f"Error: {e}")
+            return 0
+
+    def _remote_errors(self) -> tuple:
+        """The exceptions a queue operation can raise: a daemon may refuse it
+        or be gone, a local queue raises nothing to report."""
+        if not self._remote:
+            return ()
+        import api_client
+        return (api_client.ApiError,)
+
+    def update_job_status(self):
+        """Shows the queue summary in the title bar."""
+        if self.scheduler is None:
+            return
+        import scheduler as scheduler_module
+        counts = self.scheduler.counts()
+        processing = counts[scheduler_module.JobState.PROCESSING]
+        active = counts[scheduler_module.JobState.QUEUED] + counts[scheduler_module.JobState.RUNNING] + processing
+        title = f"yt-dlp Simplified {self.version}"
+        paused = counts[scheduler_module.JobState.PAUSED]
+        if active:
+            title += (f" - {counts[scheduler_module.JobState.RUNNING]} running,"
+                      f" {counts[scheduler_module.JobState.QUEUED]} queued")
+            if processing:
+                title += f", {processing} processing"
+        if paused:
+            title += f"{',' if active else ' -'} {paused} paused"
+        self.root.title(title)
+
+        self.cancelBtn.config(state="normal" if active or paused else "disabled")
+
+    def close(self):
+        """Kills running downloads and closes the window.
+
+        The interrupted downloads stay in the journal and resume on the next
+        start. Downloads queued on a daemon keep running there.
+        """
+        if self.scheduler is not None:
+            self.scheduler.shutdown(wait=False, kill=True)
+        if self.supervisor is not None:
+            self.supervisor.stop()
+        self.root.destroy()
 
     def run(self):
         self.root.mainloop()
 
 
 if __name__ == "__main__":
-    if len(sys.argv) == 1:
-        window = Window()
-        window.run()
+    window = Window()
+    window.run()
+
@@ -1,50 +1,177 @@
-"""This module contains the Update class, which is responsible for updating the yt-dlp executable."""
+"""This module contains the Update class, which is responsible for updating the yt-dlp executable.
 
-import sys
-import subprocess
-from typing import Callable
-from app_config import DEPENDENCY_PATHS
+Updates never replace a binary that downloads may be running. The active
+engine is copied into a staging folder under bins/engines and updated
+there with `yt-dlp -U`. The copy is smoke-tested, moved into a versioned
+slot and activated by an atomic pointer switch (see app_config.EngineSlots).
+Running jobs finish with the engine they started with, new jobs get the
+new one, and a bad release is undone with `rollback`. Old slots are
+pruned only after the switch, and never while a queued or running job is
+still pinned to them.
+"""
+
+import os
+import shutil
+import asyncio
+import tempfile
+import concurrent.futures
+from typing import Callable, Iterable, Optional
+from app_config import ENGINES, binary_version, engine_path
+from supervisor import ProcessSupervisor, ProcessTimeout
+
+# Seconds the self-update may take before it is killed
+UPDATE_TIMEOUT = 300
+# Seconds each smoke test may take
+SMOKE_TIMEOUT = 60
 
 
 class Update:
     """A class to represent an update operation.
 
     Attributes:
-        name (str): The path to the yt-dlp executable.
+        name (str): The path to the yt-dlp executable the update starts from
+            (the active engine).
     """
     def __init__(self) -> None:
-        self.name = DEPENDENCY_PATHS.yt_dlp
+        self.name = engine_path()
+
+
+    def update(self, status_callback: Callable[[str], None],
+               in_use: Optional[Callable[[], Iterable[str]]] = None) -> bool:
+        """
+        Runs the engine update and sends real-time output to the provided
+        callback function. Blocks the calling thread; see `start` for the
+        non-blocking variant.
 
-  
-    def update(self, status_callback: Callable[[str], None]):
+        Args:
+            status_callback (Callable[[str], None]): Receives the update's output.
+            in_use (Callable | None): Returns the engine binaries unfinished
+                jobs are pinned to; their slots are kept when old ones are pruned.
         """
-        Runs the yt-dlp update command and sends real-time output
-        to the provided callback function.
+        return asyncio.run(self.update_async(ProcessSupervisor(), status_callback, in_use))
+
+
+    def start(self, supervisor: ProcessSupervisor,
+              status_callback: Callable[[str], None],
+              in_use: Optional[Callable[[], Iterable[str]]] = None) -> concurrent.futures.Future:
         """
-        creation_flags = subprocess.CREATE_NO_WINDOW if sys.platform == "win32" else 0
+        Starts the update on the supervisor's event loop without blocking.
+
+        Returns:
+            concurrent.futures.Future: Resolves to True if the update succeeded
+            (or the engine was already up to date).
+        """
+        return supervisor.submit(self.update_async(supervisor, status_callback, in_use))
+
+    async def update_async(self, supervisor: ProcessSupervisor,
+                           status_callback: Callable[[str], None],
+                           in_use: Optional[Callable[[], Iterable[str]]] = None) -> bool:
+        """The supervised variant of `update`, run on the supervisor's loop."""
+        current = await asyncio.to_thread(binary_version, self.name)
 
         try:
-            with subprocess.Popen(
-                [self.name, "-U"],
-                stdin=subprocess.DEVNULL,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
-                encoding='utf-8',
-                errors='replace',
-                creationflags=creation_flags
-            ) as proc:
-                if proc.stdout is not None:
-                    for line in proc.stdout:
-                        status_callback(f"[Engine] {line.strip()}")
-                
-                proc.wait()
-                if proc.returncode != 0:
-                    status_callback(f"[Engine] Process exited with error code: {proc.returncode}")
-                else:
-                    status_callback(f"Update successful!\n")
+            os.makedirs(ENGINES.root, exist_ok=True)
+            staging = tempfile.mkdtemp(prefix=".staging-", dir=ENGINES.root)
+        except OSError as e:
+            status_callback(f"Error: Could not create a slot for the new engine: {e}")
+            return False
 
-        except FileNotFoundError:
-            status_callback(f"Error: Executable not found at {self.name}")
+        try:
+            candidate = os.path.join(staging, ENGINES.exe_name)
+            try:
+                await asyncio.to_thread(shutil.copy2, self.name, candidate)
+            except FileNotFoundError:
+                status_callback(f"Error: Executable not found at {self.name}")
+                return False
+
+            status_callback("[Engine] Fetching the latest engine into a new slot...")
+            if not await self._run(supervisor, [candidate, "-U"], UPDATE_TIMEOUT, status_callback):
+                return False
+
+            version = await self._smoke_test(supervisor, candidate, status_callback)
+            if version is None:
+                status_callback("[Engine] The new engine failed its smoke test; keeping the current one.")
+                return False
+            if version == current:
+                status_callback(f"[Engine] Already up to date ({current}).\n")
+                return True
+
+            await asyncio.to_thread(ENGINES.install, staging, version)
+            ENGINES.switch(version)
+            # Only now: jobs starting until the switch still pinned the old engine
+            await asyncio.to_thread(ENGINES.prune, set(in_use()) if in_use else ())
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
-            status_callback(f"An unexpected error occurred: {e}")
\ No newline at end of file
+            status_callback(f"An unexpected error occurred: {e}")
+            return False
+        finally:
+            # Gone already if it was installed
+            shutil.rmtree(staging, ignore_errors=True)
+
+        status_callback(f"[Engine] Switched to {version} (was {current or 'unknown'}). "
+                        "Running downloads finish with the old engine.")
+        status_callback("Update successful!\n")
+        return True
+
+    async def _smoke_test(self, supervisor: ProcessSupervisor, path: str,
+                          status_callback: Callable[[str], None]) -> Optional[str]:
+        """Checks that a new engine starts and loads its extractors.
+
+        Returns:
+            str | None: Its version, or None if it failed.
+        """
+        output: list[str] = []
+        if not await self._run(supervisor, [path, "--version"], SMOKE_TIMEOUT, status_callback, output.append):
+            return None
+        version = next((line.strip() for line in output if line.strip()), None)
+        if version is None:
+            return None
+
+        extractors = 0
+        def count(line: str):
+            nonlocal extractors
+            extractors += bool(line.strip())
+        if not await self._run(supervisor, [path, "--list-extractors"], SMOKE_TIMEOUT, status_callback, count):
+            return None
+        return version if extractors else None
+
+    async def _run(self, supervisor: ProcessSupervisor, cmd: list[str], timeout: float,
+                   status_callback: Callable[[str], None],
+                   on_line: Optional[Callable[[str], None]] = None) -> bool:
+        """Runs one step of the update, reporting failures."""
+        try:
+            returncode = await supervisor.run_process(
+                cmd,
+                on_line or (lambda line: status_callback(f"[Engine] {line.strip()}")),
+                timeout=timeout
+            )
+        except FileNotFoundError:
+            status_callback(f"Error: Executable not found at {cmd[0]}")
+            return False
+        except ProcessTimeout:
+            status_callback(f"[Engine] {os.path.basename(cmd[0])} {cmd[1]} timed out after {timeout:g} seconds")
+            return False
+
+        if returncode != 0:
+            status_callback(f"[Engine] Process exited with error code: {returncode}")
+            return False
+        return True
+
+
+    def rollback(self, status_callback: Callable[[str], None]) -> bool:
+        """Switches back to the engine that was active before the last switch.
+
+        Running downloads keep their engine; new ones use the restored one.
+
+        Returns:
+            bool: False if there was nothing to roll back to.
+        """
+        try:
+            version = ENGINES.rollback()
+        except (ValueError, OSError) as e:
+            status_callback(f"[Engine] {e}")
+            return False
+        restored = version or f"the base engine ({binary_version(engine_path()) or 'unknown version'})"
+        status_callback(f"[Engine] Rolled back to {restored}.")
+        return True
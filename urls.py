@@ -0,0 +1,224 @@
+"""This module normalizes URLs before anything is spawned for them.
+
+Pasted links come with tracking parameters, mobile or short-link hosts
+and several URL shapes for the same video. `canonicalize` strips the
+tracking parameters, rewrites the hosts it knows to one canonical form,
+extracts the video and playlist IDs, and rejects what yt-dlp can't
+download anyway (malformed links, and DRM-only services it refuses), so
+none of that costs a yt-dlp process. The scheduler uses the canonical
+IDs to drop duplicate submissions and to check the archive before probing.
+
+Short links that need a network request to resolve (e.g. t.co, bit.ly)
+are left as they are; yt-dlp follows them.
+
+Classes:
+    - CanonicalURL: A normalized URL and the IDs found in it.
+    - UnsupportedURL: Raised for URLs that can't be downloaded.
+
+Functions:
+    - canonicalize: Normalizes a URL.
+"""
+import re
+import ipaddress
+from typing import Callable, NamedTuple, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+
+class UnsupportedURL(ValueError):
+    """Raised for URLs that can't be downloaded."""
+
+
+class CanonicalURL(NamedTuple):
+    """A normalized URL and the IDs found in it.
+
+    Attributes:
+        url (str): The canonical URL.
+        host (str): Its host, without "www.".
+        extractor (str | None): yt-dlp's extractor key for a known site, e.g. "Youtube".
+        video_id (str | None): The video's ID, if the URL names one.
+        playlist_id (str | None): The playlist's ID, if the URL names one.
+    """
+    url: str
+    host: str
+    extractor: Optional[str] = None
+    video_id: Optional[str] = None
+    playlist_id: Optional[str] = None
+
+    def key(self, playlist: bool = True) -> str:
+        """A key that is the same for every URL of the same media.
+
+        Args:
+            playlist (bool): Whether a URL naming both a video and a playlist
+                stands for the playlist (otherwise, for the video).
+        """
+        if self.playlist_id and (playlist or not self.video_id):
+            return f"{self.host} playlist {self.playlist_id}"
+        if self.video_id:
+            # The download archive's key for the video (see archive.py)
+            return f"{(self.extractor or self.host).lower()} {self.video_id}"
+        return self.url
+
+
+# Query parameters that only track where a link was shared from
+_TRACKING = frozenset((
+    "fbclid", "gclid", "dclid", "gbraid", "wbraid", "msclkid", "yclid", "twclid", "ttclid",
+    "igshid", "igsh", "mc_cid", "mc_eid", "si", "feature", "pp", "ref", "ref_src", "ref_url",
+    "share_id", "is_from_webapp", "sender_device", "sender_web_id", "_r", "_t",
+))
+_TRACKING_PREFIXES = ("utm_", "at_", "pk_", "hsa_")
+
+# Services yt-dlp refuses outright (DRM), by registered domain
+_UNSUPPORTED = {
+    "netflix.com": "Netflix", "disneyplus.com": "Disney+", "primevideo.com": "Prime Video",
+    "hulu.com": "Hulu", "max.com": "Max", "hbomax.com": "HBO Max", "open.spotify.com": "Spotify",
+    "music.apple.com": "Apple Music", "tv.apple.com": "Apple TV+", "tidal.com": "Tidal",
+    "deezer.com": "Deezer", "music.amazon.com": "Amazon Music", "peacocktv.com": "Peacock",
+    "paramountplus.com": "Paramount+", "crunchyroll.com": "Crunchyroll",
+}
+
+_YOUTUBE_ID = re.compile(r"^[A-Za-z0-9_-]{11}$")
+_YOUTUBE_PATH = re.compile(r"^/(?:shorts|embed|live|v|e)/([A-Za-z0-9_-]{11})(?:[/?]|$)")
+_VIMEO_PATH = re.compile(r"^/(?:video/|channels/[^/]+/|groups/[^/]+/videos/)?(\d+)(?:/([0-9a-f]+))?(?:/|$)")
+_HOST = re.compile(r"^(?:[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?\.)+[a-z][a-z0-9-]{0,62}$|^localhost$")
+
+
+def _youtube(host: str, path: str, query: dict) -> Optional[CanonicalURL]:
+    video_id = None
+    if host == "youtu.be":
+        video_id = path.strip("/").split("/")[0]
+    elif path == "/watch":
+        video_id = query.get("v")
+    else:
+        match = _YOUTUBE_PATH.match(path)
+        video_id = match.group(1) if match else None
+    playlist_id = query.get("list") or None
+
+    if video_id is not None and not _YOUTUBE_ID.match(video_id):
+        raise UnsupportedURL(f"Not a valid YouTube video ID: {video_id!r}")
+    if video_id:
+        url = f"https://www.youtube.com/watch?v={video_id}"
+        if playlist_id:
+            url += f"&list={playlist_id}"
+        return CanonicalURL(url, "youtube.com", "Youtube", video_id, playlist_id)
+    if path == "/playlist" and playlist_id:
+        return CanonicalURL(f"https://www.youtube.com/playlist?list={playlist_id}",
+                            "youtube.com", "YoutubeTab", None, playlist_id)
+    # Channels, searches and the like: yt-dlp knows what to do with them
+    return None
+
+
+def _vimeo(host: str, path: str, query: dict) -> Optional[CanonicalURL]:
+    match = _VIMEO_PATH.match(path)
+    if match is None:
+        return None
+    video_id = match.group(1)
+    # Unlisted videos only play with their hash, so it stays in the URL (but not the key)
+    unlisted_hash = match.group(2) or query.get("h")
+    if not unlisted_hash:
+        url = f"https://vimeo.com/{video_id}"
+    elif host == "player.vimeo.com":
+        url = f"https://player.vimeo.com/video/{video_id}?{urlencode({'h': unlisted_hash})}"
+    else:
+        url = f"https://vimeo.com/{video_id}/{unlisted_hash}"
+    return CanonicalURL(url, "vimeo.com", "Vimeo", video_id)
+
+
+def _pattern(regex: str, template: str, extractor: str, host: str,
+             id_group: int = 1) -> Callable[[str, str, dict], Optional[CanonicalURL]]:
+    """A site whose URLs are matched by `regex` (against the path), with the
+    video ID in group `id_group`, and rebuilt from the groups by `template`."""
+    compiled = re.compile(regex)
+    def match(_host: str, path: str, _query: dict) -> Optional[CanonicalURL]:
+        found = compiled.match(path)
+        if found is None:
+            return None
+        return CanonicalURL(template.format(*found.groups()), host, extractor, found.group(id_group))
+    return match
+
+
+# Registered domain -> the function that canonicalizes its URLs
+_SITES: dict[str, Callable[[str, str, dict], Optional[CanonicalURL]]] = {
+    "youtube.com": _youtube,
+    "youtu.be": _youtube,
+    "youtube-nocookie.com": _youtube,
+    "vimeo.com": _vimeo,
+    "dailymotion.com": _pattern(r"^/(?:embed/)?video/([a-z0-9]+)", "https://www.dailymotion.com/video/{0}",
+                                "Dailymotion", "dailymotion.com"),
+    "dai.ly": _pattern(r"^/([a-z0-9]+)$", "https://www.dailymotion.com/video/{0}", "Dailymotion", "dailymotion.com"),
+    "twitter.com": _pattern(r"^/([^/]+)/status/(\d+)", "https://x.com/{0}/status/{1}", "Twitter", "x.com", 2),
+    "x.com": _pattern(r"^/([^/]+)/status/(\d+)", "https://x.com/{0}/status/{1}", "Twitter", "x.com", 2),
+    "tiktok.com": _pattern(r"^/(@[^/]+)/video/(\d+)", "https://www.tiktok.com/{0}/video/{1}", "TikTok",
+                           "tiktok.com", 2),
+    "instagram.com": _pattern(r"^/(?:[^/]+/)?(?:p|reels?|tv)/([A-Za-z0-9_-]+)", "https://www.instagram.com/p/{0}/",
+                              "Instagram", "instagram.com"),
+}
+
+
+def _valid_host(host: str) -> bool:
+    try:
+        ipaddress.ip_address(host)
+        return True
+    except ValueError:
+        pass
+    try:
+        return _HOST.match(host.encode("idna").decode("ascii")) is not None
+    except UnicodeError:
+        return False
+
+
+def _lookup(host: str, table: dict):
+    """Finds a host, or the nearest parent domain of it, in a table."""
+    labels = host.split(".")
+    for i in range(len(labels) - 1):
+        value = table.get(".".join(labels[i:]))
+        if value is not None:
+            return value
+    return None
+
+
+def canonicalize(url: str) -> CanonicalURL:
+    """Normalizes a URL.
+
+    Tracking parameters are removed, known sites are rewritten to a single
+    canonical URL with their IDs extracted, and other URLs are kept as they
+    are otherwise ("www." links get https://).
+
+    Raises:
+        UnsupportedURL: If the URL is malformed or points at a service that
+            yt-dlp can't download from.
+    """
+    url = url.strip()
+    if url.startswith("www."):
+        url = "https://" + url
+    if not url or any(char.isspace() for char in url):
+        raise UnsupportedURL("Not a URL")
+    try:
+        parts = urlsplit(url)
+        host = (parts.hostname or "").rstrip(".")
+        parts.port  # Raises for a malformed port
+    except ValueError:
+        raise UnsupportedURL("Malformed URL") from None
+    if parts.scheme.lower() not in ("http", "https"):
+        raise UnsupportedURL("Only http:// and https:// links are supported")
+    if not _valid_host(host):
+        raise UnsupportedURL(f"Not a valid host: {host or '(none)'}")
+    if host.startswith("www."):
+        host = host[4:]
+    for prefix in ("m.", "mobile.", "music."):
+        if host.startswith(prefix) and host[len(prefix):] in ("youtube.com", "twitter.com", "vimeo.com"):
+            host = host[len(prefix):]
+
+    service = _lookup(host, _UNSUPPORTED)
+    if service is not None:
+        raise UnsupportedURL(f"{service} is DRM-protected and not supported")
+
+    query = [(key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+             if key.lower() not in _TRACKING and not key.lower().startswith(_TRACKING_PREFIXES)]
+    site = _lookup(host, _SITES)
+    if site is not None:
+        canonical = site(host, parts.path or "/", dict(query))
+        if canonical is not None:
+            return canonical
+
+    cleaned = urlunsplit((parts.scheme.lower(), parts.netloc, parts.path, urlencode(query, doseq=True), ""))
+    return CanonicalURL(cleaned, host)